@@ -5,6 +5,14 @@ class Merger(Module):
     def __init__(self, module_id, is_docker=False):
         super(Merger, self).__init__(module_id, is_docker)
 
+        # Input keys whose values are merged into an output of the same key
+        # Mergers declaring merge keys can merge their input in parts and then merge the partial results again
+        self.merge_keys = []
+
+        # Maximum number of splits merged by a single task (None = no limit)
+        # Mergers receiving more splits are expanded into a tree of partial merges (requires merge keys)
+        self.max_fan_in = None
+
     def define_input(self):
         raise NotImplementedError(
             "Merger module %s must implement 'define_input()' function!" % self.__class__.__name__)
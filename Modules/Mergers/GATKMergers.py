@@ -169,6 +169,7 @@ class CatVariants(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(CatVariants, self).__init__(module_id, is_docker)
         self.output_keys  = ["gvcf", "gvcf_idx"]
+        self.merge_keys   = ["gvcf", "gvcf_idx"]
 
     def define_input(self):
         self.define_base_args()
@@ -7,6 +7,7 @@ class MergeBams(Merger):
     def __init__(self, module_id, is_docker=False):
         super(MergeBams, self).__init__(module_id, is_docker)
         self.output_keys  = ["bam", "bam_idx"]
+        self.merge_keys   = ["bam", "bam_idx"]
 
     def define_input(self):
         self.add_argument("bam",            is_required=True)
@@ -38,7 +39,7 @@ class MergeBams(Merger):
         bam_idx_list    = self.get_argument("bam_idx")
         samtools        = self.get_argument("samtools")
         nr_cpus         = self.get_argument("nr_cpus")
-        sorted_input    = self.get_argument("bam_sorted")
+        sorted_input    = self.__is_sorted_input()
         output_bam      = self.get_output("bam")
         output_bam_idx  = self.get_output("bam_idx")
 
@@ -65,3 +66,10 @@ class MergeBams(Merger):
         # Return command for
         return "%s !LOG2! && %s !LOG2!" % (merge_cmd, index_cmd)
 
+    def __is_sorted_input(self, bam_sorted=None):
+        # Input is sorted unless any input bam is unsorted (one value is received from each upstream task)
+        # Partial merges pass the values of the bams they merged on to the merger merging their output
+        bam_sorted = self.get_argument("bam_sorted") if bam_sorted is None else bam_sorted
+        if isinstance(bam_sorted, list):
+            return all([self.__is_sorted_input(x) for x in bam_sorted])
+        return bam_sorted not in [False, "False", "false"]
@@ -5,6 +5,7 @@ class Rbind(Merger):
     def __init__(self, module_id, is_docker=False):
         super(Rbind, self).__init__(module_id, is_docker)
         self.output_keys    = ["qc_report"]
+        self.merge_keys     = ["qc_report"]
 
     def define_input(self):
         self.add_argument("qc_report",  is_required=True)
@@ -5,6 +5,7 @@ class VCFMerger(Merger):
     def __init__(self, module_id, is_docker=False):
         super(VCFMerger, self).__init__(module_id, is_docker)
         self.output_keys    = ["vcf"]
+        self.merge_keys     = ["vcf"]
 
     def define_input(self):
         self.add_argument("vcf",                is_required=True)
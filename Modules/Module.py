@@ -1,6 +1,7 @@
 import abc
 import logging
 import os
+import copy
 
 from System.Datastore import GAPFile
 
@@ -141,6 +142,16 @@ class Module(object, metaclass=abc.ABCMeta):
 
         return path
 
+    def clone(self, new_id):
+        # Create lightweight copy of module for a split task
+        # Attributes set at module creation are shared with the original module
+        # Only the module id, input argument values, and output are specific to the copy
+        module_copy = copy.copy(self)
+        module_copy.module_id = new_id
+        module_copy.arguments = {key: copy.copy(arg) for key, arg in self.arguments.items()}
+        module_copy.output = copy.deepcopy(self.output)
+        return module_copy
+
     ############### Getters and setters
     def get_ID(self):
         return self.module_id
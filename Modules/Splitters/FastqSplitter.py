@@ -1,7 +1,7 @@
 import math
 import logging
 
-from Modules import Splitter
+from Modules import Splitter, get_throughput_model
 
 class FastqSplitter(Splitter):
 
@@ -9,34 +9,37 @@ class FastqSplitter(Splitter):
         super(FastqSplitter, self).__init__(module_id, is_docker)
         self.output_keys = ["R1", "R2", "nr_cpus"]
 
-        # BWA-MEM aligning speed constant
-        self.ALIGN_SPEED = 10 ** 8  # bps/vCPU for 10 mins of processing
-
     def define_input(self):
         self.add_argument("R1",             is_required=True)
         self.add_argument("R2",             is_required=False)
         self.add_argument("nr_reads",       is_required=True)
         self.add_argument("max_nr_cpus",    is_required=True)
         self.add_argument("read_len",       is_required=True)
+        self.add_argument("aligner",        is_required=True,   default_value="BwaAligner")
+        self.add_argument("split_runtime",  is_required=True,   default_value=600)
         self.add_argument("nr_cpus",        is_required=True,   default_value=4)
         self.add_argument("mem",            is_required=True,   default_value="nr_cpus * 2")
 
     def define_output(self):
         # Obtaining the arguments
-        R1          = self.get_argument("R1")
-        R2          = self.get_argument("R2")
-        max_nr_cpus = int(self.get_argument("max_nr_cpus"))
-        nr_reads    = int(self.get_argument("nr_reads"))
-        read_len    = int(self.get_argument("read_len"))
+        R1              = self.get_argument("R1")
+        R2              = self.get_argument("R2")
+        max_nr_cpus     = int(self.get_argument("max_nr_cpus"))
+        nr_reads        = int(self.get_argument("nr_reads"))
+        read_len        = int(self.get_argument("read_len"))
+        split_runtime   = float(self.get_argument("split_runtime"))
+
+        # Throughput model of the aligner that will process the splits
+        throughput_model = get_throughput_model(self.get_argument("aligner"))
 
         # Cut nr_reads by half if paired
         nr_reads = nr_reads/2.0 if R2 is not None else nr_reads
 
         # Computing the number of lines to be split for each file considering:
-        #  - The aligning speed which is in bps/vCPU
-        #  - The maximum number of vCPUs alloed on the platform
+        #  - The number of bases the aligner can process with the maximum number of vCPUs within the target runtime
         #  - The difference between read and read pair (divide by 2)
-        nr_reads_per_split  = self.ALIGN_SPEED / read_len / 2 * max_nr_cpus
+        nr_bases_per_split  = throughput_model.get_max_bases(max_nr_cpus, split_runtime)
+        nr_reads_per_split  = nr_bases_per_split / read_len / 2
         nr_splits           = int(math.ceil(nr_reads * 1.0 / nr_reads_per_split))
 
         # Set number of lines per split to be access in get_command()
@@ -57,17 +60,18 @@ class FastqSplitter(Splitter):
             logging.debug("We making a split in the loop!")
 
             # Create next split
+            # Number of bases in each file is recorded so the aligner throughput can be calibrated from run reports
             self.make_split(split_id)
-            self.add_output(split_id, "R1", r1_split)
+            self.add_output(split_id, "R1", r1_split, nr_bases=int(nr_reads_per_split * read_len))
             self.add_output(split_id, "nr_cpus", max_nr_cpus, is_path=False)
-            self.add_output(split_id, "R2", r2_split)
+            self.add_output(split_id, "R2", r2_split, nr_bases=int(nr_reads_per_split * read_len))
 
         logging.debug("We making one final split!")
 
-        # Create final split using remaining CPUs
-        # Determine number of CPUs available for last split
-        nr_cpus_needed      = int(math.ceil(nr_reads * read_len * 2 * 1.0 / self.ALIGN_SPEED))
-        nr_cpus_remaining   = nr_cpus_needed % max_nr_cpus if nr_cpus_needed % max_nr_cpus else max_nr_cpus
+        # Create final split using only the CPUs needed to process the remaining reads within the target runtime
+        nr_reads_remaining  = nr_reads - nr_reads_per_split * (nr_splits - 1)
+        nr_bases_remaining  = nr_reads_remaining * read_len * 2
+        nr_cpus_remaining   = throughput_model.get_nr_cpus(nr_bases_remaining, split_runtime, max_nr_cpus)
         nr_cpus_remaining   += nr_cpus_remaining % 2
         nr_cpus_remaining   = max(nr_cpus_remaining, 4)
 
@@ -76,8 +80,8 @@ class FastqSplitter(Splitter):
         r1_split = self.generate_unique_file_name(split_id=split_id, extension="R1.fastq")
         r2_split = self.generate_unique_file_name(split_id=split_id, extension="R2.fastq") if R2 is not None else None
         self.make_split(split_id)
-        self.add_output(split_id, "R1", r1_split)
-        self.add_output(split_id, "R2", r2_split)
+        self.add_output(split_id, "R1", r1_split, nr_bases=int(nr_reads_remaining * read_len))
+        self.add_output(split_id, "R2", r2_split, nr_bases=int(nr_reads_remaining * read_len))
         self.add_output(split_id, "nr_cpus", nr_cpus_remaining, is_path=False)
 
     def define_command(self):
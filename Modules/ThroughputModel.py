@@ -0,0 +1,135 @@
+import json
+import logging
+import math
+import importlib
+
+from Modules.Module import Module
+
+class ThroughputModel(object):
+    # Models how many bases per second a tool processes given the number of vCPUs it runs with:
+    #   throughput = bases_per_cpu_sec * nr_cpus ^ cpu_scaling
+    # cpu_scaling below 1 means each extra vCPU adds less throughput than the previous one
+
+    def __init__(self, bases_per_cpu_sec, cpu_scaling=1.0):
+        self.bases_per_cpu_sec  = bases_per_cpu_sec
+        self.cpu_scaling        = cpu_scaling
+
+    def get_throughput(self, nr_cpus):
+        # Return number of bases processed per second
+        return self.bases_per_cpu_sec * nr_cpus ** self.cpu_scaling
+
+    def get_runtime(self, nr_bases, nr_cpus):
+        # Return number of seconds needed to process a number of bases
+        return nr_bases / float(self.get_throughput(nr_cpus))
+
+    def get_max_bases(self, nr_cpus, runtime):
+        # Return number of bases that can be processed within a runtime (sec)
+        return self.get_throughput(nr_cpus) * runtime
+
+    def get_nr_cpus(self, nr_bases, runtime, max_nr_cpus):
+        # Return smallest number of vCPUs needed to process a number of bases within a runtime (sec)
+        nr_cpus = int(math.ceil((nr_bases / float(self.bases_per_cpu_sec * runtime)) ** (1.0 / self.cpu_scaling)))
+        return max(1, min(nr_cpus, max_nr_cpus))
+
+    def calibrate(self, observations):
+        # Fit bases_per_cpu_sec to the median of observed (nr_bases, nr_cpus, runtime) tuples
+        estimates = sorted([nr_bases / float(runtime * nr_cpus ** self.cpu_scaling)
+                            for nr_bases, nr_cpus, runtime in observations if runtime > 0 and nr_cpus > 0])
+        if len(estimates) > 0:
+            self.bases_per_cpu_sec = estimates[len(estimates)//2]
+
+
+# Throughput models of aligners used to size splits of sequencing reads, keyed by the name of the module class
+# Reports and graph configs refer to modules by name. Names are checked to be modules before the models are used,
+# as the module directories can only be imported once CloudConductor has configured its import paths
+# BwaAligner default corresponds to 10^8 bases per vCPU per 10 minutes
+THROUGHPUT_MODELS = {
+    "BwaAligner"    : ThroughputModel(bases_per_cpu_sec=10 ** 8 / 600.0, cpu_scaling=1.0),
+    "Bowtie2"       : ThroughputModel(bases_per_cpu_sec=2 * 10 ** 8 / 600.0, cpu_scaling=0.9),
+    "Star"          : ThroughputModel(bases_per_cpu_sec=10 ** 9 / 600.0, cpu_scaling=0.8),
+}
+
+# Names of modules whose throughput model has been checked to belong to a module
+CHECKED_MODULES = set()
+
+def register_throughput_model(module_name, throughput_model):
+    # Add or replace throughput model used for tasks running a module
+    check_module_name(module_name)
+    THROUGHPUT_MODELS[module_name] = throughput_model
+
+def check_throughput_models():
+    # Check that every throughput model is registered under the name of a module
+    # A misspelled name would otherwise never match the tasks whose throughput it's meant to model
+    for module_name in list(THROUGHPUT_MODELS):
+        check_module_name(module_name)
+
+def check_module_name(module_name):
+    # Check that a module (e.g. Modules/Tools/BwaAligner.py) defines a module class of the same name
+    if module_name in CHECKED_MODULES:
+        return
+    try:
+        module_class = getattr(importlib.import_module(module_name), module_name, None)
+    except ImportError:
+        module_class = None
+    if not isinstance(module_class, type) or not issubclass(module_class, Module):
+        logging.error("Throughput model registered for '%s', which isn't a module! Throughput models must be registered "
+                      "under the name of the module class they model (e.g. 'BwaAligner')." % module_name)
+        raise RuntimeError("Throughput model registered for unknown module '%s'!" % module_name)
+    CHECKED_MODULES.add(module_name)
+
+def get_throughput_model(module_name):
+    # Return throughput model of a module
+    check_throughput_models()
+    if module_name not in THROUGHPUT_MODELS:
+        logging.error("No throughput model available for module '%s'! Available models: %s"
+                      % (module_name, ", ".join(THROUGHPUT_MODELS)))
+        raise RuntimeError("Unknown throughput model requested!")
+    return THROUGHPUT_MODELS[module_name]
+
+def calibrate_throughput_models(report_files):
+    # Calibrate throughput models from the tasks in previous pipeline reports
+    # Only tasks that report their number of input bases and vCPUs are used
+    check_throughput_models()
+    observations = {}
+    for report_file in report_files:
+        try:
+            with open(report_file, "r") as report_fh:
+                report = json.load(report_fh)
+        except BaseException as e:
+            logging.error("Unable to load throughput observations from report '%s'!" % report_file)
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
+            raise
+
+        # Reports with task phases give the time spent running each task's commands, which excludes booting the
+        # processor, pulling docker images and transferring files. Older reports only give the overall runtime of each task
+        tasks = report.get("tasks", [])
+        has_phases = any(["phases" in task for task in tasks])
+        run_times = get_run_times(tasks)
+
+        for task in tasks:
+            module = task.get("module", None)
+            if module not in THROUGHPUT_MODELS or task.get("cache_hit", False) or task.get("resumed", False):
+                continue
+            nr_bases    = task.get("nr_bases", None)
+            nr_cpus     = task.get("nr_cpus", None)
+            runtime     = run_times.get(task.get("name", None), None) if has_phases else task.get("runtime(sec)", None)
+            if nr_bases is None or nr_cpus is None or runtime is None:
+                continue
+            observations.setdefault(module, []).append((float(nr_bases), int(nr_cpus), float(runtime)))
+
+    for module, module_observations in observations.items():
+        THROUGHPUT_MODELS[module].calibrate(module_observations)
+        logging.debug("Calibrated throughput of '%s' from %d tasks: %.0f bases/vCPU/sec"
+                      % (module, len(module_observations), THROUGHPUT_MODELS[module].bases_per_cpu_sec))
+
+def get_run_times(tasks):
+    # Return time (sec) spent running the commands of each task in a report from its 'run' phases: task name -> runtime
+    # Phases of fused tasks are recorded by the task they were fused with
+    run_times = {}
+    for task in tasks:
+        for phase in task.get("phases", []):
+            if phase["name"] == "run" and phase["runtime(sec)"] is not None:
+                phase_task = phase.get("task", task.get("name", None))
+                run_times[phase_task] = run_times.get(phase_task, 0) + float(phase["runtime(sec)"])
+    return run_times
@@ -1,3 +1,5 @@
 from .Module import Module
 from .Splitter import Splitter
-from .Merger import Merger, PseudoMerger
\ No newline at end of file
+from .Merger import Merger, PseudoMerger
+from .ThroughputModel import ThroughputModel, register_throughput_model, get_throughput_model, calibrate_throughput_models
+from .ThroughputModel import check_throughput_models
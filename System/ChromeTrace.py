@@ -0,0 +1,89 @@
+import json
+import logging
+from collections import OrderedDict
+
+class ChromeTrace(object):
+    # Trace of the phases recorded in pipeline reports in the Chrome trace event format
+    # Can be opened in chrome://tracing or https://ui.perfetto.dev. Each pipeline is shown as a process and each task
+    # worker as a thread. Phases that overlap without nesting (e.g. parallel input transfers) are shown on extra threads.
+
+    def __init__(self):
+        self.events = []
+
+        # Next process ID given to a pipeline
+        self.next_pid = 1
+
+    def add_report(self, report):
+        # Add phases of every task in a pipeline report given as a dictionary
+        pid = self.next_pid
+        self.next_pid += 1
+        self.events.append(self.__make_metadata("process_name", pid, 0, report["pipeline_id"]))
+
+        tid = 1
+        for task in report["tasks"]:
+            phases = [phase for phase in task.get("phases", [])
+                      if phase["start_time"] is not None and phase["runtime(sec)"] is not None]
+            if len(phases) == 0:
+                continue
+
+            for lane, lane_phases in enumerate(self.__assign_lanes(phases)):
+                thread_name = task["name"] if lane == 0 else "%s (%d)" % (task["name"], lane + 1)
+                self.events.append(self.__make_metadata("thread_name", pid, tid, thread_name))
+                for phase in lane_phases:
+                    self.events.append(self.__make_event(phase, pid, tid))
+                tid += 1
+
+    def to_dict(self):
+        return OrderedDict([("traceEvents", self.events), ("displayTimeUnit", "ms")])
+
+    def save(self, trace_file):
+        try:
+            with open(trace_file, "w") as trace_fh:
+                json.dump(self.to_dict(), trace_fh)
+        except BaseException as e:
+            logging.error("Unable to save trace to '%s'!" % trace_file)
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
+            raise
+        logging.info("Trace of %d pipeline(s) saved to '%s'." % (self.next_pid - 1, trace_file))
+
+    @staticmethod
+    def __assign_lanes(phases):
+        # Split phases into lanes where phases either don't overlap or are nested within each other
+        # Each lane keeps a stack of the phases that are still open at the start of the next phase
+        lanes, stacks = [], []
+        for phase in sorted(phases, key=lambda phase: (phase["start_time"], -phase["runtime(sec)"])):
+            start   = phase["start_time"]
+            end     = start + phase["runtime(sec)"]
+            for lane, stack in zip(lanes, stacks):
+                while len(stack) > 0 and stack[-1] <= start:
+                    stack.pop()
+                if len(stack) == 0 or end <= stack[-1]:
+                    lane.append(phase)
+                    stack.append(end)
+                    break
+            else:
+                lanes.append([phase])
+                stacks.append([end])
+        return lanes
+
+    @staticmethod
+    def __make_event(phase, pid, tid):
+        # Complete event with start and duration in microseconds. Details of the phase are shown as its arguments
+        args = OrderedDict([(key, val) for key, val in phase.items()
+                            if key not in ["name", "start_time", "runtime(sec)"]])
+        return OrderedDict([("name", phase["name"]),
+                            ("ph", "X"),
+                            ("ts", phase["start_time"] * 1e6),
+                            ("dur", phase["runtime(sec)"] * 1e6),
+                            ("pid", pid),
+                            ("tid", tid),
+                            ("args", args)])
+
+    @staticmethod
+    def __make_metadata(name, pid, tid, value):
+        return OrderedDict([("name", name),
+                            ("ph", "M"),
+                            ("pid", pid),
+                            ("tid", tid),
+                            ("args", {"name": value})])
@@ -1,6 +1,7 @@
 import copy
 import os
 import logging
+import threading
 
 from System.Datastore import GAPFile
 from System.Platform import Platform
@@ -10,7 +11,7 @@ class PrematureTaskInputSetError(Exception):
 
 class Datastore(object):
     # Object containing all available information to GAP modules at any given instance
-    def __init__(self, graph, resource_kit, sample_data, platform):
+    def __init__(self, graph, resource_kit, sample_data, platform, final_output_dir=None):
 
         self.graph = graph
         self.resource_kit = resource_kit
@@ -18,21 +19,33 @@ class Datastore(object):
         self.platform = platform
 
         # Base directories for task execution (wrk) and output storage (output)
+        # Pipelines sharing a platform save their output under their own directory
         self.__base_wrk_dir = self.platform.wrk_dir
         self.__base_output_dir = self.platform.final_output_dir
+        if final_output_dir is not None:
+            self.__base_output_dir = self.platform.standardize_dir(final_output_dir)
 
-    def set_task_input_args(self, task_id):
+        # Arguments resolved from the docker image, resource kit and sample data, which don't change during a run
+        # Keyed on the source, arg type and whatever else the value depends on (e.g. samples visible to the task)
+        self.__arg_cache_lock = threading.Lock()
+        self.__arg_cache = {}
+
+    def set_task_input_args(self, task_id, ready_parents=None):
         # Set input arguments for a task module
+        # Ready parents are upstream tasks that have produced their output but haven't been marked complete (fused tasks)
 
         # Throw error if task inputs aren't ready to be set
-        if not self.graph.parents_complete(task_id):
+        if not self.graph.parents_complete(task_id, ready_parents):
             logging.error("Cannot set arguments for task '%s' before upstream tasks have completed!" % task_id)
             raise PrematureTaskInputSetError("Cannot set task arguments before a task dependencies have completed!")
 
+        # Gather output of parent tasks once for all arguments instead of once per argument
+        parent_args = self.__gather_parent_args(task_id)
+
         task_module = self.graph.get_tasks(task_id).module
         for input_type, input_arg in task_module.get_arguments().items():
             logging.debug("(%s) Setting arg: %s" % (task_id, input_type))
-            val = self.__get_task_arg(task_id, input_type, is_resource=input_arg.is_resource())
+            val = self.__get_task_arg(task_id, input_type, parent_args, is_resource=input_arg.is_resource())
             if val is None:
                 val = input_arg.get_default_value()
             task_module.set_argument(input_type, val)
@@ -48,8 +61,9 @@ class Datastore(object):
         task_module.set_argument("nr_cpus", nr_cpus)
         task_module.set_argument("mem", mem)
 
-    def get_task_workspace(self, task_id=None):
+    def get_task_workspace(self, task_id=None, wrk_task_id=None):
         # Use task information to generate unique directories for input/output files
+        # Tasks fused with an upstream task share the working directories of that task (wrk_task_id)
 
         if task_id is None:
             wrk_dir = self.__base_wrk_dir
@@ -77,6 +91,11 @@ class Datastore(object):
                 task_id = task_id.replace(sample_name+"/", "")
                 final_output_dir = os.path.join(self.__base_output_dir, sample_name, task_id)
 
+        # Run in working directory of task this task has been fused with
+        if wrk_task_id is not None:
+            wrk_dir = self.get_task_workspace(task_id=wrk_task_id).get_wrk_dir()
+            wrk_output_dir = os.path.join(wrk_dir, "output")
+
         # Standardize directories
         wrk_dir             = self.platform.standardize_dir(wrk_dir)
         tmp_output_dir      = self.platform.standardize_dir(tmp_output_dir)
@@ -126,19 +145,28 @@ class Datastore(object):
         # Return actual copies so that module paths get updated as they are transferred
         return output_files
 
-    def __get_task_arg(self, task_id, arg_type, is_resource=False):
+    def __get_task_arg(self, task_id, arg_type, parent_args, is_resource=False):
         # Return the object that best satisfies the arg_type for a task
 
         # Get all objects visible to task that match the arg_type
-        possible_args = self.__gather_args(task_id, arg_type)
+        possible_args = self.__gather_args(task_id, arg_type, parent_args)
 
         # Select the object using precedence rules
         final_arg = self.__select_arg(possible_args, is_resource=is_resource)
 
-        # Make deep copy of argument so internal datastore values can't be touched
-        final_arg = copy.deepcopy(final_arg) if final_arg is not None else final_arg
+        # Copy argument so internal datastore values can't be touched
+        return self.__copy_arg(final_arg)
 
-        return final_arg
+    @staticmethod
+    def __copy_arg(arg):
+        # Immutable values are shared and lists of immutable values only need a shallow copy
+        # Anything else (e.g. GAPFiles whose paths are updated when they're transferred) is deep copied
+        immutable_types = (str, int, float, bool, type(None))
+        if isinstance(arg, immutable_types):
+            return arg
+        if isinstance(arg, list) and all([isinstance(item, immutable_types) for item in arg]):
+            return list(arg)
+        return copy.deepcopy(arg)
 
     def __select_arg(self, avail_args, is_resource=False):
         # Priority of checking for argument
@@ -159,31 +187,51 @@ class Datastore(object):
                 return avail_args[input_type][0]
         return None
 
-    def __gather_args(self, task_id, arg_type):
+    def __gather_args(self, task_id, arg_type, parent_args):
         # Gather possible inputs to a task matching arg_type
         possible = {}
+        task = self.graph.get_tasks(task_id)
+        config_input = task.get_graph_config_args()
 
         # Get args from parent tasks
-        possible["parent_input"] = self.__gather_parent_args(task_id, arg_type)
+        possible["parent_input"] = parent_args.get(arg_type, [])
+
+        # Args from the docker image, resource kit and sample data only depend on the keys they're cached under
+        # Resources can be named in the config input
+        res_name = (arg_type in config_input, repr(config_input.get(arg_type, None)))
 
         # Get args from docker requested by task
-        possible["docker_input"] = self.__gather_docker_args(task_id, arg_type)
+        possible["docker_input"] = self.__get_cached_args(("docker_input", arg_type, task.get_docker_image_id(), res_name),
+                                                          self.__gather_docker_args, task_id, arg_type)
 
         # Get args from resource kit
-        possible["resource_input"] = self.__gather_res_kit_args(task_id, arg_type)
+        possible["resource_input"] = self.__get_cached_args(("resource_input", arg_type, res_name),
+                                                            self.__gather_res_kit_args, task_id, arg_type)
 
         # Get args from sample data
-        possible["sample_input"] = self.__gather_sample_args(task_id, arg_type)
+        visible_samples = task.get_visible_samples()
+        visible_samples = None if visible_samples is None else tuple(visible_samples)
+        possible["sample_input"] = self.__get_cached_args(("sample_input", arg_type, visible_samples),
+                                                          self.__gather_sample_args, task_id, arg_type)
 
         # Get args from config input
-        config_input = self.graph.get_tasks(task_id).get_graph_config_args()
         possible["config_input"] = [] if arg_type not in config_input else config_input[arg_type]
 
         return possible
 
-    def __gather_parent_args(self, task_id, arg_type):
-        # Get args of specified type inherited from parent tasks
-        args = []
+    def __get_cached_args(self, key, gather_args, task_id, arg_type):
+        # Return args gathered for an earlier task under the same key or gather them for this task
+        with self.__arg_cache_lock:
+            if key in self.__arg_cache:
+                return self.__arg_cache[key]
+        args = gather_args(task_id, arg_type)
+        with self.__arg_cache_lock:
+            self.__arg_cache[key] = args
+        return args
+
+    def __gather_parent_args(self, task_id):
+        # Get args inherited from parent tasks: arg_type -> list of values in the order of the parents
+        args = {}
         curr_task = self.graph.get_tasks(task_id)
         for parent_id in self.graph.get_parents(task_id):
             parent = self.graph.get_tasks(parent_id)
@@ -193,8 +241,15 @@ class Datastore(object):
                 output = parent.module.get_output(split_id=split_id)
             else:
                 output = parent.module.get_output()
-            if arg_type in output:
-                args.append(output[arg_type])
+            for arg_type, value in output.items():
+                args.setdefault(arg_type, []).append(value)
+
+            # Partial merges pass on input they don't merge (e.g. whether bams are sorted) so a merger receives the
+            # same arguments as it would have received from the splits replaced by its partial merges
+            if parent.is_partial_merge():
+                for arg_type, values in self.__gather_parent_args(parent_id).items():
+                    if arg_type not in output:
+                        args.setdefault(arg_type, []).extend(values)
         return args
 
     def __gather_sample_args(self, task_id, arg_type):
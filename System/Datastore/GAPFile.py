@@ -1,5 +1,7 @@
 import os
+import sys
 import logging
+from types import MappingProxyType
 
 class GAPFileMetadataError(Exception):
     # Base class for exception related to trying to access unavailable file metadata
@@ -7,20 +9,32 @@ class GAPFileMetadataError(Exception):
 
 class GAPFile(object):
     # Hold GAP-Related file information
+    # Expanded graphs hold many copies of each file so instances have no __dict__. Directories of paths are interned
+    # so files in the same directory share them, files with the same flags share a tuple of flags and metadata is only
+    # created when set.
+    __slots__ = ("file_id", "type", "__dir", "__name", "containing_dir", "__is_prefix", "size", "sample_name",
+                 "__metadata", "__flags")
+
+    # Metadata of files without any metadata
+    NO_METADATA = MappingProxyType({})
+
+    # Tuples of flag types shared by files flagged with the same flag types in the same order
+    FLAG_TUPLES = {(): ()}
+
     def __init__(self, file_id, file_type, path, **kwargs):
 
         # File Id
         self.file_id = file_id
 
         # Object type e.g. 'samtools', 'ref'
-        self.type = file_type
+        self.type = sys.intern(file_type) if isinstance(file_type, str) else file_type
+
+        # Check to make sure value is string (Path)
+        assert isinstance(path, str), "GAPFile value must be string! Recieved '%s' of type '%s'" % (path, type(path))
 
         # Object data
         self.path = path
 
-        # Check to make sure value is string (Path)
-        assert isinstance(self.path, str), "GAPFile value must be string! Recieved '%s' of type '%s'" % (path, type(path))
-
         # Path to a containing directory where resource is found
         self.containing_dir = kwargs.pop("containing_dir", None)
 
@@ -37,11 +51,32 @@ class GAPFile(object):
         # Standardize aspects of the resource path provided
         self.__standardize()
 
-        # Metadata associated with an object
-        self.metadata = kwargs
+        # Metadata associated with an object (None until any metadata is set)
+        self.__metadata = kwargs if len(kwargs) > 0 else None
 
-        # Flags
-        self.flags = []
+        # Flag types set on the file in the order they were set
+        self.__flags = ()
+
+    @property
+    def path(self):
+        return self.__dir + self.__name
+
+    @path.setter
+    def path(self, new_path):
+        # Store the directory (including the trailing '/') separately from the file name so it can be shared
+        split_pos = new_path.rfind("/") + 1
+        self.__dir  = sys.intern(new_path[:split_pos])
+        self.__name = new_path[split_pos:]
+
+    @property
+    def metadata(self):
+        # Files without metadata share a read-only empty mapping. Metadata is only created by set_metadata()
+        return self.__metadata if self.__metadata is not None else GAPFile.NO_METADATA
+
+    @property
+    def flags(self):
+        # Return flag types set on the file in the order they were set
+        return list(self.__flags)
 
     @property
     def filename(self):
@@ -109,27 +144,29 @@ class GAPFile(object):
         self.size = file_size
 
     def flag(self, flag_type):
-        if flag_type not in self.flags:
-            self.flags.append(flag_type)
+        if flag_type not in self.__flags:
+            self.__flags = GAPFile.__get_flag_tuple(self.__flags + (flag_type,))
 
     def unflag(self, flag_type):
-        if self.is_flagged(flag_type):
-            self.flags.remove(flag_type)
+        if flag_type in self.__flags:
+            self.__flags = GAPFile.__get_flag_tuple(tuple([x for x in self.__flags if x != flag_type]))
 
     def is_flagged(self, flag_type):
-        return flag_type in self.flags
+        return flag_type in self.__flags
 
     def has_metadata_type(self, meta_type):
-        return meta_type in self.metadata
+        return self.__metadata is not None and meta_type in self.__metadata
 
     def get_metadata(self, meta_type):
-        if not meta_type in self.metadata:
+        if not self.has_metadata_type(meta_type):
             logging.error("GAPObject '%s' of type '%s' doesn't have metadata of type '%s'" % (self.file_id, self.type, meta_type))
             raise GAPFileMetadataError("GAPObject does not have metadata of type '%s'" % meta_type)
-        return self.metadata[meta_type]
+        return self.__metadata[meta_type]
 
     def set_metadata(self, meta_type, val):
-        self.metadata[meta_type] = val
+        if self.__metadata is None:
+            self.__metadata = {}
+        self.__metadata[meta_type] = val
 
     def set_path(self, new_path):
         self.path = new_path
@@ -146,6 +183,11 @@ class GAPFile(object):
             self.path = os.path.join(new_dir, self.filename)
         self.__standardize()
 
+    @staticmethod
+    def __get_flag_tuple(flags):
+        # Return the shared tuple holding the same flag types in the same order
+        return GAPFile.FLAG_TUPLES.setdefault(flags, flags)
+
     def __update_containing_dir(self, dest_dir):
         # Updates path assuming entire containing directory has been moved to a new directory
         new_path = os.path.join(dest_dir, self.containing_dir_name)
@@ -0,0 +1,135 @@
+import json
+import logging
+from collections import OrderedDict
+
+from System.Datastore import GAPFile
+
+class RunState(object):
+    # Durable record of a pipeline run that can be used to resume the run after a failure
+    # Completed tasks are listed in the order they completed so the graph can be rebuilt by completing them again
+
+    def __init__(self, pipeline_id):
+
+        # Id of pipeline run
+        self.pipeline_id = pipeline_id
+
+        # Expanded pipeline graph at the time the run state was saved
+        self.graph = None
+
+        # Completed tasks with their resolved arguments and output
+        self.tasks = OrderedDict()
+
+    def set_graph(self, graph):
+        self.graph = str(graph)
+
+    def register_task(self, task):
+        # Record resolved arguments and output of a completed task
+        module = task.get_module()
+        args = OrderedDict()
+        for arg_key, arg in module.get_arguments().items():
+            args[arg_key] = arg.get_value()
+
+        self.tasks[task.get_ID()] = {"module" : module.__class__.__name__,
+                                     "is_complete" : task.is_complete(),
+                                     "args" : args,
+                                     "output" : module.get_output()}
+
+    def get_completed_tasks(self):
+        return [task_id for task_id, task_data in self.tasks.items() if task_data["is_complete"]]
+
+    def get_args(self, task_id):
+        return self.tasks[task_id]["args"]
+
+    def get_output(self, task_id):
+        return self.tasks[task_id]["output"]
+
+    def get_output_files(self, task_id):
+        # Return list of GAPFiles in the output of a task
+        return RunState.get_files(self.get_output(task_id))
+
+    def to_dict(self):
+        run_state = OrderedDict()
+        run_state["pipeline_id"] = self.pipeline_id
+        run_state["graph"] = self.graph
+        run_state["tasks"] = self.tasks
+        return RunState.encode(run_state)
+
+    @staticmethod
+    def load(run_state_file, storage_helper=None):
+        # Load run state from a file saved by a previous run
+        # Run states published to remote storage (e.g. gs://) are read through the storage helper
+        try:
+            if ":" in run_state_file:
+                if storage_helper is None:
+                    raise IOError("Remote run state files can only be read through a storage helper!")
+                contents = storage_helper.read(run_state_file, job_name="read_run_state")
+            else:
+                with open(run_state_file, "r") as run_state_fh:
+                    contents = run_state_fh.read()
+            return RunState.from_json(contents)
+        except BaseException as e:
+            logging.error("Unable to load run state from file '%s'!" % run_state_file)
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
+            raise
+
+    @staticmethod
+    def from_json(contents):
+        # Create run state from its JSON representation (see __str__)
+        data = json.loads(contents, object_pairs_hook=OrderedDict)
+        run_state = RunState(data["pipeline_id"])
+        run_state.graph = data["graph"]
+        run_state.tasks = RunState.decode(data["tasks"])
+        return run_state
+
+    @staticmethod
+    def encode(value):
+        # Convert GAPFiles nested in lists and dicts to JSON serializable dicts
+        if isinstance(value, GAPFile):
+            path = value.get_path() + "*" if value.is_prefix() else value.get_path()
+            return {"__gapfile__" : OrderedDict([("file_id", value.get_file_id()),
+                                                 ("file_type", value.get_type()),
+                                                 ("path", path),
+                                                 ("containing_dir", value.get_containing_dir()),
+                                                 ("file_size", value.get_size()),
+                                                 ("sample_name", value.sample_name),
+                                                 ("metadata", RunState.encode(dict(value.metadata))),
+                                                 ("flags", value.flags)])}
+        elif isinstance(value, list):
+            return [RunState.encode(x) for x in value]
+        elif isinstance(value, dict):
+            return OrderedDict([(str(key), RunState.encode(val)) for key, val in value.items()])
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
+
+    @staticmethod
+    def decode(value):
+        # Convert dicts encoded from GAPFiles back to GAPFiles
+        if isinstance(value, dict) and "__gapfile__" in value:
+            file_data = value["__gapfile__"]
+            gap_file = GAPFile(file_data["file_id"], file_data["file_type"], file_data["path"],
+                               containing_dir=file_data["containing_dir"],
+                               file_size=file_data["file_size"],
+                               sample_name=file_data["sample_name"],
+                               **RunState.decode(file_data["metadata"]))
+            for flag in file_data["flags"]:
+                gap_file.flag(flag)
+            return gap_file
+        elif isinstance(value, list):
+            return [RunState.decode(x) for x in value]
+        elif isinstance(value, dict):
+            return OrderedDict([(key, RunState.decode(val)) for key, val in value.items()])
+        return value
+
+    @staticmethod
+    def get_files(value):
+        # Return GAPFiles nested in lists and dicts as a single list
+        if isinstance(value, list):
+            return [x for item in value for x in RunState.get_files(item)]
+        elif isinstance(value, dict):
+            return [x for item in value.values() for x in RunState.get_files(item)]
+        return [value] if isinstance(value, GAPFile) else []
+
+    def __str__(self):
+        return json.dumps(self.to_dict(), indent=4)
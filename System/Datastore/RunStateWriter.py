@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from System.Datastore import RunState
+
+class RunStateWriter(object):
+    # Publishes the run state of a pipeline from a background thread so saving progress never blocks the scheduler
+    # Tasks are added to the run state as they complete. Saves requested while a save is being published are coalesced
+    # and saves are published at most once every MIN_SAVE_INTERVAL seconds, so a burst of completed tasks leads to a
+    # single upload
+
+    MIN_SAVE_INTERVAL = 30
+
+    def __init__(self, pipeline_id, platform, output_dir):
+
+        # Platform publishing the run state and output directory it's published to
+        self.platform   = platform
+        self.output_dir = output_dir
+
+        # Run state holding every task added so far
+        self.run_state  = RunState(pipeline_id)
+
+        # Number of saves requested and number of saves published (or failed) so far
+        self.cond           = threading.Condition()
+        self.nr_requested   = 0
+        self.nr_published   = 0
+
+        # Time of the last published save and whether the next save has to be published right away
+        self.last_save_time = None
+        self.flush          = False
+
+        # Time the expanded graph was last recorded
+        self.graph_time = None
+
+        # Whether a published run state has been checked to load back as the same run state
+        self.round_trip_checked = False
+
+        self.thread = None
+
+    def add_tasks(self, tasks):
+        # Record resolved arguments and output of tasks that completed since they were last added
+        with self.cond:
+            for task in tasks:
+                self.run_state.register_task(task)
+
+    def set_graph(self, graph, force=False):
+        # Record the expanded graph. Printing the graph touches every task so it's refreshed at most once per save
+        # interval unless forced
+        if not force and self.graph_time is not None and time.time() - self.graph_time < self.MIN_SAVE_INTERVAL:
+            return
+        graph = str(graph)
+        with self.cond:
+            self.run_state.graph = graph
+        self.graph_time = time.time()
+
+    def save(self, wait=False):
+        # Request the run state to be published. If wait is set, publish right away and block until it's been published
+        with self.cond:
+            self.nr_requested += 1
+            nr_requested = self.nr_requested
+            if wait:
+                self.flush = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__publish_saves)
+                self.thread.daemon = True
+                self.thread.start()
+            self.cond.notify_all()
+
+            while wait and self.nr_published < nr_requested:
+                self.cond.wait()
+
+    def __publish_saves(self):
+        # Publish the latest run state whenever a save is requested
+        while True:
+            with self.cond:
+                while self.nr_published == self.nr_requested:
+                    self.cond.wait()
+
+                # Wait until enough time has passed since the last save unless a save has to be published right away
+                while not self.flush and self.last_save_time is not None:
+                    remaining = self.last_save_time + self.MIN_SAVE_INTERVAL - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+
+                # Take a snapshot of the run state so tasks can keep being added while it's published
+                run_state = RunState(self.run_state.pipeline_id)
+                run_state.graph = self.run_state.graph
+                run_state.tasks = OrderedDict(self.run_state.tasks)
+                nr_requested    = self.nr_requested
+                self.flush      = False
+
+            try:
+                self.platform.publish_run_state(run_state, name=run_state.pipeline_id, output_dir=self.output_dir)
+                if not self.round_trip_checked and len(run_state.tasks) > 0:
+                    self.__check_round_trip(run_state)
+            except BaseException as e:
+                # Failing to save progress shouldn't stop the pipeline
+                logging.error("Unable to save progress!")
+                if str(e) != "":
+                    logging.error("Received the following message:\n%s" % e)
+
+            with self.cond:
+                self.last_save_time = time.time()
+                self.nr_published   = nr_requested
+                self.cond.notify_all()
+
+    def __check_round_trip(self, run_state):
+        # Check once per run that a published run state loads back as the same run state so a failed run can be
+        # resumed from it
+        self.round_trip_checked = True
+        contents = str(run_state)
+        if str(RunState.from_json(contents)) != contents:
+            logging.error("Run state of pipeline '%s' doesn't load back as the run state that was published! "
+                          "The run can't be resumed from it." % run_state.pipeline_id)
+            raise RuntimeError("Published run state doesn't load back as the same run state!")
@@ -1,3 +1,5 @@
+import csv
+import json
 import logging
 
 from Config import ConfigParser
@@ -9,38 +11,73 @@ class Sample(object):
         self.name  = sample_data.pop("name")
         self.paths = sample_data.pop("paths")
         self.data  = sample_data
-        self.__make_gap_files()
 
-    def __make_gap_files(self):
-        # Convert path strings to GAPFile objects
+        # Path strings are only converted to GAPFile objects the first time the sample's paths are needed
+        self.files = None
+
+        # Sizes of files found before their GAPFiles are created (e.g. during input validation): path -> size
+        self.file_sizes = {}
+
+    def make_gap_files(self):
+        # Convert path strings to new GAPFile objects
+        files = {}
         for path_type, paths in self.paths.items():
             # More than one path of same type
             if isinstance(paths, list):
+                files[path_type] = []
                 for i in range(len(paths)):
                     file_id = "%s_%s_%s" % (self.name, path_type, i)
-                    self.paths[path_type][i] = GAPFile(file_id, path_type, paths[i], sample_name=self.name)
+                    files[path_type].append(GAPFile(file_id, path_type, paths[i],
+                                                    file_size=self.file_sizes.get(paths[i], None),
+                                                    sample_name=self.name))
             # One path of a given type
             else:
                 file_id = "%s_%s_1" % (self.name, path_type)
-                self.paths[path_type] = GAPFile(file_id, path_type, paths, sample_name=self.name)
+                files[path_type] = GAPFile(file_id, path_type, paths,
+                                           file_size=self.file_sizes.get(paths, None),
+                                           sample_name=self.name)
+        return files
+
+    def set_file_size(self, path, size):
+        # Record size of one of the sample's files. Applied to the file's GAPFile whether or not it's been created yet
+        self.file_sizes[path] = size
+        if self.files is not None:
+            for files in self.files.values():
+                for gap_file in (files if isinstance(files, list) else [files]):
+                    if gap_file.get_path() == path:
+                        gap_file.set_size(size)
 
     def get_name(self):
         return self.name
 
+    def get_path_types(self):
+        return list(self.paths.keys())
+
     def get_paths(self):
-        return self.paths
+        if self.files is None:
+            self.files = self.make_gap_files()
+        return self.files
 
     def get_data(self):
         return self.data
 
 class SampleSet(object):
     # Container class that parses, holds, and provides access to Sample-level data declared in an external config file
+    # Sample sheets can either be JSON configs or TSV/CSV tables with one row per sample
+
+    # Sample sheet extensions read as tables and their delimiters
+    TABLE_DELIMITERS = {".tsv": "\t", ".csv": ","}
+
     def __init__(self, sample_data_json):
 
         # Parse and validate SampleSet config file
-        sample_data_spec     = "System/Datastore/SampleSet.validate"
-        config_parser        = ConfigParser(sample_data_json, sample_data_spec)
-        self.config          = config_parser.get_config()
+        table_delimiter = self.__get_table_delimiter(sample_data_json)
+        if table_delimiter is not None:
+            self.config         = self.__read_table(sample_data_json, table_delimiter)
+        else:
+            sample_data_spec    = "System/Datastore/SampleSet.validate"
+            config_parser       = ConfigParser(sample_data_json, sample_data_spec)
+            self.config         = config_parser.get_config()
 
         # Create Sample Objects
         self.samples   = self.__create_samples()
@@ -49,51 +86,69 @@ class SampleSet(object):
         self.__check_samples()
 
         # Get types of data available
-        self.__file_types           = list(self.samples[0].get_paths().keys())
+        self.__file_types           = self.samples[0].get_path_types()
         self.__sample_data_types    = list(self.samples[0].get_data().keys())
         self.__global_data_types    = [x for x in list(self.config.keys()) if x != "sample"]
 
-        # Sample order
+        # Sample order and position of each sample in the sample order
         self.sample_names = [sample.name for sample in self.samples]
+        self.sample_index = {}
+        for i, sample_name in enumerate(self.sample_names):
+            self.sample_index.setdefault(self.__get_sample_key(sample_name), i)
 
         # Organize global and sample-level metadata by data type
+        # Paths of a type are only added once all samples' paths of that type are needed
         self.data   = self.__organize_data_by_type()
+        self.__loaded_file_types = set()
 
     def get_num_samples(self):
         return len(self.sample_names)
 
+    def get_samples(self):
+        return self.samples
+
     def has_data_type(self, data_type):
         # Return true if data type exists in sample data
-        return data_type in self.data
+        return data_type in self.data or data_type in self.__file_types
 
     def get_paths(self, path_type=None, samples=None):
         # Return sample data files
         # Optionally can subset by file type and samples. Default is to return all paths from all samples.
         path_type = self.__file_types if path_type is None else path_type
+        path_type = path_type if isinstance(path_type, list) else [path_type]
         samples = self.sample_names if samples is None else samples
 
-        # Subset by type
-        paths = self.__subset_by_type(self.data, path_type)
-
-        # Subset by sample
-        paths = self.__subset_by_sample(paths, samples)
-
-        return paths
+        # Subset by type and sample
+        return self.__subset_by_sample(path_type, samples)
 
     def get_data(self, data_type=None, samples=None):
         # Return sample data
         # Optionally can subset by data type and samples. Default is all data types from all samples.
 
         if data_type is None and samples is None:
+            self.__load_paths(self.__file_types)
             return self.data
 
         # Subset by sample
-        data = self.data if samples is None else self.__subset_by_sample(self.data, samples)
-
-        if data_type is None:
-            return data
-
-        return data[data_type]
+        if samples is not None:
+            data_types = self.get_data_types() if data_type is None else [data_type]
+            data = self.__subset_by_sample(data_types, samples)
+            return data if data_type is None else data[data_type]
+
+        self.__load_paths([data_type])
+        return self.data[data_type]
+
+    def get_raw_data(self, data_type):
+        # Return data of a data type organized as in get_data() without creating GAPFiles for sample paths
+        # Paths that haven't been loaded are returned as path strings
+        if data_type not in self.__file_types or data_type in self.__loaded_file_types:
+            return self.data[data_type]
+        paths = [sample.paths[data_type] for sample in self.samples]
+        return paths if len(paths) > 1 else self.__add_data({}, data_type, paths[0])[data_type]
+
+    def get_data_types(self):
+        # Return every data type including path types whose paths haven't been loaded
+        return list(self.data.keys()) + [path_type for path_type in self.__file_types if path_type not in self.data]
 
     def __create_samples(self):
         # Parse sample data list in config and convert to Sample objects
@@ -104,39 +159,50 @@ class SampleSet(object):
         return samples
 
     def __check_samples(self):
-        # Check that all samples contain the same sample-level metadata types
-        first = True
-        required_data = None
+        # Check that all samples contain the same sample-level metadata and path types
+        required_data   = set(self.samples[0].get_data().keys())
+        required_paths  = set(self.samples[0].get_path_types())
         for sample in self.samples:
-            metadata_keys = "".join(sorted(sample.get_data().keys()))
-            if first:
-                required_data = metadata_keys
-                first = False
-            elif metadata_keys != required_data:
+            if set(sample.get_data().keys()) != required_data:
                 # Check that all samples contain the same metadata
-                    logging.error("Samples provided in SampleInputConfig have different sample-level metadata types! "
-                                  "\nSamples must contain identical metadata types!")
-                    raise IOError("One or more samples contains metadata not shared by all other samples!")
-
-    def __subset_by_type(self, data, data_types):
-        # Subset data to include only certain data types
-        if isinstance(data_types, list):
-            # Multiple data types
-            return {key : data[key] for key in data_types}
-        # Single data type
-        return {data_types : data[data_types]}
+                logging.error("Samples provided in SampleInputConfig have different sample-level metadata types! "
+                              "\nSamples must contain identical metadata types!")
+                raise IOError("One or more samples contains metadata not shared by all other samples!")
+
+            if set(sample.get_path_types()) != required_paths:
+                # Check that all samples contain the same types of paths
+                logging.error("Samples provided in SampleInputConfig have different path types! "
+                              "\nSamples must contain identical path types!")
+                raise IOError("One or more samples contains paths not shared by all other samples!")
+
+    def __load_paths(self, path_types):
+        # Add paths of every sample to the data for each path type not loaded yet
+        for path_type in path_types:
+            if path_type not in self.__file_types or path_type in self.__loaded_file_types:
+                continue
+            paths = [sample.get_paths()[path_type] for sample in self.samples]
+            if len(paths) > 1:
+                self.data[path_type] = paths
+            else:
+                self.__add_data(self.data, path_type, paths[0])
+            self.__loaded_file_types.add(path_type)
 
-    def __subset_by_sample(self, data, samples):
-        # Subset data to include only certain samples
+    def __subset_by_sample(self, data_types, samples):
+        # Subset data of some data types to include only certain samples
+        # Paths are taken from the samples themselves so only the requested samples' GAPFiles are created
 
         # Coerce single sample to list
         if isinstance(samples, str):
             samples = [samples]
 
-        sample_indices = [self.sample_names.index(sample) for sample in samples]
+        sample_indices = [self.__get_sample_index(sample) for sample in samples]
+        data = self.data
         new_data = {}
-        for data_type in data:
-            if len(samples) > 1:
+        for data_type in data_types:
+            if data_type in self.__file_types:
+                paths = [self.samples[sample_index].get_paths()[data_type] for sample_index in sample_indices]
+                new_data[data_type] = paths if len(samples) > 1 else paths[0]
+            elif len(samples) > 1:
                 new_data[data_type] = []
                 for sample_index in sample_indices:
                     new_data[data_type].append(data[data_type][sample_index])
@@ -146,23 +212,34 @@ class SampleSet(object):
                 new_data[data_type] = data[data_type]
         return new_data
 
+    def __get_sample_index(self, sample):
+        # Return position of a sample in the sample order
+        sample_key = self.__get_sample_key(sample)
+        if sample_key not in self.sample_index:
+            logging.error("Sample '%s' is not in the sample sheet!" % sample)
+            raise IOError("Attempt to get data of a sample not in the sample sheet!")
+        return self.sample_index[sample_key]
+
+    @staticmethod
+    def __get_sample_key(sample_name):
+        # Sample names can be lists, which can't be used as dictionary keys
+        return tuple(sample_name) if isinstance(sample_name, list) else sample_name
+
     def __organize_data_by_type(self):
         # Combine global and sample-level data into single dictionary organized by data type
+        # Sample-level data types hold one value per sample in the sample order, or the value itself for a single sample
         data = dict()
 
-        # Add sample-level data
-        for sample in self.samples:
-            # Add sample name to data
-            sample_name = sample.get_name()
-            self.__add_data(data, "sample_name", sample_name)
-
-            # Add sample-level metadata
-            for sample_data_type, sample_data_val in sample.get_data().items():
-                self.__add_data(data, sample_data_type, sample_data_val)
+        # Add sample-level data one data type at a time
+        columns = [("sample_name", self.sample_names)]
+        for sample_data_type in self.__sample_data_types:
+            columns.append((sample_data_type, [sample.get_data()[sample_data_type] for sample in self.samples]))
 
-            # Add sample paths
-            for sample_path_type, sample_path in sample.get_paths().items():
-                self.__add_data(data, sample_path_type, sample_path)
+        for data_type, values in columns:
+            if len(values) > 1:
+                data[data_type] = values
+            else:
+                self.__add_data(data, data_type, values[0])
 
         # Add any data not associated with a sample as global metadata
         for global_data_type, global_data_val in self.config.items():
@@ -190,3 +267,110 @@ class SampleSet(object):
 
         return data
 
+    @staticmethod
+    def __get_table_delimiter(sample_sheet):
+        # Return delimiter of sample sheets read as tables (None = sample sheet is a config file)
+        for extension, delimiter in SampleSet.TABLE_DELIMITERS.items():
+            if sample_sheet.lower().endswith(extension):
+                return delimiter
+        return None
+
+    def __read_table(self, sample_sheet, delimiter):
+        # Read a TSV/CSV sample sheet one row at a time into the same structure as a JSON sample sheet
+        # Lines starting with '#' before the header can set global data as '#key=value'
+        # Header has a 'name' column, 'paths.<type>' columns for paths and columns for sample-level metadata
+        config  = {"samples": []}
+        header  = None
+        try:
+            with open(sample_sheet, "r", newline="") as sheet_fh:
+                reader = csv.reader(sheet_fh, delimiter=delimiter)
+                for row in reader:
+
+                    # Skip empty lines
+                    if len("".join(row).strip()) == 0:
+                        continue
+
+                    # Global data and comments
+                    if header is None and row[0].startswith("#"):
+                        key, sep, value = delimiter.join(row)[1:].partition("=")
+                        if sep != "" and key.strip() != "":
+                            config[key.strip()] = self.__parse_table_value(value.strip())
+                        continue
+
+                    if header is None:
+                        header = self.__read_table_header(sample_sheet, reader.line_num, row)
+                    else:
+                        config["samples"].append(self.__read_table_row(sample_sheet, reader.line_num, header, row))
+
+        except csv.Error as e:
+            logging.error("Unable to read sample sheet '%s'! Received the following message:\n%s" % (sample_sheet, e))
+            raise IOError("Invalid sample sheet!")
+
+        if len(config["samples"]) == 0:
+            logging.error("Sample sheet '%s' doesn't contain any samples!" % sample_sheet)
+            raise IOError("Invalid sample sheet!")
+
+        return config
+
+    @staticmethod
+    def __read_table_header(sample_sheet, line_nr, row):
+        # Return the key each column of a table sample sheet sets: ("name", None), ("paths", path_type) or ("data", key)
+        header = []
+        data_keys = set()
+        for cell in row:
+            cell = cell.strip()
+            if cell == "name":
+                header.append(("name", None))
+            elif cell.startswith("paths.") and len(cell) > len("paths."):
+                header.append(("paths", cell[len("paths."):]))
+            elif cell not in ["", "paths"] and cell not in data_keys:
+                header.append(("data", cell))
+                data_keys.add(cell)
+            else:
+                logging.error("Sample sheet '%s' line %d: Invalid or duplicate column '%s'!" % (sample_sheet, line_nr, cell))
+                raise IOError("Invalid sample sheet!")
+
+        if header.count(("name", None)) != 1:
+            logging.error("Sample sheet '%s' line %d: Header must have exactly one 'name' column!" % (sample_sheet, line_nr))
+            raise IOError("Invalid sample sheet!")
+
+        return header
+
+    def __read_table_row(self, sample_sheet, line_nr, header, row):
+        # Validate a row of a table sample sheet and return the sample it declares
+        # Path types with more than one column hold a list of the row's non-empty paths of that type
+        if len(row) != len(header):
+            logging.error("Sample sheet '%s' line %d: Expected %d columns but found %d!"
+                          % (sample_sheet, line_nr, len(header), len(row)))
+            raise IOError("Invalid sample sheet!")
+
+        sample_data = {"paths": {}}
+        for (column_type, key), cell in zip(header, row):
+            cell = cell.strip()
+            if column_type == "paths" and header.count(("paths", key)) > 1:
+                sample_data["paths"].setdefault(key, [])
+                if cell != "":
+                    sample_data["paths"][key].append(cell)
+                continue
+
+            if cell == "":
+                column = "name" if column_type == "name" else key if column_type == "data" else "paths.%s" % key
+                logging.error("Sample sheet '%s' line %d: Column '%s' is empty!" % (sample_sheet, line_nr, column))
+                raise IOError("Invalid sample sheet!")
+
+            if column_type == "name":
+                sample_data["name"] = cell
+            elif column_type == "paths":
+                sample_data["paths"][key] = cell
+            else:
+                sample_data[key] = self.__parse_table_value(cell)
+
+        return sample_data
+
+    @staticmethod
+    def __parse_table_value(value):
+        # Values of table sample sheets are read as JSON values when possible (e.g. true, 3, 0.5) or as strings otherwise
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
@@ -0,0 +1,219 @@
+import os
+import re
+import logging
+import importlib
+from collections import OrderedDict
+
+from System.GAPipeline import GAPipeline
+from System.ChromeTrace import ChromeTrace
+from System.Graph import BatchScheduler, TaskCache
+from System.Datastore import ResourceKit
+from System.Validators import InputValidator
+from System.Platform import StorageHelper, DockerHelper
+from Modules import calibrate_throughput_models
+
+class GAPBatch(object):
+    # Batch of pipelines running the same graph on different sample sets under one scheduler and platform
+    # Pipelines share the platform's resources fairly, along with the helper processor and resource kit
+    # Each pipeline is named after its sample sheet and saves its output and report in its own output directory
+
+    def __init__(self, batch_id,
+                 graph_config,
+                 resource_kit_config,
+                 sample_data_configs,
+                 platform_config,
+                 platform_module,
+                 final_output_dir,
+                 runtime_reports=None,
+                 speculation_multiplier=None,
+                 cache_dir=None):
+
+        # Batch run id
+        self.batch_id       = batch_id
+
+        # Paths to config files shared by all pipelines
+        self.__res_kit_config       = resource_kit_config
+        self.__platform_config      = platform_config
+
+        # Name of platform class where tasks will be executed
+        self.__plat_module          = platform_module
+
+        # Final output directory. Each pipeline saves its output in a sub-directory named after its sample set
+        self.__final_output_dir     = final_output_dir
+
+        # Reports of previous runs used to estimate task runtimes
+        self.__runtime_reports      = runtime_reports
+
+        # Bucket prefix where task output is cached across runs (None = caching disabled)
+        self.__cache_dir            = cache_dir
+
+        # Pipeline run on each sample set: sample set name -> pipeline
+        self.pipelines = OrderedDict()
+        for sample_data_config in sample_data_configs:
+            name = GAPBatch.get_sample_set_name(sample_data_config)
+            if name in self.pipelines:
+                logging.error("Batch has more than one sample sheet named '%s'!" % name)
+                raise RuntimeError("Sample sheets of a batch must have unique file names!")
+
+            self.pipelines[name] = GAPipeline(pipeline_id="%s-%s" % (batch_id, name),
+                                              graph_config=graph_config,
+                                              resource_kit_config=resource_kit_config,
+                                              sample_data_config=sample_data_config,
+                                              platform_config=platform_config,
+                                              platform_module=platform_module,
+                                              final_output_dir=os.path.join(final_output_dir, name),
+                                              runtime_reports=runtime_reports,
+                                              speculation_multiplier=speculation_multiplier)
+
+        self.resource_kit   = None
+        self.platform       = None
+
+        # Cache of task output shared across runs
+        self.task_cache     = None
+
+        # Scheduler running the tasks of every pipeline
+        self.scheduler      = None
+
+        # Helper processor for handling platform operations
+        self.helper_processor   = None
+        self.storage_helper     = None
+        self.docker_helper      = None
+
+    def load(self):
+
+        # Load resource kit
+        self.resource_kit = ResourceKit(self.__res_kit_config)
+
+        # Load platform
+        plat_module     = importlib.import_module(self.__plat_module)
+        plat_class      = plat_module.__dict__[self.__plat_module]
+        self.platform   = plat_class(self.batch_id, self.__platform_config, self.__final_output_dir)
+
+        # Calibrate throughput models used to size splits from previous runs
+        if self.__runtime_reports is not None:
+            calibrate_throughput_models(self.__runtime_reports)
+        if self.__cache_dir is not None:
+            self.task_cache = TaskCache(self.__cache_dir)
+
+        # Load sample sets. Each pipeline gets its own share of the platform's resources
+        schedulers = []
+        for name, pipeline in self.pipelines.items():
+            pipeline.load_sample_set(self.resource_kit, self.platform, self.task_cache, share=name)
+            schedulers.append((name, pipeline.scheduler))
+        self.scheduler = BatchScheduler(schedulers, self.platform)
+
+    def validate(self):
+
+        # Validate every sample set and the graph run on it
+        has_errors = False
+        for name, pipeline in self.pipelines.items():
+            if pipeline.validate_sample_set():
+                logging.error("Sample set '%s' is invalid!" % name)
+                has_errors = True
+
+        # Validate the platform
+        self.platform.validate()
+
+        # Stop the batch before launching if there are any errors
+        if has_errors:
+            raise SystemError("One or more errors have been encountered during validation. "
+                              "See the above logs for more information")
+
+        # Create helper processor shared by all pipelines. Its cost is split evenly between them
+        self.helper_processor   = self.platform.get_helper_processor()
+        self.helper_processor.create()
+
+        self.storage_helper     = StorageHelper(self.helper_processor)
+        self.docker_helper      = DockerHelper(self.helper_processor)
+
+        for pipeline in self.pipelines.values():
+            pipeline.set_helper_processor(self.helper_processor, cost_share=1.0/len(self.pipelines))
+
+        # Validate resource kit once and the input of every sample set can be found on platform
+        sample_sets = [pipeline.sample_data for pipeline in self.pipelines.values()]
+        input_validator = InputValidator(self.resource_kit, sample_sets, self.storage_helper, self.docker_helper)
+        if input_validator.validate():
+            raise SystemError("One or more errors have been encountered during validation. "
+                              "See the above logs for more information")
+
+        # Validate that the workspace of every pipeline can be created
+        for pipeline in self.pipelines.values():
+            pipeline.create_workspace()
+        logging.info("CloudCounductor batch of %d sample sets validated! Beginning pipeline execution." % len(self.pipelines))
+
+    def run(self, rm_tmp_output_on_success=True):
+
+        # Run until all tasks of every pipeline are complete or their pipeline failed
+        self.scheduler.run()
+
+        # Remove temporary output of pipelines that completed successfully
+        errors = self.scheduler.get_errors()
+        if rm_tmp_output_on_success:
+            for name, pipeline in self.pipelines.items():
+                if name not in errors:
+                    pipeline.remove_tmp_output()
+
+        logging.info("%d of %d sample sets completed successfully!" % (len(self.pipelines) - len(errors), len(self.pipelines)))
+        if len(errors) > 0:
+            logging.error("The following sample sets failed: %s" % ", ".join(errors.keys()))
+            raise RuntimeError("%d of %d sample sets failed!" % (len(errors), len(self.pipelines)))
+
+    def save_progress(self, wait=False):
+        # Save progress of every pipeline so each one can be resumed on its own
+        for pipeline in self.pipelines.values():
+            pipeline.save_progress(wait=wait)
+
+    def publish_report(self, err=False, err_msg=None, git_version=None):
+        # Create and publish a report for each pipeline
+        # Pipelines that failed on their own report their own error. Unfinished pipelines report the error that stopped the batch.
+        errors = self.scheduler.get_errors() if self.scheduler is not None else {}
+        has_errors = False
+        for name, pipeline in self.pipelines.items():
+            if name in errors:
+                pipeline_err, pipeline_err_msg = True, str(errors[name])
+            elif pipeline.graph is not None and pipeline.graph.is_complete():
+                pipeline_err, pipeline_err_msg = False, None
+            else:
+                pipeline_err, pipeline_err_msg = err, err_msg
+
+            try:
+                pipeline.publish_report(err=pipeline_err, err_msg=pipeline_err_msg, git_version=git_version)
+            except BaseException:
+                logging.error("Unable to publish report of sample set '%s'!" % name)
+                has_errors = True
+
+        if has_errors:
+            raise RuntimeError("Unable to publish reports of one or more sample sets!")
+
+    def save_trace(self, trace_file):
+        # Save phases of the tasks of every pipeline in one Chrome trace with a process per pipeline
+        trace = ChromeTrace()
+        for pipeline in self.pipelines.values():
+            if pipeline.report is not None:
+                trace.add_report(pipeline.report.to_dict())
+        trace.save(trace_file)
+
+    def clean_up(self):
+        # Destroy the helper processor if it exists
+        if self.helper_processor is not None:
+            try:
+                logging.debug("Destroying helper processor...")
+                self.helper_processor.destroy(wait=False)
+            except BaseException as e:
+                logging.error("Unable to destroy helper processor '%s'!" % self.helper_processor.get_name())
+                if str(e) != "":
+                    logging.error("Received the follwoing err message:\n%s" % e)
+
+        # Cleaning up the platform (let the platform decide what that means)
+        if self.platform is not None:
+            self.platform.clean_up()
+
+    @staticmethod
+    def get_sample_set_name(sample_data_config):
+        # Return name of a sample set given the path to its sample sheet (file name without extension)
+        name = os.path.splitext(os.path.basename(sample_data_config))[0]
+        if re.match(r"^[A-Za-z0-9_-]+$", name) is None:
+            logging.error("Sample sheet '%s' can't be run in a batch! File names of sample sheets in a batch can only "
+                          "contain letters, digits, '_' and '-'." % sample_data_config)
+            raise RuntimeError("Invalid sample sheet name in batch!")
+        return name
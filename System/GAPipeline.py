@@ -3,10 +3,12 @@ import importlib
 import json
 from collections import OrderedDict
 
-from System.Graph import Graph, Scheduler
-from System.Datastore import ResourceKit, SampleSet, Datastore
+from System.Graph import Graph, Scheduler, RuntimeEstimator, CriticalPathPolicy, TaskCache
+from System.Datastore import ResourceKit, SampleSet, Datastore, GAPFile, RunState, RunStateWriter
 from System.Validators import GraphValidator, InputValidator, SampleValidator
 from System.Platform import StorageHelper, DockerHelper
+from System.ChromeTrace import ChromeTrace
+from Modules import calibrate_throughput_models
 
 class GAPipeline(object):
 
@@ -16,7 +18,11 @@ class GAPipeline(object):
                  sample_data_config,
                  platform_config,
                  platform_module,
-                 final_output_dir):
+                 final_output_dir,
+                 runtime_reports=None,
+                 speculation_multiplier=None,
+                 resume_state=None,
+                 cache_dir=None):
 
         # GAP run id
         self.pipeline_id    = pipeline_id
@@ -33,6 +39,18 @@ class GAPipeline(object):
         # Final output directory where output is saved
         self.__final_output_dir     = final_output_dir
 
+        # Reports of previous runs used to estimate task runtimes
+        self.__runtime_reports      = runtime_reports
+
+        # Multiple of the median sibling runtime after which split tasks get a backup copy (None = disabled)
+        self.__speculation_multiplier = speculation_multiplier
+
+        # Run state file saved by a previous run that the pipeline resumes from (None = run from scratch)
+        self.__resume_state         = resume_state
+
+        # Bucket prefix where task output is cached across runs (None = caching disabled)
+        self.__cache_dir            = cache_dir
+
         # Obtain pipeline name and append to final output dir
 
         self.graph          = None
@@ -46,15 +64,51 @@ class GAPipeline(object):
         # Task scheduler for running jobs
         self.scheduler = None
 
+        # Cache of task output shared across runs
+        self.task_cache = None
+
         # Helper processor for handling platform operations
         self.helper_processor   = None
         self.storage_helper     = None
         self.docker_helper      = None
 
+        # Fraction of the helper processor's cost accounted to the pipeline (less than 1 if the helper is shared)
+        self.helper_cost_share  = 1.0
+
+        # Last report published for the pipeline
+        self.report = None
+
+        # Writer publishing the run state in the background and number of completed tasks added to it so far
+        self.run_state_writer   = None
+        self.__nr_saved_tasks   = 0
+
+        # Tasks whose output was restored from the run state of a previous run
+        self.__resumed_tasks    = []
+
     def load(self):
 
         # Load resource kit
-        self.resource_kit = ResourceKit(self.__res_kit_config)
+        resource_kit = ResourceKit(self.__res_kit_config)
+
+        # Load platform
+        plat_module     = importlib.import_module(self.__plat_module)
+        plat_class      = plat_module.__dict__[self.__plat_module]
+        platform        = plat_class(self.pipeline_id, self.__platform_config, self.__final_output_dir)
+
+        # Calibrate throughput models used to size splits from previous runs
+        if self.__runtime_reports is not None:
+            calibrate_throughput_models(self.__runtime_reports)
+        task_cache = TaskCache(self.__cache_dir) if self.__cache_dir is not None else None
+
+        self.load_sample_set(resource_kit, platform, task_cache)
+
+    def load_sample_set(self, resource_kit, platform, task_cache=None, share=None):
+        # Load the sample data and graph run on it and create the datastore and scheduler
+        # Resource kit, platform and task cache can be shared with other pipelines of a batch
+
+        self.resource_kit   = resource_kit
+        self.platform       = platform
+        self.task_cache     = task_cache
 
         # Load the sample data
         self.sample_data = SampleSet(self.__sample_set_config)
@@ -62,17 +116,51 @@ class GAPipeline(object):
         # Load the graph
         self.graph = Graph(self.__graph_config)
 
-        # Load platform
-        plat_module     = importlib.import_module(self.__plat_module)
-        plat_class      = plat_module.__dict__[self.__plat_module]
-        self.platform   = plat_class(self.pipeline_id, self.__platform_config, self.__final_output_dir)
-
         # Create datastore and scheduler
-        self.datastore = Datastore(self.graph, self.resource_kit, self.sample_data, self.platform)
-        self.scheduler = Scheduler(self.graph, self.datastore, self.platform)
+        self.datastore = Datastore(self.graph, self.resource_kit, self.sample_data, self.platform,
+                                   final_output_dir=self.__final_output_dir)
+        priority_policy = CriticalPathPolicy(self.graph, RuntimeEstimator(self.__runtime_reports))
+        self.scheduler = Scheduler(self.graph, self.datastore, self.platform,
+                                   priority_policy=priority_policy,
+                                   speculation_multiplier=self.__speculation_multiplier,
+                                   progress_callback=self.save_progress,
+                                   task_cache=self.task_cache,
+                                   share=share)
 
     def validate(self):
 
+        # Validate the sample set and graph
+        has_errors = self.validate_sample_set()
+
+        # Validate the platform
+        self.platform.validate()
+
+        # Stop the pipeline before launching if there are any errors
+        if has_errors:
+            raise SystemError("One or more errors have been encountered during validation. "
+                              "See the above logs for more information")
+
+        # Create helper processor and storage/docker helpers for checking input files
+        helper_processor = self.platform.get_helper_processor()
+        helper_processor.create()
+        self.set_helper_processor(helper_processor)
+
+        # Validate all pipeline inputs can be found on platform
+        input_validator = InputValidator(self.resource_kit, self.sample_data, self.storage_helper, self.docker_helper)
+        has_errors = input_validator.validate() or has_errors
+
+        # Stop the pipeline if there are any errors
+        if has_errors:
+            raise SystemError("One or more errors have been encountered during validation. "
+                              "See the above logs for more information")
+
+        # Validate that pipeline workspace can be created
+        self.create_workspace()
+        logging.info("CloudCounductor run validated! Beginning pipeline execution.")
+
+    def validate_sample_set(self):
+        # Validate the sample set and the graph run on it. Return True if there are errors
+
         # Assume all validations are working
         has_errors = False
 
@@ -88,65 +176,89 @@ class GAPipeline(object):
         if not has_errors:
             logging.debug("Graph validated!")
 
-        # Validate the platform
-        self.platform.validate()
+        return has_errors
 
-        # Stop the pipeline before launching if there are any errors
-        if has_errors:
-            raise SystemError("One or more errors have been encountered during validation. "
-                              "See the above logs for more information")
-
-        # Create helper processor and storage/docker helpers for checking input files
-        self.helper_processor   = self.platform.get_helper_processor()
-        self.helper_processor.create()
+    def set_helper_processor(self, helper_processor, cost_share=1.0):
+        # Set helper processor and storage/docker helpers used for platform operations
+        self.helper_processor   = helper_processor
+        self.helper_cost_share  = cost_share
 
         self.storage_helper     = StorageHelper(self.helper_processor)
         self.docker_helper      = DockerHelper(self.helper_processor)
 
-        # Validate all pipeline inputs can be found on platform
-        input_validator = InputValidator(self.resource_kit, self.sample_data, self.storage_helper, self.docker_helper)
-        has_errors = input_validator.validate() or has_errors
-
-        # Stop the pipeline if there are any errors
-        if has_errors:
-            raise SystemError("One or more errors have been encountered during validation. "
-                              "See the above logs for more information")
+        # Task cache is accessed through the helper processor
+        if self.task_cache is not None:
+            self.task_cache.set_helpers(self.storage_helper, self.docker_helper)
 
+    def create_workspace(self):
         # Validate that pipeline workspace can be created
         workspace = self.datastore.get_task_workspace()
         for dir_type, dir_path in workspace.get_workspace().items():
             self.storage_helper.mkdir(dir_path=str(dir_path), job_name="mkdir_%s" % dir_type, wait=True)
-        logging.info("CloudCounductor run validated! Beginning pipeline execution.")
 
     def run(self, rm_tmp_output_on_success=True):
+        # Skip tasks completed by a previous run
+        if self.__resume_state is not None:
+            self.__resume()
+
         # Run until all tasks are complete
         self.scheduler.run()
 
         # Remove temporary output on success
         if rm_tmp_output_on_success:
-            workspace = self.datastore.get_task_workspace()
-            try:
-                self.storage_helper.rm(path=workspace.get_tmp_output_dir(), job_name="rm_tmp_output", wait=True)
-            except BaseException as e:
-                logging.error("Unable to remove tmp output directory: %s" % workspace.get_tmp_output_dir())
-                if str(e) != "":
-                    logging.error("Received the following err message:\n%s" % e)
+            self.remove_tmp_output()
 
-    def save_progress(self):
-        pass
+    def remove_tmp_output(self):
+        workspace = self.datastore.get_task_workspace()
+        try:
+            self.storage_helper.rm(path=workspace.get_tmp_output_dir(), job_name="rm_tmp_output", wait=True)
+        except BaseException as e:
+            logging.error("Unable to remove tmp output directory: %s" % workspace.get_tmp_output_dir())
+            if str(e) != "":
+                logging.error("Received the following err message:\n%s" % e)
+
+    def save_progress(self, wait=False):
+        # Save the expanded graph and the arguments and output of completed tasks so the run can be resumed
+        # Only tasks completed since the last save are added. The run state is published in the background unless
+        # wait is set, in which case it's published right away
+        if self.graph is None or self.platform is None:
+            return
+        try:
+            if self.run_state_writer is None:
+                self.run_state_writer = RunStateWriter(self.pipeline_id, self.platform, self.__final_output_dir)
+
+            completed_tasks = self.graph.completed_tasks[self.__nr_saved_tasks:]
+            self.__nr_saved_tasks += len(completed_tasks)
+            self.run_state_writer.add_tasks([self.graph.get_tasks(task_id) for task_id in completed_tasks
+                                             if task_id in self.graph.get_tasks()])
+            self.run_state_writer.set_graph(self.graph, force=wait)
+            self.run_state_writer.save(wait=wait)
+        except BaseException as e:
+            # Failing to save progress shouldn't stop the pipeline
+            logging.error("Unable to save progress!")
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
 
     def publish_report(self, err=False, err_msg=None, git_version=None):
         # Create and publish GAP pipeline report
         try:
             report = self.__make_pipeline_report(err, err_msg, git_version)
+            self.report = report
             if self.platform is not None:
-                self.platform.publish_report(report)
+                self.platform.publish_report(report, name=self.pipeline_id, output_dir=self.__final_output_dir)
         except BaseException as e:
             logging.error("Unable to publish report!")
             if str(e) != "":
                 logging.error("Received the following message:\n%s" % e)
             raise
 
+    def save_trace(self, trace_file):
+        # Save phases of every task in the published report as a Chrome trace
+        trace = ChromeTrace()
+        if self.report is not None:
+            trace.add_report(self.report.to_dict())
+        trace.save(trace_file)
+
     def clean_up(self):
         # Destroy the helper processor if it exists
         if self.helper_processor is not None:
@@ -162,6 +274,50 @@ class GAPipeline(object):
         if self.platform is not None:
             self.platform.clean_up()
 
+    def __resume(self):
+        # Complete tasks of a previous run in the order they completed if their output still exists
+        # Completing the tasks again re-creates the splits and partial merges of the previous run
+        run_state = RunState.load(self.__resume_state, storage_helper=self.storage_helper)
+        nr_resumed = 0
+        for task_id in run_state.get_completed_tasks():
+
+            # Task can be missing if its splitter had to be re-run
+            if task_id not in self.graph.get_tasks():
+                logging.debug("Task '%s' completed in previous run is not part of the graph!" % task_id)
+                continue
+
+            # Task that depends on a task that has to be re-run has to be re-run as well
+            task = self.graph.get_tasks(task_id)
+            if task.is_complete() or not self.graph.parents_complete(task_id):
+                continue
+
+            # Re-run task if any of its output no longer exists
+            output_files = run_state.get_output_files(task_id)
+            if not all([self.storage_helper.path_exists(output_file.get_transferrable_path())
+                        for output_file in output_files]):
+                logging.info("Output of task '%s' from previous run is missing! Task will be re-run." % task_id)
+                continue
+
+            # Restore resolved arguments and output of task
+            module = task.get_module()
+            for arg_key, arg_value in run_state.get_args(task_id).items():
+                if arg_key in module.get_arguments():
+                    module.set_argument(arg_key, arg_value)
+            module.output = run_state.get_output(task_id)
+
+            # Split subgraph if task is a splitter
+            if task.is_splitter_task():
+                self.graph.split_graph(task_id)
+
+            self.graph.complete_task(task_id)
+            for child_id in self.graph.get_children(task_id):
+                self.graph.merge_incrementally(child_id)
+            self.__resumed_tasks.append(task_id)
+            nr_resumed += 1
+
+        self.scheduler.priority_policy.reset()
+        logging.info("Resumed %d tasks completed by previous run '%s'." % (nr_resumed, run_state.pipeline_id))
+
     def __make_pipeline_report(self, err, err_msg, git_version):
 
         # Create a pipeline report that summarizes features of pipeline
@@ -174,7 +330,15 @@ class GAPipeline(object):
             report.register_task(task_name="Helper",
                                  start_time=self.helper_processor.get_start_time(),
                                  run_time=self.helper_processor.get_runtime(),
-                                 cost=self.helper_processor.compute_cost())
+                                 cost=self.helper_processor.compute_cost() * self.helper_cost_share)
+
+        # Register processor reuse statistics
+        if self.platform is not None:
+            report.set_processor_pool_stats(self.platform.get_processor_pool_stats())
+
+        # Register task cache statistics
+        if self.task_cache is not None:
+            report.set_task_cache_stats(self.task_cache.get_stats())
 
         # Register runtime data for pipeline tasks
         if self.scheduler is not None:
@@ -182,12 +346,33 @@ class GAPipeline(object):
             for task_name, task_worker in task_workers.items():
 
                 # Register data about task runtime
-                task        = task_worker.get_task()
+                task        = task_worker.get_task(task_name)
                 run_time    = task_worker.get_runtime()
                 cost        = task_worker.get_cost()
                 start_time  = task_worker.get_start_time()
-                cmd         = task_worker.get_cmd()
-                task_data   = {"parent_task" : task_name.split(".")[0]}
+                cmd         = task_worker.get_cmd(task_name)
+                task_data   = {"parent_task" : task_name.split(".")[0],
+                               "module" : task.get_module().__class__.__name__}
+
+                # Record vCPUs and number of input bases so aligner throughput can be calibrated from the report
+                nr_bases = self.__get_nr_input_bases(task)
+                if nr_bases is not None:
+                    task_data["nr_cpus"]    = task.get_module().get_argument("nr_cpus")
+                    task_data["nr_bases"]   = nr_bases
+
+                # Record whether task output was restored from the task cache
+                if self.task_cache is not None:
+                    task_data["cache_hit"] = task_worker.is_cache_hit()
+
+                # Record time spent in each phase of the task worker (fused tasks are part of the same timeline)
+                if task is task_worker.get_task():
+                    task_data["phases"] = task_worker.get_timeline().get_phases(report.start_time)
+
+                # Runtime and cost of fused tasks are accounted to the task they were fused with
+                if task is not task_worker.get_task():
+                    run_time    = 0
+                    cost        = 0
+                    task_data["fused_with"] = task_worker.get_task().get_ID()
                 report.register_task(task_name=task_name,
                                      start_time=start_time,
                                      run_time=run_time,
@@ -196,20 +381,54 @@ class GAPipeline(object):
                                      task_data=task_data)
 
                 # Register data about task output files
-                if task.is_complete():
-                    output_files = self.datastore.get_task_output_files(task_id=task_name)
-                    for output_file in output_files:
-                        file_type       = output_file.get_type()
-                        file_path       = output_file.get_path()
-                        is_final_output = file_type in task.get_final_output_keys()
-                        file_size       = output_file.get_size()
-                        if is_final_output or err:
-                            # Only declare output files if file is final output file
-                            # OR file is temporary output file but pipeline failed
-                            report.register_output_file(task_name, file_type, file_path, file_size, is_final_output)
+                self.__register_output_files(report, task, err)
+
+            # Register tasks completed by a previous run. They weren't run again so they have no runtime or cost
+            for task_name in self.__resumed_tasks:
+                if task_name in task_workers or task_name not in self.graph.get_tasks():
+                    continue
+                task        = self.graph.get_tasks(task_name)
+                task_data   = {"parent_task" : task_name.split(".")[0],
+                               "module" : task.get_module().__class__.__name__,
+                               "resumed" : True}
+                report.register_task(task_name=task_name,
+                                     start_time=None,
+                                     run_time=0,
+                                     cost=0,
+                                     task_data=task_data)
+
+                # Output restored from the run state of the previous run
+                self.__register_output_files(report, task, err)
 
         return report
 
+    def __register_output_files(self, report, task, err):
+        # Register output files of a completed task in the report
+        if not task.is_complete():
+            return
+        task_name = task.get_ID()
+        output_files = self.datastore.get_task_output_files(task_id=task_name)
+        for output_file in output_files:
+            file_type       = output_file.get_type()
+            file_path       = output_file.get_path()
+            is_final_output = file_type in task.get_final_output_keys()
+            file_size       = output_file.get_size()
+            if is_final_output or err:
+                # Only declare output files if file is final output file
+                # OR file is temporary output file but pipeline failed
+                report.register_output_file(task_name, file_type, file_path, file_size, is_final_output)
+
+    @staticmethod
+    def __get_nr_input_bases(task):
+        # Return total number of bases in task input files that declare it (None if no input file declares it)
+        nr_bases = None
+        for argument in task.get_module().get_arguments().values():
+            values = argument.get_value() if isinstance(argument.get_value(), list) else [argument.get_value()]
+            for value in values:
+                if isinstance(value, GAPFile) and value.has_metadata_type("nr_bases"):
+                    nr_bases = value.get_metadata("nr_bases") + (0 if nr_bases is None else nr_bases)
+        return nr_bases
+
 
 class GAPReport(object):
     # Object for holding metadata related to a GAP pipeline run
@@ -239,6 +458,12 @@ class GAPReport(object):
         # Processors used by modules
         self.tasks = []
 
+        # Statistics on processors reused across tasks
+        self.processor_pool_stats = None
+
+        # Statistics on task output restored from the task cache
+        self.task_cache_stats = None
+
     @property
     def total_processing_time(self):
         proc_time = 0
@@ -274,6 +499,12 @@ class GAPReport(object):
     def set_total_runtime(self, total_runtime):
         self.total_runtime = total_runtime
 
+    def set_processor_pool_stats(self, processor_pool_stats):
+        self.processor_pool_stats = processor_pool_stats
+
+    def set_task_cache_stats(self, task_cache_stats):
+        self.task_cache_stats = task_cache_stats
+
     def register_task(self, task_name, start_time, run_time, cost, cmd=None, task_data=None):
         # Register information about a specific processor in the report
 
@@ -314,6 +545,10 @@ class GAPReport(object):
         report["total_runtime"] = self.total_runtime
         report["total_proc_time"] = self.total_processing_time
         report["total_output_size"] = self.total_output_size
+        if self.processor_pool_stats is not None:
+            report["processor_pool"] = self.processor_pool_stats
+        if self.task_cache_stats is not None:
+            report["task_cache"] = self.task_cache_stats
         report["files"] = self.output_files
         report["tasks"] = self.tasks
         return report
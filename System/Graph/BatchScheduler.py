@@ -0,0 +1,114 @@
+import logging
+import queue
+from collections import OrderedDict
+
+from System.Graph import Scheduler, TaskWorker
+
+class BatchScheduler(object):
+    # Runs the graphs of several pipelines on the same platform from a single thread
+    # Task workers of every pipeline post themselves to one queue so tasks are launched and finalized as soon as any
+    # pipeline makes progress. A pipeline that fails is stopped without stopping the other pipelines of the batch.
+    # Its tasks are cancelled without waiting for them, and its task workers are finalized as they stop.
+
+    def __init__(self, schedulers, platform):
+
+        # Schedulers of the pipelines in the batch: pipeline name -> scheduler
+        self.schedulers = OrderedDict(schedulers)
+
+        # Platform shared by the pipelines
+        self.platform = platform
+
+        # Queue where task workers of every pipeline post themselves as soon as they finish running
+        self.finished_workers = self.platform.make_queue()
+        for scheduler in self.schedulers.values():
+            scheduler.finished_workers = self.finished_workers
+
+        # Errors that stopped pipelines: pipeline name -> error
+        self.errors = OrderedDict()
+
+        # Wake up periodically to look for stragglers if any pipeline uses speculative execution
+        self.speculation_interval = None
+        if any([scheduler.speculation_multiplier is not None for scheduler in self.schedulers.values()]):
+            self.speculation_interval = Scheduler.SPECULATION_INTERVAL
+
+    def get_errors(self):
+        return self.errors
+
+    def run(self):
+        try:
+            self.__run_tasks()
+        finally:
+            self.__finalize()
+
+    def __run_tasks(self):
+        # Execute tasks until every pipeline has either completed or failed
+        while True:
+
+            # Launch tasks of each pipeline that became ready since the last check
+            running = self.__get_running()
+            for name, scheduler in running.items():
+                try:
+                    scheduler.launch_ready_tasks()
+                except BaseException as e:
+                    self.__stop_pipeline(name, e)
+
+            running = self.__get_running()
+            if len(running) == 0:
+                return
+
+            # Block until at least one task worker finishes then finalize every worker that has finished since
+            try:
+                task_worker = self.finished_workers.get(timeout=self.speculation_interval)
+            except queue.Empty:
+                for name, scheduler in running.items():
+                    try:
+                        scheduler.launch_backup_tasks()
+                    except BaseException as e:
+                        self.__stop_pipeline(name, e)
+                continue
+
+            task_workers = [task_worker]
+            while True:
+                try:
+                    task_workers.append(self.finished_workers.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Hand each finished task worker to the pipeline that launched it
+            for name in self.errors:
+                scheduler = self.schedulers[name]
+                scheduler.finalize_stopped_workers([task_worker for task_worker in task_workers
+                                                    if scheduler.owns(task_worker)])
+
+            for name, scheduler in running.items():
+                owned_workers = [task_worker for task_worker in task_workers
+                                 if task_worker.get_status() is not TaskWorker.FINALIZED and scheduler.owns(task_worker)]
+                if len(owned_workers) == 0:
+                    continue
+                try:
+                    scheduler.finalize_task_workers(owned_workers)
+                except BaseException as e:
+                    self.__stop_pipeline(name, e)
+                    scheduler.finalize_stopped_workers(owned_workers)
+
+    def __get_running(self):
+        # Return schedulers of pipelines that have neither completed nor failed
+        return OrderedDict([(name, scheduler) for name, scheduler in self.schedulers.items()
+                            if name not in self.errors and not scheduler.is_complete()])
+
+    def __stop_pipeline(self, name, err):
+        # Stop a failed pipeline without stopping the rest of the batch
+        logging.error("Pipeline '%s' failed! Stopping its tasks." % name)
+        if str(err) != "":
+            logging.error("Received the following message:\n%s" % err)
+        self.errors[name] = err
+        self.schedulers[name].cancel()
+
+    def __finalize(self):
+
+        # Prevent any new processors from being created on platform
+        self.platform.lock()
+
+        # Cancel still-running tasks of every pipeline and finalize all task workers
+        for name, scheduler in self.schedulers.items():
+            scheduler.stop()
@@ -1,4 +1,5 @@
 import logging
+import math
 from collections import OrderedDict
 
 from Config import ConfigParser
@@ -19,9 +20,34 @@ class Graph(object):
         # Check validity of adjacency list
         self.__check_adjacency_list()
 
+        # Index forward (parent -> children) and reverse (child -> parents) edges for constant-time lookups
+        self.children, self.parents = self.__index_edges()
+
+        # Track number of incomplete parents per task, tasks ready to be launched, and number of unfinished tasks
+        # so that scheduling only touches tasks whose state changes
+        self.pending_parents, self.ready_tasks, self.nr_unfinished = self.__index_task_states()
+
+        # Tasks replaced by their splits that are waiting to be removed from the graph
+        self.deprecated_tasks = OrderedDict()
+
+        # Partial merges created for each incremental merger task
+        self.partial_merges = {}
+
+        # Backup copies of running tasks
+        self.backup_tasks = set()
+
+        # Ids of completed tasks in the order they completed
+        self.completed_tasks = []
+
         # Check for cycles
         self.__check_cycles()
 
+        # Check that fused tasks form linear chains
+        self.__check_fuse_groups()
+
+        # Check that incremental merging is only requested for mergers that can merge their input in parts
+        self.__check_merge_groups()
+
     def add_task(self, task):
         # Connect new node to existing graph
         if task.get_ID() in self.tasks:
@@ -31,6 +57,14 @@ class Graph(object):
         # Add new node to nodelist
         self.tasks[task.get_ID()] = task
         self.adj_list[task.get_ID()] = []
+        self.children[task.get_ID()] = OrderedDict()
+        self.parents[task.get_ID()] = set()
+
+        # Update task states
+        self.pending_parents[task.get_ID()] = 0
+        if not task.is_complete():
+            self.nr_unfinished += 1
+            self.__update_ready(task.get_ID())
 
     def remove_task(self, task_id):
         # Remove node and all edges from Graph
@@ -39,13 +73,59 @@ class Graph(object):
             raise RuntimeError("Graph Error: Attempt to remove non-existant task from graph!")
 
         # Remove node from vertice list
-        self.tasks.pop(task_id)
-        self.adj_list.pop(task_id)
-
-        # Remove all references to node in adjacency list
-        for adj_list in self.adj_list.values():
-            if task_id in adj_list:
-                adj_list.remove(task_id)
+        task = self.tasks.pop(task_id)
+        parents = self.adj_list.pop(task_id)
+        children = self.children.pop(task_id)
+        self.parents.pop(task_id)
+
+        # Remove all references to node from the edges of its neighbors
+        for parent_id in parents:
+            self.children[parent_id].pop(task_id, None)
+        for child_id in children:
+            self.adj_list[child_id].remove(task_id)
+            self.parents[child_id].discard(task_id)
+
+        # Remove node from task states and release children waiting on it
+        self.pending_parents.pop(task_id)
+        self.ready_tasks.pop(task_id, None)
+        if not task.is_complete():
+            self.nr_unfinished -= 1
+            for child_id in children:
+                self.pending_parents[child_id] -= 1
+                self.__update_ready(child_id)
+
+    def add_backup_task(self, backup_task, task_id):
+        # Add backup copy of a task that receives input from the same parents
+        # Backup tasks have no children and never become ready so they don't change the state of the graph
+        # Backups are only made of running tasks so their parents have already completed
+        backup_id = backup_task.get_ID()
+        if backup_id in self.tasks:
+            logging.error("Graph Error: Attempt to add duplicate task to graph: %s" % backup_id)
+            raise RuntimeError("Cannot add task with duplicate ID to graph!")
+        self.tasks[backup_id] = backup_task
+        self.adj_list[backup_id] = list(self.adj_list[task_id])
+        self.children[backup_id] = OrderedDict()
+        self.parents[backup_id] = set(self.parents[task_id])
+        self.pending_parents[backup_id] = 0
+
+        self.backup_tasks.add(backup_id)
+
+        # Index backup as a child of its parents so the graph stays consistent when it's validated after a split
+        for parent_id in self.adj_list[backup_id]:
+            self.children[parent_id][backup_id] = None
+
+    def remove_backup_task(self, backup_id):
+        # Remove backup copy of a task from the graph
+        if backup_id not in self.tasks:
+            logging.error("Attempt to remove non-existant backup task from Graph: %s" % backup_id)
+            raise RuntimeError("Graph Error: Attempt to remove non-existant task from graph!")
+        self.tasks.pop(backup_id)
+        for parent_id in self.adj_list.pop(backup_id):
+            self.children[parent_id].pop(backup_id, None)
+        self.children.pop(backup_id)
+        self.parents.pop(backup_id)
+        self.pending_parents.pop(backup_id)
+        self.backup_tasks.discard(backup_id)
 
     def add_dependency(self, child_task_id, parent_task_id):
         # Adds dependency where dep_nod_id must wait until ind_node_id is finished
@@ -58,24 +138,71 @@ class Graph(object):
 
         # Add dependency
         self.adj_list[child_task_id].append(parent_task_id)
+        self.parents[child_task_id].add(parent_task_id)
+        self.children[parent_task_id][child_task_id] = None
+
+        # Child must now also wait for parent to complete
+        if not self.tasks[parent_task_id].is_complete():
+            self.pending_parents[child_task_id] += 1
+            self.ready_tasks.pop(child_task_id, None)
+
+    def remove_dependency(self, child_task_id, parent_task_id):
+        # Removes dependency so that child task no longer receives input from parent task
+        if child_task_id not in self.tasks or not self.has_dependency(child_task_id, parent_task_id):
+            logging.error("Unable to remove dependency from graph! Task '%s' doesn't receive input from '%s'!"
+                          % (child_task_id, parent_task_id))
+            raise RuntimeError("Attempt to remove non-existant edge from graph!")
+
+        # Remove dependency
+        self.adj_list[child_task_id].remove(parent_task_id)
+        self.parents[child_task_id].discard(parent_task_id)
+        self.children[parent_task_id].pop(child_task_id)
+
+        # Child no longer waits for parent to complete
+        if not self.tasks[parent_task_id].is_complete():
+            self.pending_parents[child_task_id] -= 1
+            self.__update_ready(child_task_id)
+
+    def has_dependency(self, child_task_id, parent_task_id):
+        # Return true if child task already receives input from parent task
+        return parent_task_id in self.parents[child_task_id]
 
     def get_tasks(self, task_id=None):
         if task_id is None:
             return self.tasks
         return self.tasks[task_id]
 
+    def get_completed_tasks(self):
+        # Return completed tasks in the order they completed
+        return [self.tasks[task_id] for task_id in self.completed_tasks if task_id in self.tasks]
+
     def get_unfinished_tasks(self):
         return [task for task in list(self.tasks.values()) if not task.is_complete()]
 
+    def pop_ready_tasks(self):
+        # Return tasks that became ready to run since the last call
+        ready_tasks = [self.tasks[task_id] for task_id in self.ready_tasks]
+        self.ready_tasks.clear()
+        return ready_tasks
+
+    def complete_task(self, task_id):
+        # Mark task as complete and update the state of its children
+        task = self.tasks[task_id]
+        if task.is_complete():
+            return
+        task.set_complete(True)
+        self.completed_tasks.append(task_id)
+        self.nr_unfinished -= 1
+        self.ready_tasks.pop(task_id, None)
+        for child_id in self.children[task_id]:
+            self.pending_parents[child_id] -= 1
+            self.__update_ready(child_id)
+
     def get_children(self, task_id):
         if task_id not in self.tasks:
             logging.error("Cannot list children for non-existant task: %s" % task_id)
             raise RuntimeError("Graph Error: Attempt to get children from nonexistant task!")
-        dependents = []
-        for task, edges in self.adj_list.items():
-            if task_id in edges:
-                dependents.append(task)
-        return dependents
+        return list(self.children[task_id])
 
     def get_parents(self, task_id):
         if task_id not in self.tasks:
@@ -84,17 +211,127 @@ class Graph(object):
         return [x for x in self.adj_list[task_id]]
 
     def is_complete(self):
-        return len(self.get_unfinished_tasks()) < 1
+        return self.nr_unfinished < 1
 
-    def parents_complete(self, task_id):
+    def parents_complete(self, task_id, ready_parents=None):
         # Determine if all task parents have completed
-        parents = self.get_parents(task_id)
-        return len(parents) == len([x for x in parents if self.get_tasks(x).is_complete()])
+        # Parents in ready_parents have produced their output but haven't been marked complete yet (e.g. fused tasks)
+        if task_id not in self.tasks:
+            logging.error("Cannot check parent tasks for non-existant task: %s" % task_id)
+            raise RuntimeError("Graph Error: Attempt to check parents of nonexistant task!")
+        if ready_parents is None:
+            return self.pending_parents[task_id] == 0
+        return all([self.tasks[parent_id].is_complete() or parent_id in ready_parents
+                    for parent_id in self.adj_list[task_id]])
+
+    def get_fused_chain(self, task_id):
+        # Return the linear chain of tasks starting at task_id that should be run together on a single processor
+        # Chain follows the only child in the same fuse group as long as that child has no other parent
+        # Splitters end the chain as the graph downstream of them changes once they complete
+        chain = [task_id]
+        fuse_group = self.tasks[task_id].get_fuse_group()
+        if fuse_group is None:
+            return chain
+
+        curr_task_id = task_id
+        while not self.tasks[curr_task_id].is_splitter_task():
+            fused_children = [child_id for child_id in self.children[curr_task_id]
+                              if self.tasks[child_id].get_fuse_group() == fuse_group]
+            if len(fused_children) != 1:
+                break
+
+            child_id = fused_children[0]
+            child = self.tasks[child_id]
+            if len(self.parents[child_id]) != 1 or child.is_complete() or child.is_deprecated():
+                break
+
+            chain.append(child_id)
+            curr_task_id = child_id
+
+        return chain
+
+    def merge_incrementally(self, task_id):
+        # Group finished splits of an incremental merger into partial merges while other splits are still running
+        # The merger then merges the output of the partial merges instead of the splits they replaced
+        # Returns ids of new partial merge tasks
+        task = self.tasks[task_id]
+        group_size = task.get_merge_group_size()
+        if group_size is None or task.is_complete() or task.is_deprecated() or task_id in self.backup_tasks:
+            return []
+
+        # Get splits whose tasks have all finished
+        splits = self.__get_merged_splits(task_id)
+        finished_splits = [parent_ids for parent_ids in splits
+                           if all([self.tasks[parent_id].is_complete() for parent_id in parent_ids])]
+
+        # Once every split has finished the merger merges the remaining splits itself
+        # as an extra partial merge would only lengthen the critical path
+        partial_ids = []
+        nr_running = len(splits) - len(finished_splits)
+        while nr_running > 0 and len(finished_splits) >= group_size:
+            parent_ids = [parent_id for split in finished_splits[:group_size] for parent_id in split]
+            finished_splits = finished_splits[group_size:]
+            partial_ids.append(self.__add_partial_merge(task_id, parent_ids))
+
+        return partial_ids
+
+    def __get_merged_splits(self, task_id):
+        # Return parents of a merger grouped by the split they belong to
+        # Only split tasks providing the merged input are included
+        # A split can pass input to the merger through more than one task (e.g. bam from one task and bam_idx from another)
+        partial_merges = self.partial_merges.get(task_id, [])
+        merge_keys = set(self.tasks[task_id].get_merge_keys())
+        splits = OrderedDict()
+        for parent_id in self.adj_list[task_id]:
+            parent = self.tasks[parent_id]
+            if not parent.is_split() or parent_id in partial_merges or merge_keys.isdisjoint(parent.get_output_keys()):
+                continue
+            splits.setdefault((parent.get_splitter(), parent.get_split_id()), []).append(parent_id)
+        return list(splits.values())
+
+    def __add_partial_merge(self, task_id, parent_ids):
+        # Add partial merge of a merger task that replaces a subset of the merger's parents
+        partial_merges = self.partial_merges.setdefault(task_id, [])
+        partial_id = "%s.partial_%d" % (task_id, len(partial_merges) + 1)
+        self.add_task(self.tasks[task_id].make_partial_merge(partial_id))
+        for parent_id in parent_ids:
+            self.remove_dependency(task_id, parent_id)
+            self.add_dependency(partial_id, parent_id)
+        self.add_dependency(task_id, partial_id)
+        partial_merges.append(partial_id)
+        return partial_id
+
+    def __build_merge_tree(self, task_id):
+        # Expand a merger receiving more splits than its maximum fan-in into a balanced tree of partial merges
+        # Each partial merge merges a contiguous block of splits so the order of the merged input is preserved
+        task = self.tasks[task_id]
+        max_fan_in = task.get_max_fan_in()
+        if max_fan_in is None or not task.can_merge_partially():
+            return
+
+        merge_units = self.__get_merged_splits(task_id)
+        while len(merge_units) > max_fan_in:
+            # Spread units as evenly as possible over the smallest number of partial merges
+            nr_groups = int(math.ceil(len(merge_units) / float(max_fan_in)))
+            group_size, nr_larger = divmod(len(merge_units), nr_groups)
+            next_units = []
+            start = 0
+            for i in range(nr_groups):
+                end = start + group_size + (1 if i < nr_larger else 0)
+                parent_ids = [parent_id for unit in merge_units[start:end] for parent_id in unit]
+                next_units.append([self.__add_partial_merge(task_id, parent_ids)])
+                start = end
+            merge_units = next_units
+
+        if task_id in self.partial_merges:
+            logging.debug("Merging input of task '%s' through %d partial merges (max fan-in: %d)"
+                          % (task_id, len(self.partial_merges[task_id]), max_fan_in))
 
     def split_graph(self, splitter_task_id):
         # Recursively split tasks downstream of 'head_task' until a closing merge is reached
         child_tasks = self.get_children(splitter_task_id)
         splitter_task = self.tasks[splitter_task_id]
+        split_task_ids = set()
         for split_id in splitter_task.module.get_output():
             # Create new graph partition for each new split
             split = splitter_task.module.get_output(split_id=split_id)
@@ -102,11 +339,13 @@ class Graph(object):
             # If no visible samples declared, split nodes inherit visible samples from splitter task
             visible_samples = split["visible_samples"] if split["visible_samples"] is not None else splitter_task.get_visible_samples()
             for child_task in child_tasks:
-                child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples)
+                child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples,
+                                                    split_task_ids=split_task_ids)
                 self.add_dependency(child_split, splitter_task_id)
 
-        # Loop through deprecated tasks and give upstream dependencies for parent tasks that weren't in splitter's subtree
-        for task in self.__deprecated_tasks:
+        # Loop through tasks deprecated by this split and give upstream dependencies for parent tasks that weren't in splitter's subtree
+        deprecated_task_ids = list(self.deprecated_tasks)
+        for task in deprecated_task_ids:
             # Get parents of deprecated task
             parents = self.get_parents(task)
             for parent in parents:
@@ -114,22 +353,26 @@ class Graph(object):
                 # Add that dependency for all a tasks's newly created daughter splits
                 if not self.tasks[parent].is_deprecated() and parent != splitter_task_id:
                     for clone_task_id in self.tasks[task].get_clones():
-                        if parent not in self.get_parents(clone_task_id):
+                        if not self.has_dependency(clone_task_id, parent):
                             self.add_dependency(clone_task_id, parent)
 
-            # Remove deprecated task from graph completely
-            #self.remove_task(task)
-
-            # Set deprecated task to complete so it doesn't get run
-            self.tasks[task].set_complete(is_complete=True)
+        # Remove deprecated tasks from graph completely now that their clones have been wired in
+        for task in deprecated_task_ids:
+            self.remove_task(task)
+        self.deprecated_tasks.clear()
 
-            # Make sure graph structure is still valid
-            self.__check_adjacency_list()
-            self.__check_cycles()
+        # Expand mergers closing the new splits that receive more splits than they can merge at once
+        merger_ids = OrderedDict()
+        for split_task_id in split_task_ids:
+            for child_id in self.children[split_task_id]:
+                if child_id not in split_task_ids and self.tasks[child_id].is_merger_task():
+                    merger_ids[child_id] = None
+        for merger_id in merger_ids:
+            self.__build_merge_tree(merger_id)
 
-    @property
-    def __deprecated_tasks(self):
-        return [task.get_ID() for task in list(self.tasks.values()) if task.is_deprecated()]
+        # Make sure graph structure is still valid
+        self.__check_adjacency_list(runtime=True)
+        self.__check_cycles(runtime=True)
 
     def __generate_graph(self):
 
@@ -143,6 +386,35 @@ class Graph(object):
 
         return tasks, adj_list
 
+    def __index_edges(self):
+        # Build ordered child index and parent sets from the adjacency list
+        children = OrderedDict((task_id, OrderedDict()) for task_id in self.tasks)
+        parents = {}
+        for task_id, parent_ids in self.adj_list.items():
+            parents[task_id] = set(parent_ids)
+            for parent_id in parent_ids:
+                children[parent_id][task_id] = None
+        return children, parents
+
+    def __index_task_states(self):
+        # Count incomplete parents of each task and determine which tasks can be run right away
+        pending_parents = {}
+        ready_tasks = OrderedDict()
+        nr_unfinished = 0
+        for task_id, task in self.tasks.items():
+            pending_parents[task_id] = len([x for x in self.adj_list[task_id] if not self.tasks[x].is_complete()])
+            if not task.is_complete():
+                nr_unfinished += 1
+                if pending_parents[task_id] == 0 and not task.is_deprecated():
+                    ready_tasks[task_id] = None
+        return pending_parents, ready_tasks, nr_unfinished
+
+    def __update_ready(self, task_id):
+        # Add task to ready set if it's waiting to run and all its parents have completed
+        task = self.tasks[task_id]
+        if self.pending_parents[task_id] == 0 and not task.is_complete() and not task.is_deprecated():
+            self.ready_tasks[task_id] = None
+
     def __check_adjacency_list(self, runtime=False):
         errors = False
         for task, adj_tasks in self.adj_list.items():
@@ -168,7 +440,7 @@ class Graph(object):
             else:
                 raise RuntimeError("Runtime graph alteration resulted in invalid graph!")
 
-    def __split_subgraph(self, task_id, splitter_task_id, split_id, visible_samples, level=1, split_task_ids=[]):
+    def __split_subgraph(self, task_id, splitter_task_id, split_id, visible_samples, level=1, split_task_ids=None):
         # Recursively split subgraph that depends on 'task'
 
         task = self.tasks[task_id]
@@ -185,23 +457,26 @@ class Graph(object):
             # Current split has been merged (don't split downstream tasks)
             return task_id
 
+        # Keep track of split tasks already created for the current split
+        split_task_ids = set() if split_task_ids is None else split_task_ids
+
         # Split current task into new task and add split to graph
         split_task = task.split(splitter_task_id, split_id, visible_samples)
 
         # Don't try to add new split if it's already been added to graph
         # Can happen if two tasks in split subtree have same child
         if split_task.get_ID() in split_task_ids:
-            task.deprecate()
+            self.__deprecate_task(task_id)
             return split_task.get_ID()
 
         # Add newly created task to existing graph and clone parental dependencies
         self.add_task(split_task)
 
         # Mark original task as deprecated so it can be discarded
-        task.deprecate()
+        self.__deprecate_task(task_id)
 
         # Add new task ID to list of ids in current split
-        split_task_ids.append(split_task.get_ID())
+        split_task_ids.add(split_task.get_ID())
 
         # Create dependencies between current task and splits created for each child task
         child_tasks = self.get_children(task_id)
@@ -214,42 +489,89 @@ class Graph(object):
         # Return split task
         return split_task.get_ID()
 
+    def __deprecate_task(self, task_id):
+        # Deprecated tasks are replaced by their splits and must never be launched
+        self.tasks[task_id].deprecate()
+        self.ready_tasks.pop(task_id, None)
+        self.deprecated_tasks[task_id] = None
+
+    def __check_fuse_groups(self):
+        # Tasks in a fuse group must form a linear chain where each task only receives input from the previous one
+        fuse_groups = OrderedDict()
+        for task_id, task in self.tasks.items():
+            if task.get_fuse_group() is not None:
+                fuse_groups.setdefault(task.get_fuse_group(), []).append(task_id)
+
+        errors = False
+        for fuse_group, task_ids in fuse_groups.items():
+            nr_heads = 0
+            for task_id in task_ids:
+                fused_parents = [x for x in self.parents[task_id] if self.tasks[x].get_fuse_group() == fuse_group]
+                fused_children = [x for x in self.children[task_id] if self.tasks[x].get_fuse_group() == fuse_group]
+
+                if len(fused_parents) == 0:
+                    nr_heads += 1
+                elif len(self.parents[task_id]) > 1:
+                    logging.error("Incorrect pipeline graph! Task '%s' in fuse group '%s' can only receive input from "
+                                  "the previous task in the group." % (task_id, fuse_group))
+                    errors = True
+
+                if len(fused_children) > 1:
+                    logging.error("Incorrect pipeline graph! Task '%s' in fuse group '%s' passes input to more than one "
+                                  "task in the group: %s." % (task_id, fuse_group, ", ".join(fused_children)))
+                    errors = True
+
+                if len(fused_children) > 0 and self.tasks[task_id].is_splitter_task():
+                    logging.error("Incorrect pipeline graph! Splitter task '%s' can only be the last task in "
+                                  "fuse group '%s'." % (task_id, fuse_group))
+                    errors = True
+
+            if nr_heads > 1:
+                logging.error("Incorrect pipeline graph! Tasks in fuse group '%s' do not form a single chain: %s."
+                              % (fuse_group, ", ".join(task_ids)))
+                errors = True
+
+        if errors:
+            raise IOError("Incorrect pipeline graph: Invalid fuse group defined in graph config!")
+
+    def __check_merge_groups(self):
+        # Incremental merging requires a merger that can merge the output of its own partial merges
+        errors = False
+        for task_id, task in self.tasks.items():
+            if task.get_merge_group_size() is not None and not task.can_merge_partially():
+                logging.error("Incorrect pipeline graph! Task '%s' declares a merge_group_size but module '%s' "
+                              "cannot merge its input in parts." % (task_id, task.module.__class__.__name__))
+                errors = True
+            if task.get_max_fan_in() is not None and not task.can_merge_partially():
+                logging.error("Incorrect pipeline graph! Task '%s' declares a max_fan_in but module '%s' "
+                              "cannot merge its input in parts." % (task_id, task.module.__class__.__name__))
+                errors = True
+
+        if errors:
+            raise IOError("Incorrect pipeline graph: Incremental merge requested for invalid task in graph config!")
+
     def __check_cycles(self, runtime=False):
-        # Taken with modification from https://www.geeksforgeeks.org/detect-cycle-in-a-graph/
-        cycle = False
-        visited = []
-        recStack = []
-        for task_id in list(self.tasks.keys()):
-            if task_id not in visited:
-                if self.__is_cycle(task_id, visited, recStack):
-                    cycle = True
-        if cycle:
+        # Kahn's algorithm: repeatedly remove tasks without remaining parents. Any tasks left over are part of a cycle
+        nr_parents = {task_id: len(self.parents[task_id]) for task_id in self.tasks}
+        no_parents = [task_id for task_id, count in nr_parents.items() if count == 0]
+        nr_visited = 0
+        while len(no_parents) > 0:
+            task_id = no_parents.pop()
+            nr_visited += 1
+            for child_id in self.children[task_id]:
+                nr_parents[child_id] -= 1
+                if nr_parents[child_id] == 0:
+                    no_parents.append(child_id)
+
+        if nr_visited < len(self.tasks):
+            cycle_tasks = [task_id for task_id, count in nr_parents.items() if count > 0]
+            logging.error("Incorrect pipeline graph: Cycle detected that includes one or more of the following tasks: %s!"
+                          % ", ".join(cycle_tasks))
             if not runtime:
                 raise IOError("Incorrect pipeline graph: Cycle detected!")
             else:
                 raise RuntimeError("Runtime graph alteration resulted in invalid graph: Cycle detected!")
 
-    def __is_cycle(self, task_id, visited, recStack):
-
-        # Mark current task as visited
-        visited.append(task_id)
-        # Add current task to current recursion stack
-        recStack.append(task_id)
-
-        # Check if any subgraph of current task contains a cycle
-        neighbors = self.get_children(task_id)
-        for neighbor_id in neighbors:
-            if neighbor_id not in visited:
-                if self.__is_cycle(neighbor_id, visited, recStack):
-                    return True
-            elif neighbor_id in recStack:
-                logging.error("Incorrect pipeline graph: Cycle detected that includes task '%s'!" % task_id)
-                return True
-
-        # Pop current task from recursion stack
-        recStack.remove(task_id)
-        return False
-
     def __str__(self):
         to_ret = ""
         for task_id, task in self.tasks.items():
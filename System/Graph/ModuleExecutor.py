@@ -2,10 +2,12 @@ import logging
 import os
 
 from System.Platform import StorageHelper, DockerHelper, Platform
+from System.Graph import TaskTimeline
 
 class ModuleExecutor(object):
+    # Runs the steps of a task on a processor as coroutines of the event loop running the task worker
 
-    def __init__(self, task_id, processor, workspace, docker_image=None):
+    def __init__(self, task_id, processor, workspace, docker_image=None, timeline=None):
         self.task_id        = task_id
         self.processor      = processor
         self.workspace      = workspace
@@ -13,26 +15,34 @@ class ModuleExecutor(object):
         self.docker_helper  = DockerHelper(self.processor)
         self.docker_image   = docker_image
 
+        # Timeline where time spent on each step of running the task is recorded
+        self.timeline       = TaskTimeline(self.processor.get_time) if timeline is None else timeline
+
+    async def create_workspace(self):
         # Create workspace directory structure
-        self.__create_workspace()
+        with self.timeline.phase("setup_workspace", task=self.task_id):
+            await self.__create_workspace()
 
-    def load_input(self, inputs):
+    async def load_input(self, inputs, src_seen=None, dest_seen=None):
 
-        # List of jobs that have been started in process of loading input
+        # List of jobs that have been started in process of loading input and their phase on the timeline
         job_names = []
+        phases = {}
 
         # Pull docker image if necessary
         if self.docker_image is not None:
             docker_image_name = self.docker_image.get_image_name().split("/")[0]
             docker_image_name = docker_image_name.replace(":","_")
             job_name = "docker_pull_%s" % docker_image_name
+            phases[job_name] = self.timeline.start("docker_pull", task=self.task_id, image=self.docker_image.get_image_name())
             self.docker_helper.pull(self.docker_image.get_image_name(), job_name=job_name)
             job_names.append(job_name)
 
         # Load input files
         # Inputs: list containing remote files, local files, and docker images
-        src_seen = []
-        dest_seen = []
+        # Transferred remote paths and files in the working directory can be shared by fused tasks using the same workspace
+        src_seen = [] if src_seen is None else src_seen
+        dest_seen = [] if dest_seen is None else dest_seen
         count = 1
         batch_size = 5
         loading_counter = 0
@@ -79,10 +89,21 @@ class ModuleExecutor(object):
                 # Show the final log file
                 logging.debug("Destination: {0}".format(dest_path))
 
-                # Move file to dest_path
-                self.storage_helper.mv(src_path=src_path,
-                                       dest_path=dest_path,
-                                       job_name=job_name)
+                # Hard link file from the processor if it was produced by a previous task on the same processor
+                local_path = self.processor.get_local_file(src_path)
+                phases[job_name] = self.timeline.start("load_input", task=self.task_id, path=src_path,
+                                                       is_local=local_path is not None)
+                if local_path is not None:
+                    logging.debug("(%s) Linking input '%s' from local copy '%s'" % (self.task_id, src_path, local_path))
+                    self.storage_helper.link(src_path=local_path,
+                                             dest_path=dest_path,
+                                             job_name=job_name)
+
+                # Otherwise move file to dest_path
+                else:
+                    self.storage_helper.mv(src_path=src_path,
+                                           dest_path=dest_path,
+                                           job_name=job_name)
                 loading_counter += 1
                 
                 # Add transfer path to list of remote paths that have been transferred to local workspace
@@ -96,7 +117,7 @@ class ModuleExecutor(object):
                         self.task_id))
                     # Wait for all processes to finish
                     while len(job_names):
-                        self.processor.wait_process(job_names.pop())
+                        await self.__wait_job(job_names.pop(), phases)
                     loading_counter = 0
 
             # Update path after transferring to wrk directory and add to list of files in working directory
@@ -106,13 +127,13 @@ class ModuleExecutor(object):
 
         # Wait for all processes to finish
         for job_name in job_names:
-            self.processor.wait_process(job_name)
+            await self.__wait_job(job_name, phases)
 
         # Recursively give every permission to all files we just added
         logging.info("(%s) Final workspace perm. update for task '%s'..." % (self.processor.name, self.task_id))
-        self.__grant_workspace_perms(job_name="grant_final_wrkspace_perms")
+        await self.__grant_workspace_perms(job_name="grant_final_wrkspace_perms")
 
-    def run(self, cmd, job_name=None):
+    async def run(self, cmd, job_name=None):
 
         # Check or create job name
         if job_name is None:
@@ -122,11 +143,30 @@ class ModuleExecutor(object):
         docker_image_name = None if self.docker_image is None else self.docker_image.get_image_name()
 
         # Begin running job and return stdout, stderr after job has finished running
-        self.processor.run(job_name, cmd, docker_image=docker_image_name)
-        return self.processor.wait_process(job_name)
+        with self.timeline.phase("run", task=self.task_id, job=job_name):
+            self.processor.run(job_name, cmd, docker_image=docker_image_name)
+            return await self.processor.wait_process_async(job_name)
 
-    def save_output(self, outputs, final_output_types):
+    async def save_output(self, outputs, final_output_types):
         # Return output files to workspace output dir
+        with self.timeline.phase("save_output", task=self.task_id):
+            await self.__save_output(outputs, final_output_types)
+
+    async def save_logs(self):
+        # Move log files to final output log directory
+        log_files = os.path.join(self.workspace.get_wrk_log_dir(), "*")
+        final_log_dir = self.workspace.get_final_log_dir()
+        with self.timeline.phase("save_logs", task=self.task_id):
+            job_name = self.storage_helper.mv(log_files, final_log_dir, job_name="return_logs", log=False)
+            await self.processor.wait_process_async(job_name)
+
+    async def __wait_job(self, job_name, phases):
+        # Wait for a job to finish and record the end of its phase
+        # Jobs are waited for one after the other so a job's end time can be later than when it actually finished
+        await self.processor.wait_process_async(job_name)
+        self.timeline.end(phases[job_name])
+
+    async def __save_output(self, outputs, final_output_types):
 
         # Get workspace places for output files
         final_output_dir = self.workspace.get_output_dir()
@@ -145,7 +185,7 @@ class ModuleExecutor(object):
 
             # Calculate output file size
             job_name = "get_size_%s_%s_%s" % (self.task_id, output_file.get_type(), count)
-            file_size = self.storage_helper.get_file_size(output_file.get_path(), job_name=job_name)
+            file_size = await self.storage_helper.get_file_size_async(output_file.get_path(), job_name=job_name)
             output_file.set_size(file_size)
 
             # Check if there already exists a file with the same name on the bucket
@@ -173,6 +213,13 @@ class ModuleExecutor(object):
             # Update path of output file to reflect new location
             job_names.append(job_name)
             output_file.update_path(new_dir=dest_dir)
+
+            # Remember local copies of output so child tasks placed on this processor don't download them again
+            # Output uploaded to remote storage is copied so it stays in the working directory. Output saved to local
+            # storage is moved so its only local copy is at its new path
+            if curr_path.startswith(self.workspace.get_wrk_out_dir()):
+                local_path = curr_path if output_file.is_remote() else output_file.get_transferrable_path()
+                self.processor.add_local_file(output_file.get_transferrable_path(), local_path, file_size)
             logging.debug("(%s) Transferring file '%s' from old path '%s' to new path '%s' ('%s')" % (
                 self.task_id, output_file.get_type(), curr_path, output_file.get_path(), output_file.get_transferrable_path()))
 
@@ -180,23 +227,18 @@ class ModuleExecutor(object):
 
         # Wait for transfers to complete
         for job_name in job_names:
-            self.processor.wait_process(job_name)
+            await self.processor.wait_process_async(job_name)
 
         # Wait for output files to finish transferring
-        self.processor.wait()
-
-    def save_logs(self):
-        # Move log files to final output log directory
-        log_files = os.path.join(self.workspace.get_wrk_log_dir(), "*")
-        final_log_dir = self.workspace.get_final_log_dir()
-        self.storage_helper.mv(log_files, final_log_dir, job_name="return_logs", log=False, wait=True)
+        await self.processor.wait_async()
 
-    def __create_workspace(self):
+    async def __create_workspace(self):
         # Create all directories specified in task workspace
 
         logging.info("(%s) Creating workspace for task '%s'..." % (self.processor.name, self.task_id))
         for dir_type, dir_obj in  self.workspace.get_workspace().items():
-            self.storage_helper.mkdir(dir_obj, job_name="mkdir_%s" % dir_type, wait=True)
+            job_name = self.storage_helper.mkdir(dir_obj, job_name="mkdir_%s" % dir_type)
+            await self.processor.wait_process_async(job_name)
 
         # Set processor wrk, log directories
         self.processor.set_wrk_dir(self.workspace.get_wrk_dir())
@@ -205,12 +247,12 @@ class ModuleExecutor(object):
 
         # Give everyone all the permissions on working directory
         logging.info("(%s) Updating workspace permissions..." % self.processor.name)
-        self.__grant_workspace_perms(job_name="grant_initial_wrkspace_perms")
+        await self.__grant_workspace_perms(job_name="grant_initial_wrkspace_perms")
 
         # Wait for all the above commands to complete
         logging.info("(%s) Successfully created workspace for task '%s'!" % (self.processor.name, self.task_id))
 
-    def __grant_workspace_perms(self, job_name):
+    async def __grant_workspace_perms(self, job_name):
         cmd = "sudo chmod -R 777 %s" % self.workspace.get_wrk_dir()
         self.processor.run(job_name=job_name, cmd=cmd)
-        self.processor.wait_process(job_name)
+        await self.processor.wait_process_async(job_name)
@@ -0,0 +1,127 @@
+import json
+import logging
+
+class RuntimeEstimator(object):
+    # Estimates how long (in seconds) a task will take to run based on the class of its module
+
+    # Default runtime for any module without a static or reported estimate
+    DEFAULT_RUNTIME = 600
+
+    # Static per-module runtime defaults for long running modules
+    DEFAULT_RUNTIMES = {
+        "BwaAligner"        : 7200,
+        "Bowtie2"           : 7200,
+        "Star"              : 5400,
+        "CellRanger"        : 14400,
+        "MarkDuplicates"    : 3600,
+        "BaseRecalibrator"  : 2400,
+        "ApplyBQSR"         : 2400,
+        "PrintReads"        : 2400,
+        "HaplotypeCaller"   : 5400,
+        "Mutect2"           : 5400,
+        "DeepVariant"       : 7200,
+        "Strelka2"          : 3600,
+        "GenotypeGVCFs"     : 3600,
+        "RSEM"              : 3600,
+        "Annovar"           : 1800,
+        "MergeBams"         : 1800,
+        "Trimmomatic"       : 1800,
+        "FastQC"            : 900,
+        "Index"             : 300,
+        "Flagstat"          : 300,
+        "Idxstats"          : 120,
+    }
+
+    def __init__(self, report_files=None):
+
+        # Runtime estimates observed in previous pipeline reports
+        self.reported_runtimes = {}
+
+        # Load runtime estimates from previous pipeline reports
+        if report_files is not None:
+            for report_file in report_files:
+                self.load_report(report_file)
+
+    def load_report(self, report_file):
+        # Override static runtime defaults with median runtimes of each module in a previous GAPReport
+        try:
+            with open(report_file, "r") as report_fh:
+                report = json.load(report_fh)
+        except BaseException as e:
+            logging.error("Unable to load runtime estimates from report '%s'!" % report_file)
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
+            raise
+
+        # Group runtimes by module
+        runtimes = {}
+        for task in report.get("tasks", []):
+            module = task.get("module", None)
+            runtime = task.get("runtime(sec)", None)
+            # Tasks completed by a previous run weren't run again
+            if module is None or runtime is None or task.get("resumed", False):
+                continue
+            if module not in runtimes:
+                runtimes[module] = []
+            runtimes[module].append(float(runtime))
+
+        # Use the median runtime of each module
+        for module, module_runtimes in runtimes.items():
+            module_runtimes.sort()
+            self.reported_runtimes[module] = module_runtimes[len(module_runtimes)//2]
+
+        logging.debug("Loaded runtime estimates for %d modules from report '%s'." % (len(runtimes), report_file))
+
+    def get_runtime(self, task):
+        # Return runtime estimate of a task in seconds
+        module_name = task.get_module().__class__.__name__
+        if module_name in self.reported_runtimes:
+            return self.reported_runtimes[module_name]
+        return self.DEFAULT_RUNTIMES.get(module_name, self.DEFAULT_RUNTIME)
+
+
+class CriticalPathPolicy(object):
+    # Ranks tasks by the estimated runtime of the longest chain of work remaining from the task to the end of the graph
+
+    def __init__(self, graph, runtime_estimator=None):
+        self.graph = graph
+        self.runtime_estimator = RuntimeEstimator() if runtime_estimator is None else runtime_estimator
+
+        # Memoized remaining critical path of each task
+        self.remaining_work = {}
+
+    def reset(self):
+        # Forget memoized priorities after the graph structure changes
+        self.remaining_work.clear()
+
+    def get_priority(self, task_id):
+        # Higher priority = longer estimated remaining critical path
+        if task_id not in self.remaining_work:
+            self.__compute_remaining_work(task_id)
+        return self.remaining_work[task_id]
+
+    def sort_tasks(self, tasks):
+        # Return tasks ordered from highest to lowest priority
+        return sorted(tasks, key=lambda task: self.get_priority(task.get_ID()), reverse=True)
+
+    def __compute_remaining_work(self, task_id):
+        # Iterative post-order traversal so deep graphs don't hit the recursion limit
+        stack = [(task_id, False)]
+        while len(stack) > 0:
+            curr_id, children_done = stack.pop()
+            if curr_id in self.remaining_work:
+                continue
+
+            children = self.graph.get_children(curr_id)
+            if not children_done:
+                stack.append((curr_id, True))
+                for child_id in children:
+                    if child_id not in self.remaining_work:
+                        stack.append((child_id, False))
+                continue
+
+            # Remaining work is the task's own runtime plus the longest remaining path of any child
+            longest_child = max([self.remaining_work[child_id] for child_id in children], default=0)
+            task = self.graph.get_tasks(curr_id)
+            runtime = 0 if task.is_complete() else self.runtime_estimator.get_runtime(task)
+            self.remaining_work[curr_id] = runtime + longest_child
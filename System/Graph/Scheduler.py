@@ -1,23 +1,64 @@
 import logging
-import time
+import queue
+import statistics
 
-from System.Graph import TaskWorker
+from System.Graph import TaskWorker, CriticalPathPolicy
 
 class Scheduler(object):
 
-    def __init__(self, task_graph, datastore, platform):
+    # Seconds between checks for straggling split tasks when speculative execution is enabled
+    SPECULATION_INTERVAL = 60
+
+    def __init__(self, task_graph, datastore, platform, priority_policy=None, speculation_multiplier=None,
+                 progress_callback=None, task_cache=None, share=None):
 
         # Initialize pipeline definition variables
         self.task_graph     = task_graph
         self.datastore      = datastore
         self.platform       = platform
 
+        # Policy for ranking ready tasks so the most important ones are admitted first
+        self.priority_policy = CriticalPathPolicy(task_graph) if priority_policy is None else priority_policy
+
         # Initialize set of task workers
         self.task_workers = {}
 
+        # Queue where task workers post themselves as soon as they finish running
+        self.finished_workers = self.platform.make_queue()
+
+        # Number of task workers that have been launched but not yet finalized
+        self.nr_running = 0
+
+        # Split tasks running longer than this multiple of the median runtime of their finished sibling splits
+        # get a backup copy launched on another processor (None = no speculative execution)
+        self.speculation_multiplier = speculation_multiplier
+
+        # Backup copies of straggling tasks: task_id -> backup_id and backup_id -> task_id
+        self.backup_ids = {}
+        self.backup_of  = {}
+
+        # Tasks whose backup finished successfully while the original task was still running
+        self.finished_backups = set()
+
+        # Function called without arguments after tasks complete so that progress of the run can be saved
+        self.progress_callback = progress_callback
+
+        # Cache of task output from previous runs (None = caching disabled)
+        self.task_cache = task_cache
+
+        # Pipeline whose tasks share the platform's resources fairly with other pipelines of a batch (None = not shared)
+        self.share = share
+
     def get_task_workers(self):
         return self.task_workers
 
+    def is_complete(self):
+        return self.task_graph.is_complete()
+
+    def owns(self, task_worker):
+        # Determine whether a task worker was launched by the scheduler
+        return self.task_workers.get(task_worker.get_task().get_ID()) is task_worker
+
     def run(self):
         try:
             self.__run_tasks()
@@ -26,31 +67,123 @@ class Scheduler(object):
 
     def __run_tasks(self):
         # Execute tasks until are are completed or until error encountered
-        while not self.task_graph.is_complete():
+        while not self.is_complete():
+
+            # Launch tasks that became ready to run since the last check in order of priority
+            self.launch_ready_tasks()
+
+            # Block until at least one task worker finishes then finalize every worker that has finished since
+            # Periodically wake up to look for stragglers if speculative execution is enabled
+            try:
+                timeout = None if self.speculation_multiplier is None else self.SPECULATION_INTERVAL
+                task_worker = self.finished_workers.get(timeout=timeout)
+            except queue.Empty:
+                self.launch_backup_tasks()
+                continue
+
+            task_workers = [task_worker]
+            while True:
+                try:
+                    task_workers.append(self.finished_workers.get_nowait())
+                except queue.Empty:
+                    break
+            self.finalize_task_workers(task_workers)
 
-            # Check all tasks to see if they need anything updated
-            unfinished_tasks = self.task_graph.get_unfinished_tasks()
-            for task in unfinished_tasks:
+    def launch_ready_tasks(self):
+        # Launch tasks that became ready to run since the last check in order of priority
+        for task in self.priority_policy.sort_tasks(self.task_graph.pop_ready_tasks()):
+            if task.get_ID() not in self.task_workers:
+                self.__launch_task(task)
 
-                # Task id
-                task_id = task.get_ID()
+        # Nothing is running and nothing could be launched so the graph can never complete
+        if self.nr_running == 0 and not self.is_complete():
+            logging.error("Scheduler has unfinished tasks but none of them can be run!")
+            raise RuntimeError("Pipeline graph stalled with unfinished tasks that cannot be run!")
 
-                # Check if task worker has been created for task
-                task_worker = None if task_id not in self.task_workers else self.task_workers[task_id]
+    def finalize_task_workers(self, task_workers):
+        # Finalize task workers that have finished running
+        nr_completed = len(self.task_graph.completed_tasks)
+        for task_worker in task_workers:
+            self.__finalize_task_worker(task_worker)
 
-                # Finalize completed tasks
-                if task_worker is not None and task_worker.get_status() == TaskWorker.COMPLETE:
-                    self.__finalize_task_worker(task_worker)
-                    continue
+        # Save progress once for every batch of finished workers that completed tasks
+        if self.progress_callback is not None and len(self.task_graph.completed_tasks) > nr_completed:
+            self.progress_callback()
 
-                # Start running tasks that are ready to run but aren't currently
-                if task_worker is None and self.task_graph.parents_complete(task_id) and not task.is_deprecated():
-                    logging.info("Launching task: '%s'" % task_id)
-                    self.task_workers[task_id] = TaskWorker(task, self.datastore, self.platform)
-                    self.task_workers[task_id].start()
+    def launch_backup_tasks(self):
+        # Launch backup copies of straggling split tasks if speculative execution is enabled
+        if self.speculation_multiplier is not None:
+            self.__launch_backup_tasks()
 
-            # Sleeping for 5 seconds before checking again
-            time.sleep(5)
+    def cancel(self):
+        # Cancel unfinished tasks without waiting for their task workers to stop
+        # Task workers post themselves as usual once they've stopped and are finalized by finalize_stopped_workers()
+        self.__cancel_unfinished_tasks()
+
+    def finalize_stopped_workers(self, task_workers):
+        # Finalize task workers of a stopped pipeline that have finished running
+        for task_worker in task_workers:
+            if task_worker.get_status() is not TaskWorker.FINALIZED:
+                self.__finalize_stopped_worker(task_worker)
+
+    def stop(self):
+        # Cancel unfinished tasks then wait for every task worker to stop and finalize it
+        # Platform has to be locked beforehand unless other pipelines still run on it
+
+        # Cancel any still-running jobs
+        self.__cancel_unfinished_tasks()
+
+        # Wait for all task workers to finish running/cancelling and finalize them
+        for task_id, task_worker in self.task_workers.items():
+            if task_worker.get_status() is TaskWorker.FINALIZED:
+                continue
+
+            # Block until the task worker thread has stopped
+            task_worker.join()
+            self.__finalize_stopped_worker(task_worker)
+
+    def __launch_task(self, task):
+        # Create and start a task worker for a task that is ready to run
+        task_id = task.get_ID()
+        priority = self.priority_policy.get_priority(task_id)
+
+        # Get downstream tasks fused with the task so they can be run by the same task worker
+        chain = self.task_graph.get_fused_chain(task_id)
+        fused_tasks = [self.task_graph.get_tasks(fused_task_id) for fused_task_id in chain[1:]]
+
+        # Output of fused tasks that only feed the next task in the chain never has to leave the processor
+        internal_task_ids = [fused_task_id for fused_task_id in chain[:-1]
+                             if set(self.task_graph.get_children(fused_task_id)).issubset(chain)]
+
+        if len(fused_tasks) > 0:
+            logging.info("Launching task: '%s' fused with %s (priority: %s)" % (task_id, ", ".join(chain[1:]), priority))
+        else:
+            logging.info("Launching task: '%s' (priority: %s)" % (task_id, priority))
+        task_worker = TaskWorker(task, self.datastore, self.platform,
+                                 finished_queue=self.finished_workers,
+                                 priority=priority,
+                                 fused_tasks=fused_tasks,
+                                 internal_task_ids=internal_task_ids,
+                                 task_cache=self.task_cache,
+                                 share=self.share)
+
+        # Fused tasks are registered with the same task worker so they aren't launched on their own
+        for fused_task_id in chain:
+            self.task_workers[fused_task_id] = task_worker
+        self.nr_running += 1
+        task_worker.start()
+
+    def __finalize_stopped_worker(self, task_worker):
+        # Finalize task worker of a stopped pipeline
+        try:
+            self.__finalize_task_worker(task_worker)
+
+        except BaseException as e:
+            # Log error but don't raise exception as we want to finish finalizing all task workers
+            if not task_worker.is_cancelled():
+                logging.error("Task '%s' failed due to runtime error!" % task_worker.get_task().get_ID())
+                if str(e) != "":
+                    logging.error("Received the following message:\n%s" % e)
 
     def __finalize_task_worker(self, task_worker):
 
@@ -60,6 +193,22 @@ class Scheduler(object):
 
         # Add to list of finalized task workers
         task_worker.set_status(TaskWorker.FINALIZED)
+        self.nr_running -= 1
+
+        # Backup copies only affect the graph once the original task has stopped running
+        if task.get_ID() in self.backup_of:
+            self.__finalize_backup_worker(task_worker)
+            return
+
+        # Use output of backup if it finished first and the original task didn't also succeed
+        if task.get_ID() in self.finished_backups:
+            try:
+                task_worker.finalize()
+            except BaseException:
+                logging.warning("Task '%s' stopped after its backup finished first!" % task.get_ID())
+            if task_worker.is_cancelled() or not task_worker.is_success():
+                self.__complete_from_backup(task)
+                return
 
         # Checks for and raises any runtime errors that occurred while running task
         task_worker.finalize()
@@ -70,46 +219,149 @@ class Scheduler(object):
 
         # Actions on successful task completion
         elif task_worker.is_success():
-            logging.info("Task '%s' finished successfully!" % task.get_ID())
-            # Split subgraph if task is a splitter
-            if task.is_splitter_task():
-                self.task_graph.split_graph(task.get_ID())
+            # Complete task and every task fused with it in the order they were run
+            for task in task_worker.get_tasks():
+                logging.info("Task '%s' finished successfully!" % task.get_ID())
+                # Split subgraph if task is a splitter
+                if task.is_splitter_task():
+                    self.task_graph.split_graph(task.get_ID())
+                    # Recompute priorities as splitting changes the remaining critical path
+                    self.priority_policy.reset()
+
+                # Set task to complete if task worker completed successfully
+                self.task_graph.complete_task(task.get_ID())
+
+                # Merge output of finished splits in parts if they feed an incremental merger
+                self.__merge_finished_splits(task.get_ID())
+
+            # Original task finished first so its backup is no longer needed
+            if task_worker.get_task().get_ID() in self.backup_ids:
+                self.__discard_backup_task(task_worker.get_task().get_ID())
+
+    def __launch_backup_tasks(self):
+        # Launch backup copies of split tasks that are taking much longer than their sibling splits
+        # Siblings are the splits of the same task created by the same splitter
+        finished_runtimes   = {}
+        running_workers     = {}
+        nr_siblings         = {}
+        for task_id, task in self.task_graph.get_tasks().items():
+            if not task.is_split() or task_id in self.backup_of:
+                continue
+            sibling_key = (task.get_splitter(), task_id.rsplit(".", 1)[0])
+            nr_siblings[sibling_key] = nr_siblings.get(sibling_key, 0) + 1
+
+            # Only consider tasks run by their own task worker
+            task_worker = self.task_workers.get(task_id)
+            if task_worker is None or task_worker.get_task() is not task or len(task_worker.get_tasks()) > 1:
+                continue
+
+            if task.is_complete():
+                finished_runtimes.setdefault(sibling_key, []).append(task_worker.get_runtime())
+            elif task_id not in self.backup_ids and task_worker.get_status() in [TaskWorker.LOADING, TaskWorker.RUNNING]:
+                running_workers.setdefault(sibling_key, []).append(task_worker)
+
+        for sibling_key, task_workers in running_workers.items():
+
+            # Wait for at least half of the siblings to finish so the median is meaningful
+            runtimes = finished_runtimes.get(sibling_key, [])
+            if len(runtimes) == 0 or len(runtimes) * 2 < nr_siblings[sibling_key]:
+                continue
+
+            max_runtime = self.speculation_multiplier * statistics.median(runtimes)
+            for task_worker in task_workers:
+                if task_worker.get_runtime() > max_runtime:
+                    self.__launch_backup_task(task_worker.get_task(), task_worker.get_runtime(), max_runtime)
+
+    def __launch_backup_task(self, task, runtime, max_runtime):
+        # Launch copy of a straggling task on a different processor. First copy to finish successfully is used
+        task_id = task.get_ID()
+        backup_id = "%s.backup" % task_id
+        logging.warning("Task '%s' has been running for %d sec (limit: %d sec)! Launching backup task '%s'."
+                        % (task_id, runtime, max_runtime, backup_id))
+
+        backup_task = task.make_backup(backup_id)
+        self.task_graph.add_backup_task(backup_task, task_id)
+        self.backup_ids[task_id] = backup_id
+        self.backup_of[backup_id] = task_id
 
-            # Set task to complete if task worker completed successfully
-            task.set_complete(True)
+        # Backup runs with priority of the original task
+        self.task_workers[backup_id] = TaskWorker(backup_task, self.datastore, self.platform,
+                                                  finished_queue=self.finished_workers,
+                                                  priority=self.priority_policy.get_priority(task_id),
+                                                  share=self.share)
+        self.nr_running += 1
+        self.task_workers[backup_id].start()
+
+    def __finalize_backup_worker(self, backup_worker):
+        # Handle backup task that finished running
+        backup_id = backup_worker.get_task().get_ID()
+        task_id = self.backup_of[backup_id]
+        task_worker = self.task_workers[task_id]
+
+        # Failed backup never stops the pipeline as the original task is still running
+        try:
+            backup_worker.finalize()
+        except BaseException as e:
+            logging.warning("Backup task '%s' failed!" % backup_id)
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+
+        # Backup finished first so stop the original task. Backup output is used once the original has stopped.
+        if backup_worker.is_success() and not backup_worker.is_cancelled() \
+                and task_worker.get_status() is not TaskWorker.FINALIZED:
+            logging.info("Backup task '%s' finished before task '%s'! Cancelling original task." % (backup_id, task_id))
+            self.finished_backups.add(task_id)
+            task_worker.cancel()
+            return
+
+        # Otherwise discard backup
+        self.task_graph.remove_backup_task(backup_id)
+
+    def __discard_backup_task(self, task_id):
+        # Stop backup of a task that finished successfully on its own
+        backup_id = self.backup_ids[task_id]
+        backup_worker = self.task_workers[backup_id]
+        self.finished_backups.discard(task_id)
+
+        # Backup is removed from the graph once it has stopped running
+        if backup_worker.get_status() is not TaskWorker.FINALIZED:
+            backup_worker.cancel()
+        elif backup_id in self.task_graph.get_tasks():
+            self.task_graph.remove_backup_task(backup_id)
+
+    def __complete_from_backup(self, task):
+        # Complete a task using the output of its backup copy
+        task_id = task.get_ID()
+        backup_id = self.backup_ids[task_id]
+        logging.info("Task '%s' finished successfully using output of backup task '%s'!" % (task_id, backup_id))
+        task.set_module(self.task_graph.get_tasks(backup_id).get_module())
+        self.task_graph.remove_backup_task(backup_id)
+        self.finished_backups.discard(task_id)
+
+        # Split subgraph if task is a splitter
+        if task.is_splitter_task():
+            self.task_graph.split_graph(task_id)
+            self.priority_policy.reset()
+
+        self.task_graph.complete_task(task_id)
+        self.__merge_finished_splits(task_id)
+
+    def __merge_finished_splits(self, task_id):
+        # Add partial merges for downstream incremental mergers. Partial merges are launched once they're ready
+        for child_id in self.task_graph.get_children(task_id):
+            partial_ids = self.task_graph.merge_incrementally(child_id)
+            if len(partial_ids) > 0:
+                logging.info("Merging finished splits of task '%s' in parts: %s" % (child_id, ", ".join(partial_ids)))
+                # Recompute priorities as partial merges change the remaining critical path
+                self.priority_policy.reset()
 
     def __finalize(self):
 
         # Prevent any new processors from being created on platform
         self.platform.lock()
 
-        # Cancel any still-running jobs
-        self.__cancel_unfinished_tasks()
-
-        # Wait for all jobs to finish
-        done = False
-        while not done:
-            # Wait for all task workers to finish up cancelling
-            done = True
-            for task_id, task_worker in self.task_workers.items():
-                if not task_worker.get_status() is TaskWorker.FINALIZED:
-                    # Indicate that not all tasks have been finalized
-                    done = False
-
-                # Finalize tasks that have finished running/cancelling
-                if task_worker.get_status() is TaskWorker.COMPLETE:
-                    try:
-                        self.__finalize_task_worker(task_worker)
-
-                    except BaseException as e:
-                        # Log error but don't raise exception as we want to finish finalizing all task workers
-                        if not task_worker.is_cancelled():
-                            logging.error("Task '%s' failed due to runtime error!" % task_id)
-                            if str(e) != "":
-                                logging.error("Received the following message:\n%s" % e)
-
-            # Wait for a bit before checking again
-            time.sleep(5)
+        # Cancel still-running tasks and finalize all task workers
+        self.stop()
 
     def __cancel_unfinished_tasks(self):
         # Cancel any still-running jobs
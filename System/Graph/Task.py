@@ -25,6 +25,15 @@ class Task(object):
         # Get the config inputs
         self.__module_args          = kwargs.pop("args", [])
 
+        # Name of the linear chain of tasks that this task is run with on a single processor
+        self.__fuse_group           = kwargs.pop("fuse_group", None)
+
+        # Number of finished splits merged together by each partial merge of a merger task (None = single merge)
+        self.__merge_group_size     = kwargs.pop("merge_group_size", None)
+
+        # Maximum number of splits merged by a single task (None = module's default, which is no limit for most mergers)
+        self.__max_fan_in           = kwargs.pop("max_fan_in", None)
+
         # Initialize modules
         self.module                 = self.__load_module(self.__module_name,
                                                          is_docker=self.__docker_image is not None,
@@ -51,6 +60,9 @@ class Task(object):
         # Flag for whether task has been split/replaced and shouldn't be executed
         self.__deprecated = False
 
+        # Flag for whether task merges part of the input of a merger task
+        self.__is_partial_merge = False
+
     def split(self, splitter_id, split_id, visible_samples):
         # Produce clone of current task but restrict visible output and sample info available to task
         # Visible output/sample partition defined by upstream splitting task
@@ -58,8 +70,9 @@ class Task(object):
         # Split_id is the name of the partition the newly created task will be able to access
         # visible_samples is list of samples visible to new split
 
-        # Create copy of current task and give new id
-        split_task = copy.deepcopy(self)
+        # Create lightweight copy of current task and give new id
+        # Graph config, final output keys, and module config are shared with the original task
+        split_task = copy.copy(self)
         new_id = "%s.%s" % (self.__task_id, split_id)
         split_task.__task_id = new_id
 
@@ -80,26 +93,65 @@ class Task(object):
         # Specify that new split task is the result of a split
         split_task.__is_split = True
 
-        # Give new module id to module
-        split_task.module.set_ID(new_id)
+        # Give split task its own copy of the module's per-task state under the new module id
+        split_task.module = self.module.clone(new_id)
 
         # Remove deprecated flag possibly inherited from parent
         split_task.__deprecated = False
 
         return split_task
 
+    def make_backup(self, backup_id):
+        # Produce copy of current task that receives the same input so it can be run alongside the original task
+        # Backup task has its own module state so the output of the original task is never touched
+        backup_task = copy.copy(self)
+        backup_task.__task_id = backup_id
+        backup_task.__clones = []
+        backup_task.module = self.module.clone(backup_id)
+        return backup_task
+
+    def make_partial_merge(self, partial_id):
+        # Produce copy of a merger task that merges part of the merger's input
+        # Partial merges only produce intermediate output that is merged again by the original merger task
+        partial_task = self.make_backup(partial_id)
+        partial_task.__final_output_keys = []
+        partial_task.__fuse_group = None
+        partial_task.__merge_group_size = None
+        partial_task.__max_fan_in = None
+        partial_task.__is_partial_merge = True
+        return partial_task
+
     def get_ID(self):
         return self.__task_id
 
     def get_module(self):
         return self.module
 
+    def set_module(self, module):
+        self.module = module
+
     def is_splitter_task(self):
         return isinstance(self.module, Splitter)
 
     def is_merger_task(self):
         return isinstance(self.module, Merger)
 
+    def can_merge_partially(self):
+        # Return True if the task's module can merge its input in parts
+        return self.is_merger_task() and len(self.module.merge_keys) > 0
+
+    def is_partial_merge(self):
+        return self.__is_partial_merge
+
+    def get_merge_keys(self):
+        return self.module.merge_keys if self.is_merger_task() else []
+
+    def get_max_fan_in(self):
+        # Fan-in declared in the graph config takes precedence over the module's default
+        if not self.is_merger_task():
+            return None
+        return self.__max_fan_in if self.__max_fan_in is not None else self.module.max_fan_in
+
     def get_input_args(self):
         return self.module.get_arguments()
 
@@ -120,6 +172,12 @@ class Task(object):
     def get_docker_image_id(self):
         return self.__docker_image
 
+    def get_fuse_group(self):
+        return self.__fuse_group
+
+    def get_merge_group_size(self):
+        return self.__merge_group_size
+
     def set_complete(self, is_complete):
         self.complete = is_complete
 
@@ -213,6 +271,15 @@ class Task(object):
         if self.__docker_image is not None:
             to_ret += "\tdocker_image\t= %s\n" % self.__docker_image
 
+        if self.__fuse_group is not None:
+            to_ret += "\tfuse_group\t= %s\n" % self.__fuse_group
+
+        if self.__merge_group_size is not None:
+            to_ret += "\tmerge_group_size\t= %s\n" % self.__merge_group_size
+
+        if self.__max_fan_in is not None:
+            to_ret += "\tmax_fan_in\t= %s\n" % self.__max_fan_in
+
         if isinstance(input_from, list) and len(input_from) == 1:
             to_ret += "\tinput_from\t= %s\n" % input_from[0]
 
@@ -0,0 +1,153 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from System.Datastore import RunState
+from Modules import Module
+
+class TaskCache(object):
+    # Stores task output under a key that identifies the task's computation so identical tasks of later runs reuse it
+    # Key is a hash of the module class, the command with run-specific paths replaced,
+    # the identity (e.g. generation/checksum) of every input file, and the digest of the docker image
+    # Each entry is a directory holding copies of the output files and a manifest of the module output
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, cache_dir):
+
+        # Bucket prefix where cache entries are stored
+        self.cache_dir = cache_dir.rstrip("/") + "/"
+
+        # Helpers for accessing cache entries, set once the helper processor exists
+        self.storage_helper = None
+        self.docker_helper = None
+
+        # Memoized identities of input files and docker images
+        self.file_identities = {}
+        self.image_digests = {}
+        self.digest_lock = threading.Lock()
+
+        # Cache statistics
+        self.stats_lock = threading.Lock()
+        self.nr_hits = 0
+        self.nr_misses = 0
+        self.nr_stored = 0
+        self.nr_errors = 0
+
+    def set_helpers(self, storage_helper, docker_helper):
+        self.storage_helper = storage_helper
+        self.docker_helper = docker_helper
+
+    def is_cacheable(self, task):
+        # Tasks whose output is set from the output of their command can't be restored from copied files
+        return type(task.get_module()).process_cmd_output is Module.process_cmd_output
+
+    def get_key(self, task, cmd, input_files, wrk_dir, docker_image=None):
+        # Return key identifying the computation of a task (None if task can't be cached)
+        if self.storage_helper is None or not self.is_cacheable(task):
+            return None
+
+        try:
+            # Replace paths that differ between runs in the command
+            cmd_template = json.dumps(cmd)
+            identities = []
+            for i, input_file in enumerate(input_files):
+                cmd_template = cmd_template.replace(input_file.get_path(), "{input_%d}" % i)
+                identities.append(self.__get_file_identity(input_file.get_transferrable_path()))
+            cmd_template = cmd_template.replace(wrk_dir.rstrip("/"), "{wrk}")
+
+            image_digest = None
+            if docker_image is not None:
+                image_digest = self.__get_image_digest(docker_image.get_image_name())
+
+            key_data = [task.get_module().__class__.__name__, cmd_template, identities, image_digest]
+            return hashlib.sha256(json.dumps(key_data).encode("utf8")).hexdigest()
+
+        except BaseException as e:
+            # Errors accessing the cache never stop a task from running
+            self.__count("nr_errors")
+            logging.warning("(%s) Unable to compute task cache key! Task will be run." % task.get_ID())
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+            return None
+
+    def restore(self, key, task, workspace):
+        # Set task output to the output stored under a key. Return True on cache hit
+        entry_dir = self.__get_entry_dir(key)
+        try:
+            if not self.storage_helper.path_exists(os.path.join(entry_dir, TaskCache.MANIFEST)):
+                self.__count("nr_misses")
+                return False
+
+            output = RunState.decode(json.loads(self.storage_helper.read(os.path.join(entry_dir, TaskCache.MANIFEST))))
+
+            # Final output is copied to the final output directory. Other output is used directly from the cache
+            final_output_keys = task.get_final_output_keys()
+            final_output_dir = workspace.get_output_dir()
+            for output_file in RunState.get_files(output):
+                if output_file.get_type() in final_output_keys:
+                    self.storage_helper.mv(output_file.get_transferrable_path(), final_output_dir, wait=True)
+                    output_file.update_path(new_dir=final_output_dir)
+
+            task.get_module().output = output
+            self.__count("nr_hits")
+            return True
+
+        except BaseException as e:
+            self.__count("nr_errors")
+            logging.warning("(%s) Unable to restore output from task cache! Task will be run." % task.get_ID())
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+            return False
+
+    def store(self, key, task):
+        # Copy saved output of a task to the cache and write manifest last so only complete entries are used
+        entry_dir = self.__get_entry_dir(key)
+        try:
+            module_output = task.get_module().get_output()
+            output = copy.deepcopy(module_output)
+            for i, (output_file, cached_file) in enumerate(zip(RunState.get_files(module_output), RunState.get_files(output))):
+                # Each file gets its own directory so files with the same name don't overwrite each other
+                cached_dir = os.path.join(entry_dir, str(i)) + "/"
+                self.storage_helper.mv(output_file.get_transferrable_path(), cached_dir, wait=True)
+                cached_file.update_path(new_dir=cached_dir)
+
+            manifest = json.dumps(RunState.encode(output), indent=4)
+            self.storage_helper.write(os.path.join(entry_dir, TaskCache.MANIFEST), manifest, wait=True)
+            self.__count("nr_stored")
+
+        except BaseException as e:
+            self.__count("nr_errors")
+            logging.warning("(%s) Unable to store output in task cache!" % task.get_ID())
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+
+    def get_stats(self):
+        with self.stats_lock:
+            return {"cache_dir" : self.cache_dir,
+                    "hits" : self.nr_hits,
+                    "misses" : self.nr_misses,
+                    "stored" : self.nr_stored,
+                    "errors" : self.nr_errors}
+
+    def __get_entry_dir(self, key):
+        return os.path.join(self.cache_dir, key) + "/"
+
+    def __get_file_identity(self, path):
+        if path not in self.file_identities:
+            self.file_identities[path] = self.storage_helper.get_file_identity(path)
+        return self.file_identities[path]
+
+    def __get_image_digest(self, image_name):
+        # Docker helper job names are derived from image names so digests are computed one at a time
+        with self.digest_lock:
+            if image_name not in self.image_digests:
+                self.image_digests[image_name] = self.docker_helper.get_image_digest(image_name)
+            return self.image_digests[image_name]
+
+    def __count(self, stat):
+        with self.stats_lock:
+            setattr(self, stat, getattr(self, stat) + 1)
@@ -0,0 +1,55 @@
+import threading
+import contextlib
+from collections import OrderedDict
+
+class TaskTimeline(object):
+    # Start and end times of the phases a task worker goes through (waiting for resources, creating the processor,
+    # loading input, running commands, saving output, ...). Phases can overlap, e.g. input files transferred in parallel.
+
+    def __init__(self, clock):
+
+        # Function returning the current time (sec)
+        self.clock = clock
+
+        # Recorded phases in the order they started
+        self.lock = threading.Lock()
+        self.phases = []
+
+    def start(self, name, **details):
+        # Record start of a phase and return it so it can be ended later
+        return self.add(name, self.clock(), None, **details)
+
+    def end(self, phase):
+        phase["end"] = self.clock()
+
+    def add(self, name, start, end, **details):
+        # Record phase given its start and end times (end = None if it hasn't ended yet)
+        phase = OrderedDict([("name", name), ("start", start), ("end", end)])
+        phase.update(details)
+        with self.lock:
+            self.phases.append(phase)
+        return phase
+
+    @contextlib.contextmanager
+    def phase(self, name, **details):
+        # Record phase spanning the body of a with statement, whether or not it raises
+        phase = self.start(name, **details)
+        try:
+            yield phase
+        finally:
+            self.end(phase)
+
+    def get_phases(self, start_time=None):
+        # Return phases with start times relative to start_time. Phases that never ended (e.g. task failed) have no runtime
+        start_time = 0 if start_time is None else start_time
+        phases = []
+        with self.lock:
+            for phase in self.phases:
+                phase_data = OrderedDict([("name", phase["name"]),
+                                          ("start_time", phase["start"] - start_time),
+                                          ("runtime(sec)", None if phase["end"] is None else phase["end"] - phase["start"])])
+                for key, val in phase.items():
+                    if key not in ["name", "start", "end"]:
+                        phase_data[key] = val
+                phases.append(phase_data)
+        return phases
@@ -1,12 +1,16 @@
+import asyncio
+import functools
 import threading
-import time
 import math
 import logging
 
-from System.Workers import Thread
-from System.Graph import ModuleExecutor
+from System.Graph import ModuleExecutor, TaskTimeline
 
-class TaskWorker(Thread):
+class TaskWorker(object):
+    # Runs a task as a coroutine on the platform's event loop so no thread is held while the task waits
+    # The task worker prepares the task, requests resources, then runs the task on a processor once the platform grants
+    # them. Commands are awaited as subprocesses of the event loop, so any number of task workers can wait for
+    # resources or for commands to finish at once. Calls that can only block are made from executor threads.
 
     IDLE            = 0
     LOADING         = 1
@@ -18,12 +22,12 @@ class TaskWorker(Thread):
 
     STATUSES        = ["IDLE", "LOADING", "RUNNING", "FINALIZING", "COMPLETE", "CANCELLING", "FINALIZED"]
 
-    def __init__(self, task, datastore, platform):
+    def __init__(self, task, datastore, platform, finished_queue=None, priority=0, fused_tasks=None, internal_task_ids=None,
+                 task_cache=None, share=None):
         # Class for executing task
 
-        # Initialize new thread
-        err_msg = "TaskWorker for %s has stopped working!" % task.get_ID()
-        super(TaskWorker, self).__init__(err_msg)
+        # Error message logged if the task worker raises an exception
+        self.err_msg = "TaskWorker for %s has stopped working!" % task.get_ID()
 
         # Task to be executed
         self.task = task
@@ -35,27 +39,78 @@ class TaskWorker(Thread):
         # Platform upon which task will be executed
         self.platform = platform
 
+        # Queue where task worker posts itself when finished so the scheduler doesn't have to poll
+        self.finished_queue = finished_queue
+
+        # Priority with which task requests platform resources (higher runs first)
+        self.priority = priority
+
+        # Pipeline sharing the platform's resources fairly with other pipelines of the same batch (None = not shared)
+        # and ID under which the task requests resources, unique across pipelines sharing the platform
+        self.share = share
+        self.request_id = task.get_ID() if share is None else "%s.%s" % (share, task.get_ID())
+
+        # Downstream tasks fused with the task that are run in order on the same processor
+        self.fused_tasks = [] if fused_tasks is None else fused_tasks
+
+        # Fused tasks whose output is only passed to the next fused task and doesn't need to be saved
+        self.internal_task_ids = set() if internal_task_ids is None else set(internal_task_ids)
+
+        # Cache of task output from previous runs (None = task is always run)
+        self.task_cache = task_cache
+
+        # Flag for whether task output was restored from the task cache
+        self.cache_hit = False
+
         # Status attributes
         self.status_lock = threading.Lock()
         self.status = TaskWorker.IDLE
 
+        # Event loop running the task worker, event set once the task worker has finished and error it raised (if any)
+        self.event_loop = self.platform.get_event_loop()
+        self.done_event = self.platform.make_event()
+        self.error      = None
+
+        # Resources requested to run task, task workspace, commands of task and fused tasks and paths of their input
+        self.resources      = None
+        self.task_workspace = None
+        self.has_commands   = []
+        self.ready_parents  = []
+        self.input_paths    = []
+
+        # Key under which task output is stored in the task cache once task completes (None = output isn't cached)
+        self.cache_key = None
+
         # Processor for executing task
         self.proc       = None
 
+        # Processor runtime/cost accrued before task acquired the processor (non-zero for reused processors)
+        self.proc_runtime_offset    = 0
+        self.proc_cost_offset       = 0
+
+        # Time task acquired a reused processor and final runtime/cost after releasing it back to platform
+        self.lease_start_time   = None
+        self.lease_runtime      = None
+        self.lease_cost         = None
+
         # Garbage collector for destroying instance on cancellation
         self.garbage_collector = None
 
         # Module command executor
         self.module_executor = None
 
+        # Timeline of the phases the task worker went through, timed by the platform's clock
+        self.timeline = TaskTimeline(self.platform.get_time)
+
         # Flag for whether task successfully completed
         self.__err = True
 
         # Flag for whether TaskWorker was cancelled
         self.__cancelled = False
 
-        # Command that was run to carry out task
+        # Command that was run to carry out task and commands run for each fused task
         self.cmd = None
+        self.fused_cmds = {}
 
     def set_status(self, new_status):
 
@@ -70,184 +125,316 @@ class TaskWorker(Thread):
         with self.status_lock:
             return self.status
 
-    def get_task(self):
-        return self.task
+    def get_task(self, task_id=None):
+        # Return task run by worker (task_id can be used to get one of the fused tasks)
+        if task_id is None or task_id == self.task.get_ID():
+            return self.task
+        for fused_task in self.fused_tasks:
+            if fused_task.get_ID() == task_id:
+                return fused_task
+        logging.error("TaskWorker '%s' does not run task '%s'!" % (self.task.get_ID(), task_id))
+        raise RuntimeError("Attempt to get task not run by task worker!")
+
+    def get_tasks(self):
+        # Return task and fused tasks in the order they're run
+        return [self.task] + self.fused_tasks
 
     def get_runtime(self):
         if self.proc is None:
             return 0
+        elif self.lease_runtime is not None:
+            return self.lease_runtime
         else:
-            return self.proc.get_runtime()
+            return self.proc.get_runtime() - self.proc_runtime_offset
 
     def get_cost(self):
         if self.proc is None:
             return 0
+        elif self.lease_cost is not None:
+            return self.lease_cost
         else:
-            return self.proc.compute_cost()
+            return self.proc.compute_cost() - self.proc_cost_offset
 
     def get_start_time(self):
         if self.proc is None:
             return None
+        elif self.lease_start_time is not None:
+            return self.lease_start_time
         else:
             return self.proc.get_start_time()
 
-    def get_cmd(self):
-        return self.cmd
+    def get_timeline(self):
+        return self.timeline
 
-    def work(self):
-        # Run task module command and save outputs
-        try:
-            # Set the input arguments that will be passed to the task module
-            self.datastore.set_task_input_args(self.task.get_ID())
-
-            # Compute task resource requirements
-            cpus    = self.module.get_argument("nr_cpus")
-            mem     = self.module.get_argument("mem")
-
-            # Compute disk space requirements
-            docker_image    = None
-            input_files     = self.datastore.get_task_input_files(self.task.get_ID())
-            if self.task.get_docker_image_id() is not None:
-                docker_image    = self.datastore.get_docker_image(docker_id=self.task.get_docker_image_id())
-            disk_space      = self.__compute_disk_requirements(input_files, docker_image)
-            logging.debug("(%s) CPU: %s, Mem: %s, Disk space: %s" % (self.task.get_ID(), cpus, mem, disk_space))
-
-            # Wait for platform to have enough resources to run task
-            while not self.platform.can_make_processor(cpus, mem, disk_space) and not self.is_cancelled():
-                time.sleep(5)
-
-            # Quit if pipeline is cancelled
-            self.__check_cancelled()
+    def get_cmd(self, task_id=None):
+        if task_id is None or task_id == self.task.get_ID():
+            return self.cmd
+        return self.fused_cmds.get(task_id)
 
-            # Define unique workspace for task input/output
-            task_workspace = self.datastore.get_task_workspace(task_id=self.task.get_ID())
-            logging.debug("(%s) Task workspace:\n%s" % (self.task.get_ID(), task_workspace.debug_string()))
+    def start(self):
+        # Start running the task worker on the event loop
+        self.event_loop.submit(self.__work())
 
-            # Specify that module output files should be placed in task's working directory
-            self.module.set_output_dir(task_workspace.get_wrk_out_dir())
+    def join(self):
+        # Block until the task worker has finished
+        self.done_event.wait()
 
-            # Execute command if one exists
-            self.set_status(self.LOADING)
+    def finalize(self):
+        # Block until the task worker has finished then raise any runtime error that occurred while it ran
+        # The error is only raised the first time the task worker is finalized
+        self.join()
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
 
-            # Check if there is any command that needs to be run
-            has_command = self.module.get_command() is not None
+    def is_done(self):
+        return self.done_event.is_set()
+
+    async def __work(self):
+        # Prepare the task, wait for platform resources and run the task on a processor
+        try:
+            if not await self.__prepare():
+                await self.__wait_for_resources()
+                await self.__process()
+
+        except BaseException as e:
+            # Handle but do not raise exception if job was externally cancelled
+            if self.__cancelled:
+                logging.warning("Task '%s' failed due to cancellation!" % self.task.get_ID())
 
-            # Create the specific processor for the task
-            if has_command:
-                # Get processor capable of running job
-                self.proc = self.platform.get_processor(self.task.get_ID(), cpus, mem, disk_space)
-                logging.debug("(%s) Successfully acquired processor!" % self.task.get_ID())
             else:
-                # Get small processor
-                self.proc = self.platform.get_processor(self.task.get_ID(), 1, 1, disk_space)
-                logging.debug("(%s) Successfully acquired processor!" % self.task.get_ID())
+                # Raise exception when finalized if job failed for any reason other than cancellation
+                self.set_status(self.FINALIZING)
+                logging.error("Task '%s' failed!" % self.task.get_ID())
+                if str(e) != "":
+                    logging.error("%s: %s." % (self.err_msg, e))
+                else:
+                    logging.error("%s!" % self.err_msg)
+                self.error = e
+        finally:
+            await self.__finish()
+
+    async def __finish(self):
+        # Return logs and destroy processor if they exist
+        logging.debug("TaskWorker '%s' cleaning up..." % self.task.get_ID())
+        await self.__clean_up()
+        # Store output in task cache once the processor has been released
+        if self.cache_key is not None and self.is_success() and not self.is_cancelled():
+            await self.event_loop.run_blocking(self.task_cache.store, self.cache_key, self.task)
+        # Notify that task worker has completed regardless of success
+        self.set_status(TaskWorker.COMPLETE)
+        self.done_event.set()
+        if self.finished_queue is not None:
+            self.finished_queue.put(self)
+
+    async def __prepare(self):
+        # Compute resources needed to run task and its fused tasks
+        # Return True if the task was completed without a processor
+
+        # Set the input arguments that will be passed to the task module
+        self.datastore.set_task_input_args(self.task.get_ID())
+
+        # Compute task resource requirements
+        cpus    = self.module.get_argument("nr_cpus")
+        mem     = self.module.get_argument("mem")
+
+        # Compute disk space requirements
+        docker_images   = []
+        input_files     = self.datastore.get_task_input_files(self.task.get_ID())
+        if self.task.get_docker_image_id() is not None:
+            docker_images.append(self.datastore.get_docker_image(docker_id=self.task.get_docker_image_id()))
+
+        # Define unique workspace for task input/output
+        task_workspace = self.datastore.get_task_workspace(task_id=self.task.get_ID())
+        logging.debug("(%s) Task workspace:\n%s" % (self.task.get_ID(), task_workspace.debug_string()))
+
+        # Specify that module output files should be placed in task's working directory
+        self.module.set_output_dir(task_workspace.get_wrk_out_dir())
+
+        # Check if there is any command that needs to be run
+        cmd = self.module.get_command()
+        has_command = cmd is not None
+
+        # Resolve tasks without a command in the current process if their output doesn't need to be transferred
+        if not has_command and len(self.fused_tasks) == 0 and self.__can_run_in_process(input_files):
+            logging.info("(%s) Task has no command to run! Resolving output without a processor." % self.task.get_ID())
+            self.set_status(self.FINALIZING)
+            if not self.__cancelled:
+                with self.status_lock:
+                    self.__err = False
+            return True
+
+        # Reuse output of an identical task from a previous run if it's in the task cache
+        if self.task_cache is not None and has_command and len(self.fused_tasks) == 0:
+            docker_image = None if self.task.get_docker_image_id() is None else docker_images[0]
+            cache_key = await self.event_loop.run_blocking(self.task_cache.get_key, self.task, cmd, input_files,
+                                                           task_workspace.get_wrk_dir(), docker_image)
+            if cache_key is not None and \
+                    await self.event_loop.run_blocking(self.task_cache.restore, cache_key, self.task, task_workspace):
+                logging.info("(%s) Task output restored from task cache!" % self.task.get_ID())
+                self.cache_hit = True
+                self.cmd = cmd
+                self.set_status(self.FINALIZING)
+                if not self.__cancelled:
+                    with self.status_lock:
+                        self.__err = False
+                return True
+            self.cache_key = cache_key
+
+        # Command-less tasks that still need to transfer output only need a small processor
+        if not has_command:
+            cpus    = 1
+            mem     = 1
+
+        # Fused tasks share the processor so it must satisfy the largest requirements of any of them
+        # Files passed between fused tasks never leave the processor so only the remaining input is counted
+        has_commands    = [has_command]
+        ready_parents   = [self.task.get_ID()]
+        fused_paths     = set([output_file.get_path() for output_file in self.datastore.get_task_output_files(self.task.get_ID())])
+        for fused_task in self.fused_tasks:
+            has_commands.append(self.__prepare_fused_task(fused_task, ready_parents))
+            fused_module = fused_task.get_module()
+            if has_commands[-1]:
+                cpus    = max(cpus, fused_module.get_argument("nr_cpus"))
+                mem     = max(mem, fused_module.get_argument("mem"))
+            for input_file in self.datastore.get_task_input_files(fused_task.get_ID()):
+                if input_file.get_path() not in fused_paths:
+                    input_files.append(input_file)
+            if fused_task.get_docker_image_id() is not None:
+                docker_images.append(self.datastore.get_docker_image(docker_id=fused_task.get_docker_image_id()))
+            fused_paths.update([output_file.get_path() for output_file in self.datastore.get_task_output_files(fused_task.get_ID())])
+            ready_parents.append(fused_task.get_ID())
+
+        disk_space      = self.__compute_disk_requirements(input_files, docker_images)
+        logging.debug("(%s) CPU: %s, Mem: %s, Disk space: %s" % (self.task.get_ID(), cpus, mem, disk_space))
+
+        # Keep what the task needs to run on a processor
+        self.resources      = (cpus, mem, disk_space)
+        self.task_workspace = task_workspace
+        self.has_commands   = has_commands
+        self.ready_parents  = ready_parents
+        self.input_paths    = [input_file.get_transferrable_path() for input_file in input_files]
+        return False
+
+    async def __wait_for_resources(self):
+        # Queue request for resources on the platform and wait until it's granted or cancelled
+        # Input paths let the platform place the task on an idle processor that already holds its input
+        cpus, mem, disk_space = self.resources
+        with self.timeline.phase("wait_for_resources", task=self.task.get_ID()):
+            resource_request = self.platform.submit_request(self.request_id, cpus, mem, disk_space,
+                                                            priority=self.priority,
+                                                            input_paths=self.input_paths,
+                                                            share=self.share)
+
+            # Withdraw request if task was cancelled before it was queued
+            if self.is_cancelled():
+                self.platform.cancel_request(self.request_id)
+
+            # The platform calls back while holding its lock, so the callback only wakes the task worker on the loop
+            request_done = asyncio.get_event_loop().create_future()
+            resource_request.add_callback(functools.partial(self.event_loop.call_soon,
+                                                            TaskWorker.__set_done, request_done))
+            await request_done
+
+    @staticmethod
+    def __set_done(future):
+        if not future.done():
+            future.set_result(None)
+
+    async def __process(self):
+        # Run task and its fused tasks on a processor once the platform has granted the requested resources
+        cpus, mem, disk_space = self.resources
+        task_workspace  = self.task_workspace
+        has_commands    = self.has_commands
+        ready_parents   = self.ready_parents
+
+        # Quit if pipeline is cancelled
+        self.__check_cancelled()
+
+        # Execute command if one exists
+        self.set_status(self.LOADING)
+
+        # Get processor capable of running job
+        with self.timeline.phase("get_processor", task=self.task.get_ID()):
+            proc = self.platform.get_processor(self.request_id, cpus, mem, disk_space)
+
+        # Only account for runtime and cost accrued while the task holds the processor
+        self.proc_runtime_offset    = proc.get_runtime()
+        self.proc_cost_offset       = proc.compute_cost()
+        if proc.is_recycled():
+            self.lease_start_time = proc.get_time()
+        self.proc = proc
+        logging.debug("(%s) Successfully acquired processor!" % self.task.get_ID())
 
-            # Check to see if pipeline has been cancelled
-            self.__check_cancelled()
+        # Check to see if pipeline has been cancelled
+        self.__check_cancelled()
 
-            # Create the processor
-            self.proc.create()
+        # Create the processor unless it's been reused from a previous task
+        if not self.proc.is_recycled():
+            create_phase = self.timeline.start("create_processor", task=self.task.get_ID(), processor=self.proc.get_name())
+            try:
+                await self.proc.create_async()
+            finally:
+                self.__end_create_phase(create_phase)
 
-            # Check to see if pipeline has been cancelled
-            self.__check_cancelled()
+        # Check to see if pipeline has been cancelled
+        self.__check_cancelled()
+
+        # Run the task followed by each of the tasks fused with it
+        # Fused tasks share the working directory so input loaded by one of them isn't transferred again
+        module_executors = []
+        src_seen, dest_seen = [], []
+        for i, task in enumerate(self.get_tasks()):
+
+            # Reset input of fused tasks now that output of the previous task is final
+            if i > 0:
+                self.set_status(self.LOADING)
+                has_commands[i] = self.__prepare_fused_task(task, ready_parents[:i])
 
             # Create module executor
-            self.module_executor = ModuleExecutor(task_id=self.task.get_ID(),
-                                                  processor=self.proc,
-                                                  workspace=task_workspace,
-                                                  docker_image=docker_image)
+            workspace = task_workspace if i == 0 else \
+                self.datastore.get_task_workspace(task_id=task.get_ID(), wrk_task_id=self.task.get_ID())
+            docker_image = None if task.get_docker_image_id() is None else \
+                self.datastore.get_docker_image(docker_id=task.get_docker_image_id())
+            module_executor = ModuleExecutor(task_id=task.get_ID(),
+                                             processor=self.proc,
+                                             workspace=workspace,
+                                             docker_image=docker_image,
+                                             timeline=self.timeline)
+            await module_executor.create_workspace()
+            module_executors.append(module_executor)
+
+            # Logs of fused tasks are returned with the logs of the first task
+            if i == 0:
+                self.module_executor = module_executor
 
             # Check to see if pipeline has been cancelled
             self.__check_cancelled()
 
             # Run the command if there is any command to be run
-            if has_command:
-
-                # Load task inputs onto module executor
-                self.module_executor.load_input(input_files)
-
-                # Check to see if pipeline has been cancelled
-                self.__check_cancelled()
-
-                # Update module's command to reflect changes to input paths
-                self.set_status(self.RUNNING)
-                self.cmd = self.module.update_command()
-
-                if not self.module.is_resumable:
-                    logging.debug("Module (%s) is not resumable adding checkpoint(s)!" % self.module.get_ID())
-                    self.proc.add_checkpoint() # mark a checkpoint after all the input is done
-
-                # Check if we received a list of commands or only one
-                if isinstance(self.cmd, list):
-
-                    logging.info("Task '{0}' has a list of commands, so we will run them sequentially.".format(
-                        self.task.get_ID()))
-
-                    # Initialize the output and error placeholders
-                    out, err = None, None
-
-                    # Process each command
-                    for cmd_id, cmd in enumerate(self.cmd):
-
-                        # Create a unique job_name
-                        job_name = "{0}_{1}".format(self.task.get_ID(), cmd_id)
-
-                        # Run the actual command
-                        out, err = self.module_executor.run(cmd, job_name=job_name)
-
-                        # Check to see if pipeline has been cancelled
-                        self.__check_cancelled()
+            if has_commands[i]:
+                await self.__run_task(task, module_executor, src_seen, dest_seen)
 
-                    # Post-process only last command output if necessary
-                    self.module.process_cmd_output(out, err)
+        # Set the status to finalized
+        self.set_status(self.FINALIZING)
 
-                    if not self.module.is_resumable:
-                        self.proc.add_checkpoint(False) # mark a checkpoint after the command(s) have been run
+        # Save output files in workspace output dirs (if any)
+        for task, module_executor in zip(self.get_tasks(), module_executors):
+            output_files = self.datastore.get_task_output_files(task.get_ID())
+            final_output_types = task.get_final_output_keys()
 
-                else:
-
-                    # Run the actual command
-                    out, err = self.module_executor.run(self.cmd)
-
-                    # Check to see if pipeline has been cancelled
-                    self.__check_cancelled()
-
-                    # Post-process command output if necessary
-                    self.module.process_cmd_output(out, err)
-
-                    if not self.module.is_resumable:
-                        self.proc.add_checkpoint(False) # mark a checkpoint after the command has been run
-
-            # Set the status to finalized
-            self.set_status(self.FINALIZING)
+            # Output only passed to the next fused task doesn't need to leave the processor
+            if task.get_ID() in self.internal_task_ids:
+                output_files = [output_file for output_file in output_files
+                                if output_file.get_type() in final_output_types]
 
-            # Save output files in workspace output dirs (if any)
-            output_files = self.datastore.get_task_output_files(self.task.get_ID())
-            final_output_types = self.task.get_final_output_keys()
             if len(output_files) > 0:
-                self.module_executor.save_output(output_files, final_output_types)
-
-            # Indicate that task finished without any errors
-            if not self.__cancelled:
-                with self.status_lock:
-                    self.__err = False
-
-        except BaseException as e:
-            # Handle but do not raise exception if job was externally cancelled
-            if self.__cancelled:
-                logging.warning("Task '%s' failed due to cancellation!" % self.task.get_ID())
+                await module_executor.save_output(output_files, final_output_types)
 
-            else:
-                # Raise exception if job failed for any reason other than cancellation
-                self.set_status(self.FINALIZING)
-                logging.error("Task '%s' failed!" % self.task.get_ID())
-                raise
-        finally:
-            # Return logs and destroy processor if they exist
-            logging.debug("TaskWorker '%s' cleaning up..." % self.task.get_ID())
-            self.__clean_up()
-            # Notify that task worker has completed regardless of success
-            self.set_status(TaskWorker.COMPLETE)
+        # Indicate that task finished without any errors
+        if not self.__cancelled:
+            with self.status_lock:
+                self.__err = False
 
     def cancel(self):
         # Cancel pipeline during runtime
@@ -261,6 +448,9 @@ class TaskWorker(Thread):
         self.set_status(self.CANCELLING)
         self.__cancelled = True
 
+        # Stop waiting for platform resources
+        self.platform.cancel_request(self.request_id)
+
         if self.proc is not None:
             # Prevent further commands from being run on processor
             self.proc.stop()
@@ -271,11 +461,17 @@ class TaskWorker(Thread):
     def is_success(self):
         return not self.__err
 
+    def is_cache_hit(self):
+        return self.cache_hit
+
     def is_cancelled(self):
         with self.status_lock:
             return self.__cancelled
 
-    def __clean_up(self):
+    async def __clean_up(self):
+
+        # Release any platform resources reserved for the task but not claimed by a processor
+        self.platform.cancel_request(self.request_id)
 
         # Do nothing if errors occurred before processor was even created
         if self.proc is None:
@@ -285,18 +481,35 @@ class TaskWorker(Thread):
         try:
             # Unlock processor if it's been locked so logs can be returned
             if self.module_executor is not None and not self.__cancelled:
-                self.module_executor.save_logs()
+                await self.module_executor.save_logs()
         except BaseException as e:
             logging.error("Unable to return logs for task '%s'!" % self.task.get_ID())
             if str(e) != "":
                 logging.error("Received following error:\n%s" % e)
 
+        # Try to return processor to platform so it can be reused by other tasks
+        if self.is_success() and not self.__cancelled:
+            try:
+                runtime = self.proc.get_runtime() - self.proc_runtime_offset
+                cost    = self.proc.compute_cost() - self.proc_cost_offset
+                with self.timeline.phase("release_processor", task=self.task.get_ID()):
+                    released = await self.platform.release_processor_async(self.proc)
+                if released:
+                    self.lease_runtime  = runtime
+                    self.lease_cost     = cost
+                    return
+            except BaseException as e:
+                logging.error("Unable to release processor '%s' for task '%s'" % (self.proc.get_name(), self.task.get_ID()))
+                if str(e) != "":
+                    logging.error("Received following error:\n%s" % e)
+
         # Try to destroy platform if it's not off
         try:
 
             # Destroy processor
-            self.proc.destroy(wait=False)
-            self.proc.wait_process("destroy")
+            with self.timeline.phase("destroy_processor", task=self.task.get_ID(), processor=self.proc.get_name()):
+                self.proc.destroy(wait=False)
+                await self.proc.wait_process_async("destroy")
 
             # Deallocate
             self.platform.deallocate_resources(self.proc)
@@ -305,12 +518,101 @@ class TaskWorker(Thread):
             if str(e) != "":
                 logging.error("Received following error:\n%s" % e)
 
-    def __compute_disk_requirements(self, input_files, docker_image, input_multiplier=None):
+    def __prepare_fused_task(self, task, ready_parents):
+        # Set input of a fused task from the output of the tasks run before it and define its output
+        # Return True if the task has a command to run
+        self.datastore.set_task_input_args(task.get_ID(), ready_parents=ready_parents)
+        workspace = self.datastore.get_task_workspace(task_id=task.get_ID(), wrk_task_id=self.task.get_ID())
+        task.get_module().set_output_dir(workspace.get_wrk_out_dir())
+        return task.get_module().update_command() is not None
+
+    async def __run_task(self, task, module_executor, src_seen, dest_seen):
+        # Load input and run command of a task on the worker's processor
+        module = task.get_module()
+
+        # Load task inputs onto module executor
+        await module_executor.load_input(self.datastore.get_task_input_files(task.get_ID()), src_seen, dest_seen)
+
+        # Check to see if pipeline has been cancelled
+        self.__check_cancelled()
+
+        # Update module's command to reflect changes to input paths
+        self.set_status(self.RUNNING)
+        cmd = module.update_command()
+        if task is self.task:
+            self.cmd = cmd
+        else:
+            self.fused_cmds[task.get_ID()] = cmd
+
+        if not module.is_resumable:
+            logging.debug("Module (%s) is not resumable adding checkpoint(s)!" % module.get_ID())
+            self.proc.add_checkpoint() # mark a checkpoint after all the input is done
+
+        # Check if we received a list of commands or only one
+        if isinstance(cmd, list):
+
+            logging.info("Task '{0}' has a list of commands, so we will run them sequentially.".format(task.get_ID()))
+
+            # Initialize the output and error placeholders
+            out, err = None, None
+
+            # Process each command
+            for cmd_id, sub_cmd in enumerate(cmd):
+
+                # Create a unique job_name
+                job_name = "{0}_{1}".format(task.get_ID(), cmd_id)
+
+                # Run the actual command
+                out, err = await module_executor.run(sub_cmd, job_name=job_name)
+
+                # Check to see if pipeline has been cancelled
+                self.__check_cancelled()
+
+        else:
+
+            # Run the actual command
+            out, err = await module_executor.run(cmd)
+
+            # Check to see if pipeline has been cancelled
+            self.__check_cancelled()
+
+        # Post-process (last) command output if necessary
+        module.process_cmd_output(out, err)
+
+        if not module.is_resumable:
+            self.proc.add_checkpoint(False) # mark a checkpoint after the command(s) have been run
+
+    def __can_run_in_process(self, input_files):
+        # Determine whether a task without a command can be completed without a processor
+        # Possible if every output file is an input file passed through as-is so nothing needs to be transferred
+        final_output_types = self.task.get_final_output_keys()
+        input_sizes = {input_file.get_path(): input_file.get_size() for input_file in input_files}
+        for output_file in self.datastore.get_task_output_files(self.task.get_ID()):
+
+            # Final output needs to be transferred to the final output directory
+            if output_file.get_type() in final_output_types:
+                return False
+
+            # Output needs to be transferred if it's not one of the task's inputs
+            if output_file.get_path() not in input_sizes:
+                return False
+
+            # Output size is the size of the input it points to
+            if not output_file.size_known():
+                output_file.set_size(input_sizes[output_file.get_path()])
+
+            # Output size must be known so downstream tasks can compute their disk requirements
+            if not output_file.size_known():
+                return False
+
+        return True
+
+    def __compute_disk_requirements(self, input_files, docker_images, input_multiplier=None):
         # Compute size of disk needed to store input/output files
         input_size = 0
 
-        # Add size of docker image if one needs to be loaded for task
-        if docker_image is not None:
+        # Add size of docker images that need to be loaded for task
+        for docker_image in docker_images:
             input_size += docker_image.get_size()
 
         # Add sizes of each input file
@@ -339,6 +641,17 @@ class TaskWorker(Thread):
         disk_size = min(disk_size, max_disk_size)
         return disk_size
 
+    def __end_create_phase(self, create_phase):
+        # End creation of the processor. Time spent waiting for the processor to become ready after it was created
+        # (e.g. booting the instance) is recorded as a separate phase
+        self.timeline.end(create_phase)
+        create_time = self.proc.get_create_time()
+        if create_time is None or not create_phase["start"] <= create_time <= create_phase["end"]:
+            return
+        self.timeline.add("wait_until_ready", create_time, create_phase["end"],
+                          task=self.task.get_ID(), processor=self.proc.get_name())
+        create_phase["end"] = create_time
+
     def __check_cancelled(self):
         if self.__cancelled:
             raise RuntimeError("(%s) Task failed due to cancellation!")
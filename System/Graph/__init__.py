@@ -1,6 +1,10 @@
 from .Task import Task
 from .Graph import Graph
 from .ModuleExecutor import ModuleExecutor
+from .PriorityPolicy import RuntimeEstimator, CriticalPathPolicy
+from .TaskCache import TaskCache
+from .TaskTimeline import TaskTimeline
 from .TaskWorker import TaskWorker
 from .Scheduler import Scheduler
+from .BatchScheduler import BatchScheduler
 
@@ -60,3 +60,22 @@ class DockerHelper(object):
             if str(e) != "":
                 logging.error("Received the following msg:\n%s" % e)
             raise
+
+    def get_image_digest(self, image_name, job_name=None, **kwargs):
+        # Return id of image, which is the digest of the image contents
+        cmd = "sudo docker image inspect %s --format='{{.Id}}'" % image_name
+
+        # Run command and return job name
+        job_name = "get_digest_%s" % image_name if job_name is None else job_name
+        self.proc.run(job_name, cmd, **kwargs)
+
+        # Wait for cmd to finish and get output
+        try:
+            out, err = self.proc.wait_process(job_name)
+            return out.strip()
+
+        except BaseException as e:
+            logging.error("Unable to get docker image digest: %s" % image_name)
+            if str(e) != "":
+                logging.error("Received the following msg:\n%s" % e)
+            raise
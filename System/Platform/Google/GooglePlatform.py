@@ -95,29 +95,36 @@ class GooglePlatform(Platform):
                             disk_space,
                             **instance_config)
 
-    def publish_report(self, report=None):
+    def publish_report(self, report=None, name=None, output_dir=None):
 
         # Exit as nothing to output
         if report is None:
             return
 
-        # Generate report file for transfer
-        with tempfile.NamedTemporaryFile(delete=False) as report_file:
-            report_file.write(str(report).encode("utf8"))
-            report_filepath = report_file.name
-
-        # Generate destination file path
-        dest_path = os.path.join(self.final_output_dir, "%s_final_report.json" % self.name)
-
         # Transfer report file to bucket
-        options_fast = '-m -o "GSUtil:sliced_object_download_max_components=200"'
-        cmd = "gsutil %s cp -r %s %s 1>/dev/null 2>&1 " % (options_fast, report_filepath, dest_path)
-        GoogleCloudHelper.run_cmd(cmd, err_msg="Could not transfer final report to the final output directory!")
+        name        = self.name if name is None else name
+        output_dir  = self.final_output_dir if output_dir is None else output_dir
+        dest_path   = os.path.join(output_dir, "%s_final_report.json" % name)
+        self.__upload_string(str(report), dest_path,
+                             err_msg="Could not transfer final report to the final output directory!")
 
         # Send report to the Pub/Sub report topic if it's known to exist
         if self.report_topic_validated:
             GoogleCloudHelper.send_pubsub_message(self.report_topic, message=dest_path, encode=True, compress=True)
 
+    def publish_run_state(self, run_state=None, name=None, output_dir=None):
+
+        # Exit as nothing to output
+        if run_state is None:
+            return
+
+        # Transfer run state file to bucket. Overwrites run state saved earlier in the run
+        name        = self.name if name is None else name
+        output_dir  = self.final_output_dir if output_dir is None else output_dir
+        dest_path   = os.path.join(output_dir, "%s_run_state.json" % name)
+        self.__upload_string(str(run_state), dest_path,
+                             err_msg="Could not transfer run state to the final output directory!")
+
     def clean_up(self):
 
         logging.info("Cleaning up Google Cloud Platform.")
@@ -187,3 +194,17 @@ class GooglePlatform(Platform):
             logging.warn("Modified instance name from %s to %s for compatibility!" % (old_instance_name, instance_name))
 
         return instance_name
+
+    @staticmethod
+    def __upload_string(contents, dest_path, err_msg):
+        # Write contents to a temporary file and transfer it to the bucket
+        with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
+            tmp_file.write(contents.encode("utf8"))
+            tmp_filepath = tmp_file.name
+
+        options_fast = '-m -o "GSUtil:sliced_object_download_max_components=200"'
+        cmd = "gsutil %s cp -r %s %s 1>/dev/null 2>&1 " % (options_fast, tmp_filepath, dest_path)
+        try:
+            GoogleCloudHelper.run_cmd(cmd, err_msg=err_msg)
+        finally:
+            os.remove(tmp_filepath)
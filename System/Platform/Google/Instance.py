@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import subprocess as sp
 import time
@@ -5,7 +6,7 @@ import math
 import random
 import getpass
 
-from System.Platform import Process, Processor
+from System.Platform import Processor
 from System.Platform.Google import GoogleCloudHelper, GoogleResourceNotFound
 
 class Instance(Processor):
@@ -122,10 +123,45 @@ class Instance(Processor):
 
     def create(self):
 
+        # Time how long it takes for the instance to become available
+        create_start = time.time()
+        self.__prepare_create()
+
+        # Try to create instance until either it's successful, we're out of retries, or the processor is locked
+        self.__start_create()
+        self.wait_process("create")
+        self.create_time = self.get_time()
+
+        # Wait for instance to be accessible through SSH
+        logging.debug("(%s) Waiting for instance to be accessible" % self.name)
+        self.wait_until_ready()
+
+        self.boot_time = time.time() - create_start
+
+    async def create_async(self):
+        # Coroutine version of create(). Looking up the instance type and its price can block so it's done from an
+        # executor thread
+        create_start = time.time()
+        await asyncio.get_event_loop().run_in_executor(None, self.__prepare_create)
+
+        self.__start_create()
+        await self.wait_process_async("create")
+        self.create_time = self.get_time()
+
+        logging.debug("(%s) Waiting for instance to be accessible" % self.name)
+        await self.wait_until_ready_async()
+
+        self.boot_time = time.time() - create_start
+
+    def __prepare_create(self):
+        # Determine instance type and price before creating the instance
+
         if self.is_locked():
             logging.error("(%s) Failed to create processor. Processor locked!" % self.name)
             raise RuntimeError("Cannot create processor while locked!")
 
+        self.create_time = None
+
         # Set status to indicate that commands can't be run on processor because it's busy
         logging.info("(%s) Process 'create' started!" % self.name)
         # Determine instance type and actual resource usage based on current Google prices in instance zone
@@ -145,21 +181,15 @@ class Instance(Processor):
                                                           self.nr_local_ssd)
         logging.debug("(%s) Instance type is %s. Price per hour: %s cents" % (self.name, self.instance_type, self.price))
 
-        # Generate gcloud create cmd
+    def __start_create(self):
+        # Generate gcloud create cmd and start creating the instance
         cmd = self.__get_gcloud_create_cmd()
-
-        # Try to create instance until either it's successful, we're out of retries, or the processor is locked
-        self.processes["create"] = Process(cmd,
-                                           cmd=cmd,
-                                           stdout=sp.PIPE,
-                                           stderr=sp.PIPE,
-                                           shell=True,
-                                           num_retries=self.default_num_cmd_retries)
-        self.wait_process("create")
-
-        # Wait for instance to be accessible through SSH
-        logging.debug("(%s) Waiting for instance to be accessible" % self.name)
-        self.wait_until_ready()
+        self.processes["create"] = self.start_process(cmd,
+                                                      cmd=cmd,
+                                                      stdout=sp.PIPE,
+                                                      stderr=sp.PIPE,
+                                                      shell=True,
+                                                      num_retries=self.default_num_cmd_retries)
 
     def recreate(self):
 
@@ -184,12 +214,12 @@ class Instance(Processor):
         cmd = self.__get_gcloud_destroy_cmd()
 
         # Run command, wait for destroy to complete, and set status to 'OFF'
-        self.processes["destroy"] = Process(cmd,
-                                            cmd=cmd,
-                                            stdout=sp.PIPE,
-                                            stderr=sp.PIPE,
-                                            shell=True,
-                                            num_retries=self.default_num_cmd_retries)
+        self.processes["destroy"] = self.start_process(cmd,
+                                                       cmd=cmd,
+                                                       stdout=sp.PIPE,
+                                                       stderr=sp.PIPE,
+                                                       shell=True,
+                                                       num_retries=self.default_num_cmd_retries)
 
         # Wait for delete to complete if requested
         if wait:
@@ -208,7 +238,35 @@ class Instance(Processor):
 
         # Wait for process to finish
         out, err = proc_obj.communicate()
+        self.__set_output(proc_obj, out, err)
+
+        # Case: Process completed with errors
+        if proc_obj.has_failed():
+            # Determine whether to retry or raise errors
+            self.handle_failure(proc_name, proc_obj)
+            # If no errors thrown, try waiting on the process again
+            return self.wait_process(proc_name)
+
+        return self.__finish_process(proc_name, proc_obj)
+
+    async def wait_process_async(self, proc_name):
+        # Coroutine version of wait_process()
+        # Failures are handled from an executor thread as handling them blocks while checking and resetting the instance
+        proc_obj = self.processes[proc_name]
+        if proc_obj.is_complete():
+            return proc_obj.get_output()
+
+        out, err = await proc_obj.communicate_async()
+        self.__set_output(proc_obj, out, err)
+
+        if proc_obj.has_failed():
+            await asyncio.get_event_loop().run_in_executor(None, self.handle_failure, proc_name, proc_obj)
+            return await self.wait_process_async(proc_name)
 
+        return self.__finish_process(proc_name, proc_obj)
+
+    @staticmethod
+    def __set_output(proc_obj, out, err):
         # Convert to string formats
         out = out.decode("utf8")
         err = err.decode("utf8")
@@ -219,13 +277,9 @@ class Instance(Processor):
         # Store process output for later use
         proc_obj.set_output(out=out, err=err)
 
-        # Case: Process completed with errors
-        if proc_obj.has_failed():
-            # Determine whether to retry or raise errors
-            self.handle_failure(proc_name, proc_obj)
-            # If no errors thrown, try waiting on the process again
-            return self.wait_process(proc_name)
-
+    def __finish_process(self, proc_name, proc_obj):
+        # Record the end of a process that completed successfully and return its output
+        out, err = proc_obj.get_output()
         if proc_name in ["create", "start"]:
             # Set start time
             self.set_start_time()
@@ -292,12 +346,12 @@ class Instance(Processor):
         if can_retry and proc_name in ["create", "destroy"]:
             time.sleep(3)
             logging.warning("(%s) Process '%s' failed but we still got %s retries left. Re-running command!" % (self.name, proc_name, proc_obj.get_num_retries()))
-            self.processes[proc_name] = Process(proc_obj.get_command(),
-                                                cmd=proc_obj.get_command(),
-                                                stdout=sp.PIPE,
-                                                stderr=sp.PIPE,
-                                                shell=True,
-                                                num_retries=proc_obj.get_num_retries() - 1)
+            self.processes[proc_name] = self.start_process(proc_obj.get_command(),
+                                                           cmd=proc_obj.get_command(),
+                                                           stdout=sp.PIPE,
+                                                           stderr=sp.PIPE,
+                                                           shell=True,
+                                                           num_retries=proc_obj.get_num_retries() - 1)
         # Retry 'run' command
         elif can_retry:
             time.sleep(3)
@@ -337,34 +391,68 @@ class Instance(Processor):
             # Wait for 15 seconds before checking the status again
             time.sleep(15)
 
-            # Update the status from the cloud
-            self.update_status()
-
-            # If instance is not creating, it means it does not exist on the cloud or it's stopped
-            if self.get_status() not in [Processor.CREATING, Processor.AVAILABLE]:
-                logging.debug("(%s) Instance has been shut down, removed, or preempted. Resetting instance!" % self.name)
+            # Stop waiting once instance is ready or doesn't exist anymore
+            is_ready = self.__check_ready()
+            if is_ready is not None:
+                needs_recreate = not is_ready
                 break
 
-            # Check if ssh server is accessible. If not wait another cycle
-            if self.check_ssh():
+        # Check if it needs resetting
+        if needs_recreate:
+            self.recreate()
 
-                # Increase number of SSH connections
-                self.__configure_SSH()
+        # If we arrived at this point, then we are all set!
+        self.ssh_ready = True
+        logging.debug("(%s) Instance can be accessed through SSH!" % self.name)
 
-                # We do not need to recreate it
-                needs_recreate = False
+    async def wait_until_ready_async(self):
+        # Coroutine version of wait_until_ready(). Waits on the event loop and only checks the instance from executor
+        # threads
+        loop = asyncio.get_event_loop()
+        self.ssh_ready = False
+        needs_recreate = True
+        cycle_count = 0
+        while cycle_count < 40:
+            cycle_count += 1
 
-                # Break the loop as we finished configuring the SSH
+            if self.is_locked():
+                logging.debug("(%s) Instance locked while waiting for creation!" % self.name)
+                raise RuntimeError("(%s) Instance locked while waiting for creation!" % self.name)
+
+            await asyncio.sleep(15)
+
+            is_ready = await loop.run_in_executor(None, self.__check_ready)
+            if is_ready is not None:
+                needs_recreate = not is_ready
                 break
 
-        # Check if it needs resetting
         if needs_recreate:
-            self.recreate()
+            await loop.run_in_executor(None, self.recreate)
 
-        # If we arrived at this point, then we are all set!
         self.ssh_ready = True
         logging.debug("(%s) Instance can be accessed through SSH!" % self.name)
 
+    def __check_ready(self):
+        # Check whether instance can be SSHed and configure SSH once it can
+        # Return True if instance is ready, False if it has to be recreated and None if it's still booting
+
+        # Update the status from the cloud
+        self.update_status()
+
+        # If instance is not creating, it means it does not exist on the cloud or it's stopped
+        if self.get_status() not in [Processor.CREATING, Processor.AVAILABLE]:
+            logging.debug("(%s) Instance has been shut down, removed, or preempted. Resetting instance!" % self.name)
+            return False
+
+        # Check if ssh server is accessible. If not wait another cycle
+        if self.check_ssh():
+
+            # Increase number of SSH connections
+            self.__configure_SSH()
+            return True
+
+        return None
+
     def raise_error(self, proc_name, proc_obj):
         # Log failure to debug logger if quiet failure
         stdout_msg, stderr_msg = proc_obj.get_output()
@@ -2,7 +2,7 @@ import logging
 import subprocess as sp
 import time
 
-from System.Platform import Process, Processor
+from System.Platform import Processor
 from System.Platform.Google import Instance
 
 class PreemptibleInstance(Instance):
@@ -42,12 +42,12 @@ class PreemptibleInstance(Instance):
         cmd = self.__get_gcloud_start_cmd()
 
         # Run command, wait for start to complete
-        self.processes["start"] = Process(cmd,
-                                          cmd=cmd,
-                                          stdout=sp.PIPE,
-                                          stderr=sp.PIPE,
-                                          shell=True,
-                                          num_retries=self.default_num_cmd_retries)
+        self.processes["start"] = self.start_process(cmd,
+                                                     cmd=cmd,
+                                                     stdout=sp.PIPE,
+                                                     stderr=sp.PIPE,
+                                                     shell=True,
+                                                     num_retries=self.default_num_cmd_retries)
 
         # Wait for start to complete if requested
         self.wait_process("start")
@@ -62,12 +62,12 @@ class PreemptibleInstance(Instance):
         cmd = self.__get_gcloud_stop_cmd()
 
         # Run command to stop the instances
-        self.processes["stop"] = Process(cmd,
-                                         cmd=cmd,
-                                         stdout=sp.PIPE,
-                                         stderr=sp.PIPE,
-                                         shell=True,
-                                         num_retries=self.default_num_cmd_retries)
+        self.processes["stop"] = self.start_process(cmd,
+                                                    cmd=cmd,
+                                                    stdout=sp.PIPE,
+                                                    stderr=sp.PIPE,
+                                                    shell=True,
+                                                    num_retries=self.default_num_cmd_retries)
 
         # Wait for instance to stop
         self.wait_process("stop")
@@ -351,12 +351,12 @@ class PreemptibleInstance(Instance):
         elif can_retry and proc_name in ["create", "destroy"]:
             time.sleep(3)
             logging.warning("(%s) Process '%s' failed but we still got %s retries left. Re-running command!" % (self.name, proc_name, proc_obj.get_num_retries()))
-            self.processes[proc_name] = Process(proc_obj.get_command(),
-                                                cmd=proc_obj.get_command(),
-                                                stdout=sp.PIPE,
-                                                stderr=sp.PIPE,
-                                                shell=True,
-                                                num_retries=proc_obj.get_num_retries() - 1)
+            self.processes[proc_name] = self.start_process(proc_obj.get_command(),
+                                                           cmd=proc_obj.get_command(),
+                                                           stdout=sp.PIPE,
+                                                           stderr=sp.PIPE,
+                                                           shell=True,
+                                                           num_retries=proc_obj.get_num_retries() - 1)
 
         # Retry 'run' command
         elif can_retry:
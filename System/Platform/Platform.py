@@ -1,9 +1,15 @@
 import logging
 import abc
 import uuid
+import queue
 import threading
+import time
+import itertools
+import bisect
 
 from Config import ConfigParser
+from System.Platform import ProcessorPool
+from System.Workers import EventLoop
 
 class TaskPlatformResourceLimitError(Exception):
     pass
@@ -14,6 +20,79 @@ class TaskPlatformLockError(Exception):
 class InvalidProcessorError(Exception):
     pass
 
+class ResourceRequest(object):
+    # Request for platform resources that waits in the platform's reservation queue until it's granted or cancelled
+    def __init__(self, task_id, nr_cpus, mem, disk_space, priority=0, order=0, input_paths=None, done_event=None, share=None):
+        self.task_id    = task_id
+        self.nr_cpus    = nr_cpus
+        self.mem        = mem
+        self.disk_space = disk_space
+
+        # Pipeline the request belongs to when several pipelines share the platform (None = not shared)
+        self.share      = share
+
+        # Paths of input files used to place task on a processor that already holds them
+        self.input_paths = input_paths
+
+        # Higher priority requests are granted first. Requests with equal priority are granted in order of arrival
+        self.priority   = priority
+        self.order      = order
+
+        # Idle processor from the platform's pool assigned to the request (None = new processor will be created)
+        # and whether that processor already holds some of the task's input files
+        self.processor  = None
+        self.is_local   = False
+
+        # vCPUs granted to later requests while this request was at the head of the queue but didn't fit
+        self.backfilled_cpus = 0
+
+        # Event set once the request has either been granted or cancelled
+        self.__done     = threading.Event() if done_event is None else done_event
+        self.__granted  = False
+
+        # Functions called without arguments once the request has either been granted or cancelled
+        self.__lock         = threading.Lock()
+        self.__callbacks    = []
+
+    def grant(self):
+        self.__granted = True
+        self.__finish()
+
+    def cancel(self):
+        self.__granted = False
+        self.__finish()
+
+    def add_callback(self, callback):
+        # Call function once the request is granted or cancelled instead of blocking a thread until then
+        # Function is called right away if the request is already done
+        with self.__lock:
+            if not self.__done.is_set():
+                self.__callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout=None):
+        # Block until request is granted or cancelled. Return True if resources were granted.
+        self.__done.wait(timeout)
+        return self.__granted
+
+    def is_done(self):
+        return self.__done.is_set()
+
+    def __finish(self):
+        with self.__lock:
+            self.__done.set()
+            callbacks, self.__callbacks = self.__callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def is_granted(self):
+        return self.__granted
+
+    def __lt__(self, other):
+        return (-self.priority, self.order) < (-other.priority, other.order)
+
+
 class Platform(object, metaclass=abc.ABCMeta):
     CONFIG_SPEC = None
 
@@ -64,6 +143,32 @@ class Platform(object, metaclass=abc.ABCMeta):
 
         self.dealloc_procs = []
 
+        # Resource requests waiting to be granted for each share sorted by priority then arrival order
+        # Requests of pipelines that don't share the platform are queued under None
+        self.waiting_requests = {}
+        self.request_counter = itertools.count()
+
+        # vCPUs reserved for or held by the running tasks of each share
+        self.share_cpus = {}
+
+        # Granted requests of tasks currently holding a processor: processor name -> request
+        self.leases = {}
+
+        # Resources granted to tasks that haven't yet been claimed by a processor
+        self.reservations = {}
+
+        # Resources (cpus, mem, disk space) allocated to each processor
+        self.allocations = {}
+
+        # Pool of idle processors that can be reused by tasks with the same shape
+        self.processor_pool = ProcessorPool(idle_ttl=self.config.get("processor_pool_ttl", ProcessorPool.DEFAULT_IDLE_TTL))
+
+        # Shape (cpus, mem, disk space) requested for each task processor
+        self.processor_shapes = {}
+
+        # Event loop on which task workers run as coroutines (created once the first task worker is started)
+        self.event_loop = None
+
     def get_processor(self, task_id, nr_cpus, mem, disk_space):
         # Initialize new processor and register with platform
 
@@ -78,6 +183,19 @@ class Platform(object, metaclass=abc.ABCMeta):
         self.__check_processor(task_id, nr_cpus, mem, disk_space)
         logging.debug("(%s) Processor ain't too big!" % task_id)
 
+        # Reuse idle processor if one was assigned to the task when its resources were reserved
+        with self.platform_lock:
+            reservation = self.reservations.get(task_id, None)
+            if reservation is not None and reservation.processor is not None:
+                self.reservations.pop(task_id)
+                self.leases[reservation.processor.get_name()] = reservation
+                self.processor_pool.record_hit(reservation.processor, is_local=reservation.is_local)
+                logging.info("Reusing processor '%s' for task '%s'%s!" % (reservation.processor.get_name(), task_id,
+                                                                          " (holds task input)" if reservation.is_local else ""))
+                return reservation.processor
+            if self.processor_pool.is_enabled():
+                self.processor_pool.record_miss()
+
         # Ensure unique name for processor
         name        = "proc-%s-%s-%s" % (self.name[:20], task_id[:25], self.generate_unique_id())
         logging.info("Creating processor '%s' for task '%s'..." % (name, task_id))
@@ -93,9 +211,11 @@ class Platform(object, metaclass=abc.ABCMeta):
             logging.debug("(%s) We are starting to put that processor in the spot..." % task_id)
             if proc_name not in self.processors:
                 self.processors[proc_name]    = processor
-                self.cpu += processor.get_nr_cpus()
-                self.mem += processor.get_mem()
-                self.disk_space += processor.get_disk_space()
+                reservation = self.reservations.pop(task_id, None)
+                self.__allocate(proc_name, processor, reservation)
+                if reservation is not None:
+                    self.leases[proc_name] = reservation
+                self.processor_shapes[proc_name] = (nr_cpus, mem, disk_space)
                 logging.debug("(%s) We put that processor in the spot!" % proc_name)
             else:
                 logging.error("Platform cannot create task processor with duplicate id: '%s'!" % proc_name)
@@ -120,9 +240,8 @@ class Platform(object, metaclass=abc.ABCMeta):
         # Add to list of processors if not already there
         if "helper" not in self.processors:
             self.processors["helper"]   = processor
-            self.cpu += processor.get_nr_cpus()
-            self.mem += processor.get_mem()
-            self.disk_space += processor.get_disk_space()
+            with self.platform_lock:
+                self.__allocate("helper", processor)
         else:
             logging.error("Platform cannot create duplicate helper processor!")
             raise RuntimeError("Platform attempted to create duplicate helper processor!")
@@ -130,12 +249,85 @@ class Platform(object, metaclass=abc.ABCMeta):
         return self.processors["helper"]
 
     def can_make_processor(self, req_cpus, req_mem, req_disk_space):
-        logging.info("\n{0}".format(self.__get_curr_usage_string()))
+        logging.debug("\n{0}".format(self.__get_curr_usage_string()))
+        with self.platform_lock:
+            return self.__has_capacity(req_cpus, req_mem, req_disk_space) and (not self.__locked)
+
+    def submit_request(self, task_id, nr_cpus, mem, disk_space, priority=0, input_paths=None, share=None):
+        # Add request for resources to the reservation queue and return it without waiting for it to be granted
+        with self.platform_lock:
+            request = ResourceRequest(task_id, nr_cpus, mem, disk_space,
+                                      priority=priority,
+                                      order=next(self.request_counter),
+                                      input_paths=input_paths,
+                                      done_event=self.make_event(),
+                                      share=share)
+            bisect.insort(self.waiting_requests.setdefault(share, []), request)
+            self.__grant_requests()
+        return request
+
+    def request_resources(self, task_id, nr_cpus, mem, disk_space, priority=0, input_paths=None, share=None):
+        # Block until the platform reserves the requested resources for a task
+        # Return False if the request was cancelled before it could be granted
+        request = self.submit_request(task_id, nr_cpus, mem, disk_space, priority, input_paths, share)
+        return request.wait()
+
+    def cancel_request(self, task_id):
+        # Withdraw a task's waiting request and release any resources reserved for it but not yet claimed by a processor
+        with self.platform_lock:
+            for requests in self.waiting_requests.values():
+                request = next((request for request in requests if request.task_id == task_id), None)
+                if request is not None:
+                    self.__remove_request(request)
+                    request.cancel()
+                    break
+
+            reservation = self.reservations.pop(task_id, None)
+            if reservation is not None:
+                self.__release_share(reservation)
+            if reservation is not None and reservation.processor is not None:
+                # Return unclaimed processor to the pool
+                self.__add_to_pool(reservation.processor)
+            elif reservation is not None:
+                self.cpu -= reservation.nr_cpus
+                self.mem -= reservation.mem
+                self.disk_space -= reservation.disk_space
+
+            # Wake requests that fit in the released resources
+            self.__grant_requests()
+
+    def release_processor(self, proc):
+        # Return a processor to the pool so it can be reused by another task
+        # Returns False if processor can't be reused and must be destroyed by the caller
+        if not self.__can_release(proc):
+            return False
+
+        # Clear the previous task's workspace and processes from the processor
+        try:
+            proc.recycle()
+        except BaseException as e:
+            self.__log_recycle_failure(proc, e)
+            return False
+
+        return self.__add_released(proc)
+
+    async def release_processor_async(self, proc):
+        # Coroutine version of release_processor()
+        if not self.__can_release(proc):
+            return False
+
+        # Clear the previous task's workspace and processes from the processor
+        try:
+            await proc.recycle_async()
+        except BaseException as e:
+            self.__log_recycle_failure(proc, e)
+            return False
+
+        return self.__add_released(proc)
+
+    def get_processor_pool_stats(self):
         with self.platform_lock:
-            cpu_overload    = self.cpu + req_cpus > self.TOTAL_NR_CPUS
-            mem_overload    = self.mem + req_mem > self.TOTAL_MEM
-            disk_overload   = self.disk_space + req_disk_space > self.TOTAL_DISK_SPACE
-        return (not cpu_overload) and (not mem_overload) and (not disk_overload) and (not self.__locked)
+            return self.processor_pool.get_stats()
 
     def deallocate_resources(self, proc):
         # Free-up resources being used by a processor
@@ -143,10 +335,50 @@ class Platform(object, metaclass=abc.ABCMeta):
             logging.error("Cannot de-allocate resources for processor '%s%! No processor with that ID found on platform!")
             raise RuntimeError("Attempt to deallocate processor that doesn't exist on platform!")
         with self.platform_lock:
-            self.cpu -= proc.get_nr_cpus()
-            self.mem -= proc.get_mem()
-            self.disk_space -= proc.get_disk_space()
+            nr_cpus, mem, disk_space = self.allocations.pop(proc.get_name(), (0, 0, 0))
+            self.cpu -= nr_cpus
+            self.mem -= mem
+            self.disk_space -= disk_space
             self.dealloc_procs.append(proc.get_name())
+            self.__end_lease(proc.get_name())
+
+            # Wake the next requests that fit in the freed resources
+            self.__grant_requests()
+
+    def make_queue(self):
+        # Return queue used to pass objects between threads running tasks on the platform
+        return queue.Queue()
+
+    def make_event(self):
+        # Return event used to wake threads running tasks on the platform
+        return threading.Event()
+
+    def make_event_loop(self):
+        # Return event loop on which task workers run as coroutines
+        return EventLoop(name=self.name)
+
+    def get_event_loop(self):
+        # Return event loop shared by every task worker running on the platform
+        with self.platform_lock:
+            if self.event_loop is None:
+                self.event_loop = self.make_event_loop()
+            return self.event_loop
+
+    def start_thread(self, function, args):
+        # Call function with args in the background
+        thread = threading.Thread(target=function, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def start_timer(self, interval, function, args):
+        # Call function with args in the background after interval (sec)
+        timer = threading.Timer(interval, function, args)
+        timer.daemon = True
+        timer.start()
+
+    def get_time(self):
+        # Current time (sec) as seen by threads running tasks on the platform
+        return time.time()
 
     def get_max_nr_cpus(self):
         return self.MAX_NR_CPUS
@@ -173,6 +405,31 @@ class Platform(object, metaclass=abc.ABCMeta):
     def unlock(self):
         with self.platform_lock:
             self.__locked = False
+            self.__grant_requests()
+
+    def __can_release(self, proc):
+        # Determine whether a processor can be returned to the pool
+        return self.processor_pool.is_enabled() and not self.__locked and proc.get_name() in self.processor_shapes
+
+    @staticmethod
+    def __log_recycle_failure(proc, e):
+        logging.warning("(%s) Unable to recycle processor! Processor will be destroyed." % proc.get_name())
+        if str(e) != "":
+            logging.debug("Received the following message:\n%s" % e)
+
+    def __add_released(self, proc):
+        # Add a recycled processor to the pool. Returns False if the platform was locked in the meantime
+        with self.platform_lock:
+            if self.__locked:
+                return False
+            self.__end_lease(proc.get_name())
+            self.__add_to_pool(proc)
+
+            # Wake requests that can use the idle processor
+            self.__grant_requests()
+
+        logging.debug("(%s) Processor released to pool!" % proc.get_name())
+        return True
 
     def __check_processor(self, task_id, nr_cpus, mem, disk_space):
         # Check that nr_cpus, mem, disk space are under max
@@ -211,6 +468,166 @@ class Platform(object, metaclass=abc.ABCMeta):
             raise TaskPlatformResourceLimitError(
                 "Task resource limit (CPU/Mem/Disk space) cannot exceed platform resource limit!")
 
+    def __has_capacity(self, nr_cpus, mem, disk_space):
+        # Determine whether resources are available without exceeding platform limits
+        cpu_overload    = self.cpu + nr_cpus > self.TOTAL_NR_CPUS
+        mem_overload    = self.mem + mem > self.TOTAL_MEM
+        disk_overload   = self.disk_space + disk_space > self.TOTAL_DISK_SPACE
+        return (not cpu_overload) and (not mem_overload) and (not disk_overload)
+
+    def __grant_requests(self):
+        # Grant waiting requests in priority/FIFO order until the next request doesn't fit
+        # Later requests that fit in the remaining resources are then backfilled ahead of the request that doesn't fit
+        # Must be called while holding the platform lock
+        while len(self.waiting_requests) > 0 and not self.__locked:
+            request = self.__get_next_request()
+            if not self.__grant_request(request, evict=True):
+                self.__backfill_requests(request)
+                break
+
+    def __grant_request(self, request, evict=False):
+        # Reserve resources for a waiting request and grant it. Return False if the request doesn't fit
+        # Must be called while holding the platform lock
+
+        # Hand over an idle processor holding the task's input or with the same shape if one is available
+        request.processor, request.is_local = self.processor_pool.claim(request.nr_cpus,
+                                                                         request.mem,
+                                                                         request.disk_space,
+                                                                         request.input_paths)
+
+        if request.processor is None:
+            # Destroy idle processors that are preventing the request from fitting
+            if evict and not self.__has_capacity(request.nr_cpus, request.mem, request.disk_space):
+                self.__evict_idle_processors(request.nr_cpus, request.mem, request.disk_space)
+            if not self.__has_capacity(request.nr_cpus, request.mem, request.disk_space):
+                return False
+
+            # Reserve resources until they're claimed by the task's processor
+            self.cpu += request.nr_cpus
+            self.mem += request.mem
+            self.disk_space += request.disk_space
+
+        self.__remove_request(request)
+        self.reservations[request.task_id] = request
+        self.share_cpus[request.share] = self.share_cpus.get(request.share, 0) + request.nr_cpus
+        logging.debug("(%s) Platform reserved resources for task!\n%s" % (request.task_id, self.__get_curr_usage_string()))
+        request.grant()
+        return True
+
+    def __backfill_requests(self, blocked_request):
+        # Grant later requests that fit in the resources left idle while the next request waits for more to free up
+        # Requests backfilled ahead of a blocked request get at most as many vCPUs in total as the blocked request
+        # itself, so a stream of small requests can't delay a large one indefinitely
+        # Must be called while holding the platform lock
+        no_fit_shapes = set()
+        for share in sorted(self.waiting_requests, key=lambda share: self.share_cpus.get(share, 0)):
+            for request in list(self.waiting_requests.get(share, [])):
+                if blocked_request.backfilled_cpus >= blocked_request.nr_cpus:
+                    return
+
+                shape = (request.nr_cpus, request.mem, request.disk_space)
+                if request is blocked_request or shape in no_fit_shapes or \
+                        blocked_request.backfilled_cpus + request.nr_cpus > blocked_request.nr_cpus:
+                    continue
+
+                if self.__grant_request(request):
+                    logging.debug("(%s) Task backfilled ahead of task '%s'!" % (request.task_id, blocked_request.task_id))
+                    blocked_request.backfilled_cpus += request.nr_cpus
+                elif len(self.processor_pool.get_idle_processors()) == 0:
+                    # Other requests with the same shape won't fit either unless they can use an idle processor
+                    no_fit_shapes.add(shape)
+
+    def __get_next_request(self):
+        # Return the waiting request to grant next. Must be called while holding the platform lock
+        # Shares take turns so that no pipeline takes over the platform: the share holding the fewest vCPUs goes next
+        # and its requests are granted in priority/FIFO order
+        next_request, next_usage = None, None
+        for share, requests in self.waiting_requests.items():
+            usage = self.share_cpus.get(share, 0)
+            if next_request is None or (usage, requests[0]) < (next_usage, next_request):
+                next_request, next_usage = requests[0], usage
+        return next_request
+
+    def __remove_request(self, request):
+        # Remove request from the waiting requests of its share. Must be called while holding the platform lock
+        requests = self.waiting_requests[request.share]
+        requests.remove(request)
+        if len(requests) == 0:
+            self.waiting_requests.pop(request.share)
+
+    def __release_share(self, request):
+        # Return vCPUs of a granted request to its share. Must be called while holding the platform lock
+        self.share_cpus[request.share] -= request.nr_cpus
+
+    def __end_lease(self, proc_name):
+        # Task holding a processor has released it. Must be called while holding the platform lock
+        request = self.leases.pop(proc_name, None)
+        if request is not None:
+            self.__release_share(request)
+
+    def __add_to_pool(self, processor):
+        # Add idle processor to the pool and destroy it if it's still idle after the pool's time-to-live
+        # Must be called while holding the platform lock
+        proc_name = processor.get_name()
+        release_time = self.processor_pool.add(processor, self.processor_shapes[proc_name])
+        self.start_timer(self.processor_pool.idle_ttl, self.__expire_idle_processor, [proc_name, release_time])
+
+    def __expire_idle_processor(self, proc_name, release_time):
+        # Destroy processor if it's been idle since the given release time
+        with self.platform_lock:
+            if self.__locked:
+                return
+            processor = self.processor_pool.remove(proc_name, release_time)
+            if processor is not None:
+                logging.debug("(%s) Idle processor expired!" % proc_name)
+                self.__destroy_idle_processor(processor)
+                self.__grant_requests()
+
+    def __evict_idle_processors(self, nr_cpus, mem, disk_space):
+        # Destroy the longest idle processors until a request fits. Must be called while holding the platform lock
+        # Only evict if destroying all idle processors would free enough resources
+        idle_cpu, idle_mem, idle_disk_space = 0, 0, 0
+        for processor in self.processor_pool.get_idle_processors():
+            proc_cpu, proc_mem, proc_disk_space = self.allocations[processor.get_name()]
+            idle_cpu += proc_cpu
+            idle_mem += proc_mem
+            idle_disk_space += proc_disk_space
+        if not self.__has_capacity(nr_cpus - idle_cpu, mem - idle_mem, disk_space - idle_disk_space):
+            return
+
+        while not self.__has_capacity(nr_cpus, mem, disk_space):
+            self.__destroy_idle_processor(self.processor_pool.pop_oldest())
+
+    def __destroy_idle_processor(self, processor):
+        # Free resources of an idle processor and destroy it in the background
+        # Must be called while holding the platform lock
+        proc_name = processor.get_name()
+        logging.info("(%s) Destroying idle processor..." % proc_name)
+        nr_cpus, mem, disk_space = self.allocations.pop(proc_name, (0, 0, 0))
+        self.cpu -= nr_cpus
+        self.mem -= mem
+        self.disk_space -= disk_space
+        self.dealloc_procs.append(proc_name)
+        self.start_thread(processor.destroy, [True])
+
+    def __allocate(self, proc_name, processor, reservation=None):
+        # Record resources used by a processor. Must be called while holding the platform lock
+        # Processor claims resources reserved for its task and any extra resources it was given beyond the reservation
+        nr_cpus     = processor.get_nr_cpus()
+        mem         = processor.get_mem()
+        disk_space  = processor.get_disk_space()
+        if reservation is not None:
+            self.cpu -= reservation.nr_cpus
+            self.mem -= reservation.mem
+            self.disk_space -= reservation.disk_space
+            nr_cpus     = max(nr_cpus, reservation.nr_cpus)
+            mem         = max(mem, reservation.mem)
+            disk_space  = max(disk_space, reservation.disk_space)
+        self.cpu += nr_cpus
+        self.mem += mem
+        self.disk_space += disk_space
+        self.allocations[proc_name] = (nr_cpus, mem, disk_space)
+
     def __get_curr_usage_string(self):
         ret = "*********************\n"
         ret = "Platform Usage\n"
@@ -232,7 +649,13 @@ class Platform(object, metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def publish_report(self, report):
+    def publish_report(self, report, name=None, output_dir=None):
+        # Save report of a pipeline run under the name and in the output dir of the pipeline
+        # Pipelines sharing the platform have their own name and output dir (default: platform's name and output dir)
+        pass
+
+    @abc.abstractmethod
+    def publish_run_state(self, run_state, name=None, output_dir=None):
         pass
 
     @abc.abstractmethod
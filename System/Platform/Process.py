@@ -1,15 +1,19 @@
+import asyncio
 import subprocess as sp
+import sys
 
-class Process(sp.Popen):
+class ProcessInfo(object):
+    # Command run by a processor and the state of its execution
+    # Shared by commands run as regular subprocesses and commands run as subprocesses of an event loop
 
-    def __init__(self, args, **kwargs):
+    def set_info(self, kwargs):
+        # Pop arguments describing how the command is run by the processor
         self.command        = kwargs.pop("cmd",     True)
         self.num_retries    = kwargs.pop("num_retries", 0)
         self.docker_image   = kwargs.pop("docker_image", None)
         # Quiet failure means logger will not register command failure as error
         self.quiet          = kwargs.pop("quiet_failure", False)
         self.log_success    = kwargs.pop("log_success", True)
-        super(Process, self).__init__(args,     **kwargs)
         self.complete       = False
         self.stopped        = False
         self.out            = ""
@@ -62,3 +66,71 @@ class Process(sp.Popen):
 
     def needs_rerun(self):
         return self.to_rerun
+
+
+class Process(ProcessInfo, sp.Popen):
+
+    def __init__(self, args, **kwargs):
+        self.set_info(kwargs)
+        super(Process, self).__init__(args,     **kwargs)
+
+    async def communicate_async(self):
+        # Popen can't be awaited so it's waited for from an executor thread of the running event loop
+        return await asyncio.get_event_loop().run_in_executor(None, self.communicate)
+
+
+class AsyncProcess(ProcessInfo):
+    # Command run as a subprocess of an event loop so coroutines can wait for it without holding a thread
+    # Subprocess is started by the event loop right after the process is created
+
+    def __init__(self, args, loop, **kwargs):
+        self.set_info(kwargs)
+
+        # Output is always captured so Popen arguments are ignored
+        for popen_arg in ["shell", "stdout", "stderr", "close_fds"]:
+            kwargs.pop(popen_arg, None)
+
+        # Event loop running the subprocess and return code once it has finished
+        self.loop       = loop
+        self.returncode = None
+        self.proc       = loop.create_task(asyncio.create_subprocess_shell(args,
+                                                                           stdout=asyncio.subprocess.PIPE,
+                                                                           stderr=asyncio.subprocess.PIPE,
+                                                                           close_fds=True,
+                                                                           **kwargs))
+
+    @staticmethod
+    def get_running_loop():
+        # Return event loop running in the current thread (None if there's none)
+        # Before Python 3.8, subprocesses can only be awaited on the main thread's event loop so commands are run as
+        # regular subprocesses and awaited from executor threads
+        if sys.version_info < (3, 8):
+            return None
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    async def communicate_async(self):
+        # Wait for subprocess to finish and return its stdout and stderr
+        proc = await self.proc
+        out, err = await proc.communicate()
+        self.returncode = proc.returncode
+        return out, err
+
+    def communicate(self):
+        # Block until subprocess has finished. Coroutines running on the event loop have to use communicate_async()
+        if AsyncProcess.get_running_loop() is self.loop:
+            raise RuntimeError("Cannot block the event loop running the process!")
+        return asyncio.run_coroutine_threadsafe(self.communicate_async(), self.loop).result()
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.loop.call_soon_threadsafe(self.__terminate)
+
+    def __terminate(self):
+        if self.proc.done() and not self.proc.cancelled() and self.proc.exception() is None:
+            if self.proc.result().returncode is None:
+                self.proc.result().terminate()
@@ -1,12 +1,13 @@
 import os
 import logging
 import abc
+import asyncio
 from collections import OrderedDict
 import subprocess as sp
 import time
 import threading
 
-from System.Platform import Process
+from System.Platform import Process, AsyncProcess
 
 class Processor(object, metaclass=abc.ABCMeta):
     OFF         = 0  # Destroyed or not allocated on the cloud
@@ -51,12 +52,32 @@ class Processor(object, metaclass=abc.ABCMeta):
         self.stopped = False
         self.checkpoints = []
 
+        # Time (sec) it took to create the processor and make it ready to run commands
+        self.boot_time = 0
+
+        # Time the processor was created, from which point on it's waiting to become ready (None = not recorded)
+        self.create_time = None
+
+        # Flag for whether processor has been reused from a previous task
+        self.recycled = False
+
+        # Output files of the previous task kept on the processor: remote path -> (local path, size)
+        self.local_files = {}
+
+        # Working directory of the previous task whose output is kept on the processor
+        self.retained_dir = None
+
     def create(self):
         self.set_status(Processor.AVAILABLE)
 
     def destroy(self, wait=True):
         self.set_status(Processor.OFF)
 
+    async def create_async(self):
+        # Coroutine version of create(). Processors that can't be created without blocking are created from an
+        # executor thread of the running event loop
+        await asyncio.get_event_loop().run_in_executor(None, self.create)
+
     def run(self, job_name, cmd, num_retries=None, docker_image=None, quiet_failure=False):
 
         # Throw error if attempting to run command on stopped processor
@@ -117,13 +138,31 @@ class Processor(object, metaclass=abc.ABCMeta):
         kwargs["close_fds"] = True
 
         # Add process to list of processes
-        self.processes[job_name] = Process(cmd, **kwargs)
+        self.processes[job_name] = self.start_process(cmd, **kwargs)
+
+    def start_process(self, cmd, **kwargs):
+        # Start a command in a subprocess
+        # Commands started by coroutines run as subprocesses of their event loop so they can be awaited without a thread
+        loop = AsyncProcess.get_running_loop()
+        if loop is not None:
+            return AsyncProcess(cmd, loop, **kwargs)
+        return Process(cmd, **kwargs)
+
+    async def wait_process_async(self, proc_name):
+        # Coroutine version of wait_process(). Processors that can't wait for processes without blocking wait for
+        # them from an executor thread of the running event loop
+        return await asyncio.get_event_loop().run_in_executor(None, self.wait_process, proc_name)
 
     def wait(self):
         # Returns when all currently running processes have completed
         for proc_name, proc_obj in self.processes.items():
             self.wait_process(proc_name)
 
+    async def wait_async(self):
+        # Coroutine version of wait()
+        for proc_name in list(self.processes):
+            await self.wait_process_async(proc_name)
+
     def lock(self):
         # Prevent any additional processes from being run
         with threading.Lock():
@@ -144,6 +183,69 @@ class Processor(object, metaclass=abc.ABCMeta):
         #        logging.debug("Killing process: %s" % proc_name)
         #        proc_obj.stop()
 
+    def recycle(self):
+        # Prepare processor to be reused by another task
+        removed_dir = self.__start_recycle()
+        self.wait_process("recycle")
+        self.__finish_recycle(removed_dir)
+
+    async def recycle_async(self):
+        # Coroutine version of recycle()
+        removed_dir = self.__start_recycle()
+        await self.wait_process_async("recycle")
+        self.__finish_recycle(removed_dir)
+
+    def __start_recycle(self):
+        # Start removing the previous task's files from the processor and return the removed output directory (if any)
+        # Output of the previous task is kept so that its children can read it without downloading it again
+        # Only one generation of output is kept so output from the task before is removed
+        cmds = []
+        removed_dir = None
+        if self.retained_dir is not None and self.retained_dir != self.wrk_dir:
+            removed_dir = self.retained_dir
+            cmds.append("sudo rm -rf %s" % removed_dir)
+
+        # Remove everything in the previous task's working directory except its output
+        wrk_out_dir_name = os.path.basename(self.wrk_out_dir.rstrip("/"))
+        cmds.append("sudo find %s -mindepth 1 -maxdepth 1 ! -name %s -exec rm -rf {} +" % (self.wrk_dir, wrk_out_dir_name))
+        self.run("recycle", " ; ".join(cmds))
+        return removed_dir
+
+    def __finish_recycle(self, removed_dir):
+        # Forget output files that have just been removed: output of older generations and anything left in the previous
+        # task's working directory outside its output directory. Output moved to local storage is kept
+        self.local_files = {remote_path: local_file for remote_path, local_file in self.local_files.items()
+                            if not self.__is_removed_by_recycle(local_file[0], removed_dir)}
+        self.retained_dir = self.wrk_dir
+
+        # Forget processes of the previous task
+        self.processes = OrderedDict()
+        self.checkpoints = []
+        self.recycled = True
+
+    def __is_removed_by_recycle(self, local_path, removed_dir):
+        # Determine whether recycling the processor removes a local file
+        if removed_dir is not None and local_path.startswith(removed_dir):
+            return True
+        return local_path.startswith(self.wrk_dir) and not local_path.startswith(self.wrk_out_dir)
+
+    def add_local_file(self, remote_path, local_path, size=None):
+        # Register that a file transferred to remote storage also exists on the processor
+        self.local_files[remote_path] = (local_path, size)
+
+    def get_local_file(self, remote_path):
+        # Return local path of a remote file kept on the processor (None if not on the processor)
+        if remote_path in self.local_files:
+            return self.local_files[remote_path][0]
+        return None
+
+    def get_local_files(self):
+        return self.local_files
+
+    def get_retained_size(self):
+        # Total size (GB) of output files kept on the processor
+        return sum([size or 0 for local_path, size in self.local_files.values()])
+
     ############ Getters and Setters
     def set_status(self, new_status):
         # Updates instance status with threading.lock() to prevent race conditions
@@ -179,10 +281,14 @@ class Processor(object, metaclass=abc.ABCMeta):
             self.wrk_out_dir = new_wrk_out_dir
 
     def set_start_time(self):
-        self.start_time = time.time()
+        self.start_time = self.get_time()
 
     def set_stop_time(self):
-        self.stop_time = time.time()
+        self.stop_time = self.get_time()
+
+    def get_time(self):
+        # Current time (sec) as seen by the processor
+        return time.time()
 
     def is_locked(self):
         with self.status_lock:
@@ -206,7 +312,7 @@ class Processor(object, metaclass=abc.ABCMeta):
 
             # Instance is still running so register runtime since last start/restart
             elif self.stop_time is None or self.stop_time < self.start_time:
-                runtime = time.time() - self.start_time
+                runtime = self.get_time() - self.start_time
 
             # Instance has been stopped
             else:
@@ -224,6 +330,15 @@ class Processor(object, metaclass=abc.ABCMeta):
     def get_start_time(self):
         return self.start_time
 
+    def get_boot_time(self):
+        return self.boot_time
+
+    def get_create_time(self):
+        return self.create_time
+
+    def is_recycled(self):
+        return self.recycled
+
     def get_nr_cpus(self):
         return self.nr_cpus
 
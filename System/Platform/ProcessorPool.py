@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+
+class ProcessorPool(object):
+    # Holds processors released by finished tasks so they can be reused by tasks with the same shape
+    # Not thread-safe on its own. Platform only accesses the pool while holding its platform lock.
+
+    # Seconds a processor is kept idle by default. Long enough for a finished task's children to be placed on its
+    # processor and to save booting a new one, short enough that idle processors cost little
+    DEFAULT_IDLE_TTL = 120
+
+    def __init__(self, idle_ttl=DEFAULT_IDLE_TTL):
+
+        # Number of seconds a processor can stay idle before being destroyed (0 = never reuse processors)
+        self.idle_ttl = idle_ttl
+
+        # Idle processors in order of release: proc_name -> (processor, (nr_cpus, mem, disk_space), release_time)
+        self.idle_processors = OrderedDict()
+
+        # Pool usage statistics
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+        self.boot_time_saved = 0
+
+    def is_enabled(self):
+        return self.idle_ttl > 0
+
+    def add(self, processor, shape):
+        # Add idle processor to pool and return the time it was released
+        release_time = time.time()
+        self.idle_processors[processor.get_name()] = (processor, shape, release_time)
+        return release_time
+
+    def claim(self, nr_cpus, mem, disk_space, input_paths=None):
+        # Remove and return the best idle processor for a task with the given shape and input files
+        # Returns a tuple of (processor, is_local) where is_local is True if processor already holds task inputs
+        input_paths = set() if input_paths is None else set(input_paths)
+        local_name,  local_size     = None, 0
+        shape_name,  shape_disk     = None, None
+        for proc_name, (processor, shape, release_time) in self.idle_processors.items():
+
+            # Prefer processor holding the most input data as long as it's large enough to run the task
+            local_files = processor.get_local_files()
+            input_size = sum([local_files[path][1] or 0 for path in input_paths if path in local_files])
+            is_local = len(input_paths.intersection(local_files)) > 0
+            if is_local and shape[0] >= nr_cpus and shape[1] >= mem and shape[2] >= disk_space:
+                if local_name is None or input_size > local_size:
+                    local_name, local_size = proc_name, input_size
+                continue
+
+            # Otherwise use processor with the same shape and the smallest disk that also fits any retained output
+            if shape[0] != nr_cpus or shape[1] != mem or shape[2] < disk_space + processor.get_retained_size():
+                continue
+            if shape_disk is None or shape[2] < shape_disk:
+                shape_name, shape_disk = proc_name, shape[2]
+
+        if local_name is not None:
+            return self.idle_processors.pop(local_name)[0], True
+        if shape_name is not None:
+            return self.idle_processors.pop(shape_name)[0], False
+        return None, False
+
+    def remove(self, proc_name, release_time=None):
+        # Remove and return an idle processor. If release time is given, only remove it if it's still from that release
+        if proc_name not in self.idle_processors:
+            return None
+        if release_time is not None and self.idle_processors[proc_name][2] != release_time:
+            return None
+        return self.idle_processors.pop(proc_name)[0]
+
+    def pop_oldest(self):
+        # Remove and return the processor that has been idle the longest
+        if len(self.idle_processors) == 0:
+            return None
+        return self.idle_processors.popitem(last=False)[1][0]
+
+    def get_idle_processors(self):
+        return [processor for processor, shape, release_time in self.idle_processors.values()]
+
+    def record_hit(self, processor, is_local=False):
+        self.hits += 1
+        if is_local:
+            self.local_hits += 1
+        self.boot_time_saved += processor.get_boot_time()
+
+    def record_miss(self):
+        self.misses += 1
+
+    def get_stats(self):
+        nr_requests = self.hits + self.misses
+        stats = OrderedDict()
+        stats["idle_ttl(sec)"]          = self.idle_ttl
+        stats["hits"]                   = self.hits
+        stats["local_hits"]             = self.local_hits
+        stats["misses"]                 = self.misses
+        stats["hit_rate"]               = 0 if nr_requests == 0 else self.hits / float(nr_requests)
+        stats["boot_time_saved(sec)"]   = self.boot_time_saved
+        return stats
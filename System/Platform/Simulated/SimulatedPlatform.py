@@ -0,0 +1,261 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from System.Platform import Platform
+from System.Platform.Simulated import SimulationClock, SimulatedEvent, SimulatedQueue, SimulatedTimer, SimulatedEventLoop, SimulatedProcessor
+
+class SimulatedPlatform(Platform):
+    # Platform that runs the pipeline against simulated processors on a virtual clock instead of the cloud
+    # Used to predict the makespan and cost of a run offline and to benchmark scheduling changes
+    # Durations are modelled from the platform config and can be replayed from the reports of previous runs
+
+    CONFIG_SPEC = "System/Platform/Simulated/SimulatedPlatform.validate"
+
+    def __init__(self, name, platform_config_file, final_output_dir):
+        # Call super constructor from Platform
+        super(SimulatedPlatform, self).__init__(name, platform_config_file, final_output_dir)
+
+        # Virtual clock shared by all simulated processors and the threads running tasks on them
+        self.clock = SimulationClock()
+
+        # Parameters of the simulation model
+        self.model = self.config["simulation"]
+
+        # Directory where simulated reports are written
+        self.report_dir = self.config["report_dir"]
+
+        # Runtimes (sec) of tasks replayed from previous reports: task name -> runtime
+        self.replayed_runtimes = OrderedDict()
+        for report_file in self.model["replay_reports"]:
+            self.__load_report(report_file)
+
+        # Sizes (GB) of files created or transferred by simulated processors: path -> size
+        self.files_lock = threading.Lock()
+        self.files = {}
+
+        # Task processors currently booted and the peak number of processors and vCPUs booted at once
+        self.usage_lock = threading.Lock()
+        self.booted = {}
+        self.peak_processors = 0
+        self.peak_nr_cpus = 0
+        self.nr_processors = 0
+
+    def validate(self):
+        # Make sure simulated reports can be written
+        if not os.path.isdir(self.report_dir):
+            logging.error("Simulated report directory '%s' does not exist!" % self.report_dir)
+            raise IOError("Invalid simulated report directory!")
+
+    def init_helper_processor(self, name, nr_cpus, mem, disk_space):
+        # Helper processor isn't part of the simulated run so its commands finish instantly
+        return SimulatedProcessor(name, nr_cpus, mem, disk_space,
+                                  platform=self,
+                                  instant=True)
+
+    def init_task_processor(self, name, nr_cpus, mem, disk_space):
+        return SimulatedProcessor(name, nr_cpus, mem, disk_space,
+                                  platform=self)
+
+    def make_queue(self):
+        return SimulatedQueue(self.clock)
+
+    def make_event(self):
+        return SimulatedEvent(self.clock)
+
+    def make_event_loop(self):
+        return SimulatedEventLoop(self.clock, name=self.name)
+
+    def start_thread(self, function, args):
+        # Call function with args in a thread taking part in the simulation
+        SimulatedTimer(self.clock, 0, function, args).start()
+
+    def start_timer(self, interval, function, args):
+        # Wait on the virtual clock in the background then call function
+        SimulatedTimer(self.clock, interval, function, args).start()
+
+    def get_time(self):
+        return self.clock.get_time()
+
+    def publish_report(self, report=None, name=None, output_dir=None):
+
+        # Exit as nothing to output
+        if report is None:
+            return
+
+        # Add simulated makespan, peak usage and cost of processors to the report
+        report = report.to_dict()
+        report["simulation"] = self.get_simulation_stats()
+        logging.info("Simulated run finished in %.0f sec using at most %d processors (%d vCPUs) for a cost of $%.2f."
+                     % (report["simulation"]["makespan"], report["simulation"]["peak_processors"],
+                        report["simulation"]["peak_nr_cpus"], report["simulation"]["processor_cost"]))
+
+        # Simulated reports are always written locally
+        name = self.name if name is None else name
+        report_file = os.path.join(self.report_dir, "%s_simulated_report.json" % name)
+        try:
+            with open(report_file, "w") as report_fh:
+                json.dump(report, report_fh, indent=4)
+        except BaseException as e:
+            logging.error("Could not write simulated report to '%s'!" % report_file)
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
+            raise
+
+    def publish_run_state(self, run_state=None, name=None, output_dir=None):
+        # Simulated runs can't be resumed
+        logging.debug("Run state of simulated run is not saved.")
+
+    def clean_up(self):
+        # Destroy any simulated processor that hasn't been destroyed
+        for proc_name, processor in self.processors.items():
+            if proc_name not in self.dealloc_procs and processor.get_status() != SimulatedProcessor.OFF:
+                processor.stop()
+                processor.destroy(wait=True)
+
+    def get_clock(self):
+        return self.clock
+
+    def get_simulation_stats(self):
+        # Return makespan, peak usage and total cost of all task processors including time spent idle in the pool
+        with self.usage_lock:
+            processors = [processor for proc_name, processor in self.processors.items() if proc_name != "helper"]
+            return OrderedDict([("makespan", self.clock.get_time()),
+                                ("nr_processors", self.nr_processors),
+                                ("peak_processors", self.peak_processors),
+                                ("peak_nr_cpus", self.peak_nr_cpus),
+                                ("processor_cost", sum([processor.compute_cost() for processor in processors]))])
+
+    def register_boot(self, processor):
+        # Record that a task processor started booting
+        with self.usage_lock:
+            self.booted[processor.get_name()] = processor.get_nr_cpus()
+            self.nr_processors += 1
+            self.peak_processors = max(self.peak_processors, len(self.booted))
+            self.peak_nr_cpus = max(self.peak_nr_cpus, sum(self.booted.values()))
+
+    def register_shutdown(self, processor):
+        # Record that a task processor has been destroyed
+        with self.usage_lock:
+            self.booted.pop(processor.get_name(), None)
+
+    def get_price(self, nr_cpus, mem, disk_space):
+        # Return per hour price of a processor
+        return nr_cpus * self.model["cpu_price"] + mem * self.model["mem_price"] + disk_space * self.model["disk_price"]
+
+    def get_boot_time(self):
+        return self.model["boot_time"]
+
+    def get_destroy_time(self):
+        return self.model["destroy_time"]
+
+    def get_cmd_time(self):
+        return self.model["cmd_time"]
+
+    def get_docker_image_size(self):
+        return self.model["docker_image_size"]
+
+    def get_transfer_time(self, size):
+        # Return seconds needed to transfer a number of GB to or from remote storage
+        return size * 1024 / self.model["transfer_rate"]
+
+    def get_output_size(self, input_size):
+        # Return size (GB) of an output file of a task given the size of the task's input
+        return input_size * self.model["output_size_ratio"]
+
+    def has_task_runtime(self, task_id):
+        # Determine whether the runtime of a task is set in the config or replayed from a report
+        parent_task = task_id.split(".")[0]
+        for runtimes in [self.model["task_runtimes"], self.replayed_runtimes]:
+            if task_id in runtimes or parent_task in runtimes:
+                return True
+        return False
+
+    def get_task_runtime(self, task_id):
+        # Return runtime (sec) of a task's command
+        # Runtimes set in the config take precedence over replayed runtimes. Splits, partial merges and backups
+        # use the runtime of the task they're created from
+        parent_task = task_id.split(".")[0]
+        for runtimes in [self.model["task_runtimes"], self.replayed_runtimes]:
+            if task_id in runtimes:
+                return runtimes[task_id]
+            if parent_task in runtimes:
+                return runtimes[parent_task]
+        return self.model["default_runtime"]
+
+    def get_file_size(self, path):
+        # Return size (GB) of a file or of all files under a directory or wildcard. Remote input is assumed to exist
+        # Return None for local files that haven't been created
+        path = path.rstrip("*")
+        with self.files_lock:
+            if path in self.files:
+                return self.files[path]
+            sizes = [size for file_path, size in self.files.items() if file_path.startswith(path)]
+        if len(sizes) > 0:
+            return sum(sizes)
+        return self.model["input_file_size"] if ":" in path else None
+
+    def add_file(self, path, size):
+        with self.files_lock:
+            self.files[path] = size
+
+    def copy_file(self, src_path, dest_path, size):
+        # Record file copied to a path or into a directory
+        with self.files_lock:
+            if not dest_path.endswith("/"):
+                self.files[dest_path] = size
+            if not src_path.endswith("*"):
+                self.files[os.path.join(dest_path, os.path.basename(src_path.rstrip("/")))] = size
+
+    def __load_report(self, report_file):
+        # Replay runtimes of tasks in the report of a previous run
+        # Parent tasks get the median runtime of their splits
+        try:
+            with open(report_file, "r") as report_fh:
+                report = json.load(report_fh)
+        except BaseException as e:
+            logging.error("Unable to load runtimes to replay from report '%s'!" % report_file)
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
+            raise
+
+        # Reports with task phases give the time spent running each command. Older reports only give the overall
+        # runtime of each task, which includes booting the processor and transferring files
+        parent_runtimes = OrderedDict()
+        for task in report.get("tasks", []):
+            task_id = task.get("name", None)
+            runtime = task.get("runtime(sec)", None)
+            if task_id is None or runtime is None or task_id == "Helper" or task.get("cache_hit", False) \
+                    or task.get("resumed", False):
+                continue
+
+            # Phases of fused tasks are recorded by the task they were fused with
+            if "phases" in task:
+                for phase_task, phase_runtime in self.__get_run_time(task).items():
+                    self.replayed_runtimes[phase_task] = phase_runtime
+                    parent_runtimes.setdefault(phase_task.split(".")[0], []).append(phase_runtime)
+                continue
+
+            # Runtime of fused tasks is accounted to the task they were fused with
+            self.replayed_runtimes[task_id] = float(runtime)
+            if "fused_with" not in task:
+                parent_runtimes.setdefault(task_id.split(".")[0], []).append(float(runtime))
+
+        for parent_task, runtimes in parent_runtimes.items():
+            if parent_task not in self.replayed_runtimes:
+                runtimes.sort()
+                self.replayed_runtimes[parent_task] = runtimes[len(runtimes)//2]
+
+        logging.debug("Loaded %d task runtimes to replay from report '%s'." % (len(self.replayed_runtimes), report_file))
+
+    @staticmethod
+    def __get_run_time(task):
+        # Return time spent running commands of a task and of the tasks fused with it: task name -> runtime
+        runtimes = OrderedDict()
+        for phase in task["phases"]:
+            if phase["name"] == "run" and phase["runtime(sec)"] is not None:
+                phase_task = phase.get("task", task["name"])
+                runtimes[phase_task] = runtimes.get(phase_task, 0) + float(phase["runtime(sec)"])
+        return runtimes
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import re
+import shlex
+import threading
+
+from System.Platform import Processor
+
+class SimulatedProcess(object):
+    # Command running on a simulated processor that finishes at a given virtual time
+    def __init__(self, cmd, end_time, out=""):
+        self.cmd        = cmd
+        self.end_time   = end_time
+        self.out        = out
+
+    def get_command(self):
+        return self.cmd
+
+
+class SimulatedProcessor(Processor):
+    # Processor that doesn't run commands but waits on the platform's simulation clock for as long as they would take
+    # Durations of commands are modelled by the platform:
+    #   - file transfers take as long as it takes to move the file at the platform's transfer rate
+    #   - module commands take the runtime the platform estimates for the task
+    #   - any other command (mkdir, chmod, rm, ...) takes a fixed amount of time
+
+    # Commands (after sudo) generated by storage and docker helpers
+    HELPER_CMDS = ["mv", "cp", "du", "ls", "gsutil", "docker", "mkdir", "chmod", "rm", "find", "cat", "tee", "touch", "echo"]
+
+    def __init__(self, name, nr_cpus, mem, disk_space, **kwargs):
+
+        # Simulated platform modelling the processor's commands
+        self.platform   = kwargs.pop("platform")
+
+        # Whether commands finish instantly (used for the helper processor as it doesn't take part in the simulation)
+        self.instant    = kwargs.pop("instant", False)
+
+        super(SimulatedProcessor, self).__init__(name, nr_cpus, mem, disk_space, **kwargs)
+
+        # Clock used to wait for commands to finish
+        self.clock      = self.platform.get_clock()
+
+        # Per hour price of processor
+        self.price      = self.platform.get_price(nr_cpus, mem, disk_space)
+
+        # Total size (GB) of files loaded onto the processor since it was created or recycled
+        self.input_size = 0
+
+        # Docker images already pulled onto the processor
+        self.docker_images = set()
+
+        # Futures of coroutines waiting on the processor and the event loops running them, set once processor is stopped
+        self.waiters_lock   = threading.Lock()
+        self.stop_waiters   = []
+
+    def create(self):
+        self.__start_create()
+        self.__wait(self.boot_time)
+        self.__finish_create()
+
+    async def create_async(self):
+        self.__start_create()
+        await self.__wait_async(self.boot_time)
+        self.__finish_create()
+
+    def __start_create(self):
+        if self.is_locked():
+            logging.error("(%s) Failed to create processor. Processor locked!" % self.name)
+            raise RuntimeError("Cannot create processor while locked!")
+
+        logging.info("(%s) Process 'create' started!" % self.name)
+        self.set_status(Processor.CREATING)
+
+        # Processors are created right away and the boot time is spent waiting for them to become ready
+        self.create_time = self.get_time()
+        if not self.instant:
+            self.platform.register_boot(self)
+            self.boot_time = self.platform.get_boot_time()
+
+    def __finish_create(self):
+        # Processor is billed from the time it becomes available, like an instance
+        self.set_start_time()
+        self.set_status(Processor.AVAILABLE)
+
+    def destroy(self, wait=True):
+        logging.info("(%s) Process 'destroy' started!" % self.name)
+        duration = 0 if self.instant else self.platform.get_destroy_time()
+        self.processes["destroy"] = SimulatedProcess("destroy", self.get_time() + duration)
+        if wait:
+            self.wait_process("destroy")
+
+    def run(self, job_name, cmd, num_retries=None, docker_image=None, quiet_failure=False):
+
+        # Throw error if attempting to run command on stopped processor
+        if self.is_locked():
+            logging.error("(%s) Attempt to run process'%s' on locked processor!" % (self.name, job_name))
+            raise RuntimeError("Attempt to run command on locked processor!")
+
+        logging.info("(%s) Process '%s' started!" % (self.name, job_name))
+        logging.debug("(%s) Process '%s' has the following command:\n    %s" % (self.name, job_name, cmd))
+
+        # Remove logging placeholders
+        cmd = re.sub(r"!LOG\d!", "", cmd).strip()
+
+        # Determine how long the command takes and what it prints
+        if self.__is_module_cmd(job_name, cmd, docker_image):
+            duration, out = self.platform.get_task_runtime(job_name), ""
+        else:
+            duration, out = self.__simulate_helper_cmd(cmd)
+
+        if self.instant:
+            duration = 0
+        self.processes[job_name] = SimulatedProcess(cmd, self.get_time() + duration, out)
+
+    def wait_process(self, proc_name):
+        proc_obj = self.processes[proc_name]
+
+        # Commands stop as soon as processor is stopped (e.g. task was cancelled)
+        self.__wait(proc_obj.end_time - self.get_time())
+        return self.__finish_process(proc_name, proc_obj)
+
+    async def wait_process_async(self, proc_name):
+        proc_obj = self.processes[proc_name]
+        await self.__wait_async(proc_obj.end_time - self.get_time())
+        return self.__finish_process(proc_name, proc_obj)
+
+    def __finish_process(self, proc_name, proc_obj):
+        if proc_name == "destroy":
+            self.set_stop_time()
+            self.set_status(Processor.OFF)
+            if not self.instant:
+                self.platform.register_shutdown(self)
+
+        elif self.is_locked():
+            logging.debug("(%s) Process '%s' stopped as processor is locked!" % (self.name, proc_name))
+            raise RuntimeError("(%s) Process '%s' stopped!" % (self.name, proc_name))
+
+        logging.info("(%s) Process '%s' complete!" % (self.name, proc_name))
+        return proc_obj.out, ""
+
+    def recycle(self):
+        super(SimulatedProcessor, self).recycle()
+        self.input_size = 0
+
+    async def recycle_async(self):
+        await super(SimulatedProcessor, self).recycle_async()
+        self.input_size = 0
+
+    def stop(self):
+        super(SimulatedProcessor, self).stop()
+
+        # Wake coroutines waiting for commands to finish
+        with self.waiters_lock:
+            for loop, stopped in self.stop_waiters:
+                loop.call_soon_threadsafe(SimulatedProcessor.__set_stopped, stopped)
+
+    def adapt_cmd(self, cmd):
+        return cmd
+
+    def get_time(self):
+        return self.clock.get_time()
+
+    def __wait(self, seconds):
+        # Wait on the clock unless processor gets locked
+        if seconds > 0:
+            self.clock.wait_for(lambda: self.locked, timeout=seconds)
+
+    async def __wait_async(self, seconds):
+        # Sleep on the event loop, whose time is the clock's, unless processor gets locked
+        if seconds <= 0:
+            return
+        loop = asyncio.get_event_loop()
+        stopped = loop.create_future()
+        with self.waiters_lock:
+            self.stop_waiters.append((loop, stopped))
+        try:
+            if not self.is_locked():
+                await asyncio.wait_for(stopped, timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.waiters_lock:
+                self.stop_waiters.remove((loop, stopped))
+
+    @staticmethod
+    def __set_stopped(stopped):
+        if not stopped.done():
+            stopped.set_result(None)
+
+    def __is_module_cmd(self, job_name, cmd, docker_image):
+        # Determine whether a command is the command of a module rather than one generated by a helper
+        if docker_image is not None or self.platform.has_task_runtime(job_name):
+            return True
+        return self.__get_cmd_args(cmd)[0] not in self.HELPER_CMDS
+
+    def __simulate_helper_cmd(self, cmd):
+        # Return duration and output of a command generated by a storage or docker helper
+        duration = self.platform.get_cmd_time()
+        args = self.__get_cmd_args(cmd)
+        if args[0] == "gsutil":
+            args = [arg for arg in args[1:] if not arg.startswith("-") and not arg.startswith("GSUtil:")]
+
+        if args[0] in ["mv", "cp"]:
+            # Transfer file and take the time to move it if it's coming from or going to remote storage
+            src_path, dest_path = [arg for arg in args[1:] if not arg.startswith("-")][:2]
+            size = self.__get_file_size(src_path)
+            self.platform.copy_file(src_path, dest_path, size)
+            if ":" in src_path or ":" in dest_path:
+                duration += self.platform.get_transfer_time(size)
+            if ":" not in dest_path:
+                self.input_size += size
+
+        elif args[0] == "du":
+            path = args[-1]
+            return duration, "%d\t%s\n" % (self.__get_file_size(path) * 1024 ** 3, path)
+
+        elif args[0] == "docker" and args[1] == "pull":
+            # Images are only pulled once per processor
+            if args[2] not in self.docker_images:
+                self.docker_images.add(args[2])
+                duration += self.platform.get_transfer_time(self.platform.get_docker_image_size())
+
+        elif args[0] == "docker" and args[1] == "image":
+            if "{{.Id}}" in cmd:
+                return duration, "sha256:%s\n" % args[3]
+            return duration, "%d\n" % (self.platform.get_docker_image_size() * 1024 ** 3)
+
+        elif args[0] == "find" or (args[0] == "ls" and "-L" in cmd):
+            # File identities never change as files are never modified
+            return duration, "%s\n" % args[1]
+
+        return duration, ""
+
+    def __get_file_size(self, path):
+        # Return size (GB) of a file. Unknown files in working output dir are output of the task run on the processor
+        size = self.platform.get_file_size(path)
+        if size is None and ":" not in path and path.startswith(self.wrk_out_dir):
+            size = self.platform.get_output_size(self.input_size)
+            self.platform.add_file(path, size)
+        return 0 if size is None else size
+
+    @staticmethod
+    def __get_cmd_args(cmd):
+        # Split first command of a command line into its arguments without sudo
+        cmd = re.split(r"\s*(?:;|\||&&)\s*", cmd)[0]
+        try:
+            args = shlex.split(cmd)
+        except ValueError:
+            args = cmd.split()
+        if len(args) > 0 and args[0] == "sudo":
+            args = args[1:]
+        return args if len(args) > 0 else [""]
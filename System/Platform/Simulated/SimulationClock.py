@@ -0,0 +1,248 @@
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import selectors
+import threading
+
+from System.Workers import Thread, EventLoop
+
+class SimulationClock(object):
+    # Virtual clock shared by all threads of a simulated pipeline run
+    # Threads wait on the clock instead of sleeping. Time only moves forward once every thread taking part in the run
+    # is waiting on the clock and none of them can continue, then it jumps straight to the earliest wake-up time.
+    # Threads taking part in the run are the main thread, task workers and any thread that has waited on the clock.
+
+    # Real seconds between checks of conditions changed by threads that don't notify the clock
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, start_time=0):
+
+        # Current virtual time (sec)
+        self.time = start_time
+
+        # Condition used to wake up threads waiting on the clock
+        self.condition = threading.Condition()
+
+        # Threads waiting on the clock: thread -> (condition to wait for, wake-up time)
+        self.waiting = {}
+
+        # Waiting threads that have been woken up but haven't resumed yet
+        self.woken = set()
+
+        # Threads that have waited on the clock at least once
+        self.participants = set()
+
+    def get_time(self):
+        with self.condition:
+            return self.time
+
+    def sleep(self, seconds):
+        # Block for a number of virtual seconds
+        self.wait_for(None, timeout=seconds)
+
+    def wait_for(self, predicate=None, timeout=None):
+        # Block until predicate returns True or until timeout (virtual sec) has passed
+        # Return the final value of the predicate (False if there's no predicate)
+        thread = threading.current_thread()
+        with self.condition:
+            if predicate is not None and predicate():
+                return True
+            if timeout is not None and timeout <= 0:
+                return False
+
+            wake_time = None if timeout is None else self.time + timeout
+            self.waiting[thread] = (predicate, wake_time)
+            self.participants.add(thread)
+            try:
+                while thread not in self.woken:
+                    self.__advance()
+                    if thread not in self.woken:
+                        self.condition.wait(self.POLL_INTERVAL)
+            finally:
+                self.waiting.pop(thread)
+                self.woken.discard(thread)
+            return predicate is not None and predicate()
+
+    def notify(self):
+        # Wake waiting threads so they check their conditions right away
+        with self.condition:
+            self.condition.notify_all()
+
+    def __advance(self):
+        # Wake threads that can continue. Move time forward only if no thread taking part in the run can continue
+        # Must be called while holding the clock's condition
+        while True:
+            for thread, (predicate, wake_time) in self.waiting.items():
+                if thread in self.woken:
+                    continue
+                if (wake_time is not None and wake_time <= self.time) or (predicate is not None and predicate()):
+                    self.woken.add(thread)
+
+            if len(self.woken) > 0:
+                self.condition.notify_all()
+                return
+
+            if self.__has_running_threads():
+                return
+
+            wake_times = [wake_time for predicate, wake_time in self.waiting.values() if wake_time is not None]
+            if len(wake_times) == 0:
+                logging.error("Simulation stalled at %.1f sec! Every thread is waiting on a condition no other thread can change."
+                              % self.time)
+                raise RuntimeError("Simulation stalled!")
+            self.time = min(wake_times)
+
+    def __has_running_threads(self):
+        # Determine whether any thread taking part in the run isn't waiting on the clock
+        for thread in threading.enumerate():
+            if thread in self.waiting and thread not in self.woken:
+                continue
+            if thread is threading.main_thread() or isinstance(thread, Thread) or thread in self.participants:
+                return True
+        return False
+
+
+class SimulatedEvent(object):
+    # Event whose waiters wait on a simulation clock
+    def __init__(self, clock):
+        self.clock  = clock
+        self.flag   = False
+
+    def set(self):
+        self.flag = True
+        self.clock.notify()
+
+    def clear(self):
+        self.flag = False
+
+    def is_set(self):
+        return self.flag
+
+    def wait(self, timeout=None):
+        return self.clock.wait_for(self.is_set, timeout=timeout)
+
+
+class SimulatedQueue(queue.Queue):
+    # Queue whose consumers wait on a simulation clock
+
+    def __init__(self, clock, maxsize=0):
+        super(SimulatedQueue, self).__init__(maxsize)
+        self.clock = clock
+
+    def put(self, item, block=True, timeout=None):
+        super(SimulatedQueue, self).put(item, block, timeout)
+        self.clock.notify()
+
+    def get(self, block=True, timeout=None):
+        # Raise queue.Empty if nothing was put in the queue before the timeout (virtual sec)
+        if block:
+            self.clock.wait_for(lambda: self.qsize() > 0, timeout=timeout)
+        return super(SimulatedQueue, self).get(block=False)
+
+
+class SimulatedTimer(Thread):
+    # Thread calling a function after a number of virtual seconds
+    # Takes part in the simulation from the moment it's started so the clock can't move past its wake-up time before
+    # the thread has started waiting
+    def __init__(self, clock, interval, function, args):
+        super(SimulatedTimer, self).__init__("Simulated timer has stopped working")
+        self.clock      = clock
+        self.interval   = interval
+        self.function   = function
+        self.args       = args
+
+    def work(self):
+        self.clock.sleep(self.interval)
+        self.function(*self.args)
+
+
+class SimulatedEventLoop(EventLoop):
+    # Event loop whose time is the time of a simulation clock
+    # The loop's thread waits on the clock while it has nothing to do, so coroutines sleeping on the loop and threads
+    # waiting on the clock move time forward together. Blocking calls are run in threads taking part in the simulation
+
+    def __init__(self, clock, name="event_loop"):
+        super(SimulatedEventLoop, self).__init__(name)
+        self.clock = clock
+
+    def make_loop(self):
+        loop = SimulatedLoop(self.clock)
+        loop.set_default_executor(self.executor)
+        return loop
+
+    def make_executor(self):
+        return SimulatedExecutor()
+
+
+class SimulatedLoop(asyncio.SelectorEventLoop):
+    # Asyncio event loop timed by a simulation clock
+    def __init__(self, clock):
+        self.clock = clock
+        super(SimulatedLoop, self).__init__(SimulatedSelector(clock))
+
+    def time(self):
+        return self.clock.get_time()
+
+
+class SimulatedSelector(selectors.BaseSelector):
+    # Selector waiting on a simulation clock until one of its file objects is ready or until the timeout (virtual sec)
+    # The only file object of a simulated event loop is its self-pipe, which is written to whenever another thread
+    # hands work to the loop
+
+    def __init__(self, clock):
+        self.clock      = clock
+        self.selector   = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self.selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self.selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self.selector.modify(fileobj, events, data)
+
+    def select(self, timeout=None):
+        events = self.selector.select(0)
+        if len(events) == 0 and (timeout is None or timeout > 0):
+            self.clock.wait_for(self.__has_events, timeout=timeout)
+            events = self.selector.select(0)
+        return events
+
+    def close(self):
+        self.selector.close()
+
+    def get_map(self):
+        return self.selector.get_map()
+
+    def __has_events(self):
+        return len(self.selector.select(0)) > 0
+
+
+class SimulatedExecutor(concurrent.futures.ThreadPoolExecutor):
+    # Executor running each blocking call in a new thread taking part in the simulation
+    # Threads of a regular thread pool would keep the clock from moving forward while they wait for work
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        SimulatedCall(future, fn, args, kwargs).start()
+        return future
+
+
+class SimulatedCall(Thread):
+    # Thread running a blocking call for a simulated event loop
+    def __init__(self, future, fn, args, kwargs):
+        super(SimulatedCall, self).__init__("Blocking call of simulated event loop has stopped working")
+        self.future = future
+        self.fn     = fn
+        self.args   = args
+        self.kwargs = kwargs
+
+    def work(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            self.future.set_result(self.fn(*self.args, **self.kwargs))
+        except BaseException as e:
+            self.future.set_exception(e)
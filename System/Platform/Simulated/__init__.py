@@ -0,0 +1,3 @@
+from .SimulationClock import SimulationClock, SimulatedEvent, SimulatedQueue, SimulatedTimer, SimulatedEventLoop
+from .SimulatedProcessor import SimulatedProcessor
+from .SimulatedPlatform import SimulatedPlatform
@@ -1,3 +1,4 @@
+import base64
 import logging
 
 from System.Platform import Platform
@@ -28,6 +29,25 @@ class StorageHelper(object):
             self.proc.wait_process(job_name)
         return job_name
 
+    def link(self, src_path, dest_path, job_name=None, log=True, wait=False, **kwargs):
+        # Hard link file or dir from src_path to dest_path on the same filesystem without copying data
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(src_path, dest_path)
+        if not hasattr(cmd_generator, "link"):
+            logging.error("StorageHelper cannot link files with protocol '%s'!" % cmd_generator.PROTOCOL)
+            raise InvalidStorageTypeError("Cannot link files on remote storage!")
+        cmd = cmd_generator.link(src_path, dest_path)
+
+        job_name = "link_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Optionally add logging
+        cmd = "%s !LOG3!" % cmd if log else cmd
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        if wait:
+            self.proc.wait_process(job_name)
+        return job_name
+
     def mkdir(self, dir_path, job_name=None, log=False, wait=False, **kwargs):
         # Makes a directory if it doesn't already exists
         cmd_generator = StorageHelper.__get_storage_cmd_generator(dir_path)
@@ -67,28 +87,91 @@ class StorageHelper(object):
 
     def get_file_size(self, path, job_name=None, **kwargs):
         # Return file size in gigabytes
+        job_name = self.__start_get_file_size(path, job_name, **kwargs)
+
+        # Wait for cmd to finish and get output
+        try:
+            # Try to return file size in gigabytes
+            out, err = self.proc.wait_process(job_name)
+            return StorageHelper.__parse_file_size(out)
+
+        except BaseException as e:
+            logging.error("Unable to get file size: %s" % path)
+            if str(e) != "":
+                logging.error("Received the following msg:\n%s" % e)
+            raise
+
+    async def get_file_size_async(self, path, job_name=None, **kwargs):
+        # Coroutine version of get_file_size()
+        job_name = self.__start_get_file_size(path, job_name, **kwargs)
+        try:
+            out, err = await self.proc.wait_process_async(job_name)
+            return StorageHelper.__parse_file_size(out)
+
+        except BaseException as e:
+            logging.error("Unable to get file size: %s" % path)
+            if str(e) != "":
+                logging.error("Received the following msg:\n%s" % e)
+            raise
+
+    def get_file_identity(self, path, job_name=None, **kwargs):
+        # Return string that changes whenever the content of a file or directory changes
         cmd_generator = StorageHelper.__get_storage_cmd_generator(path)
-        cmd = cmd_generator.get_file_size(path)
+        cmd = cmd_generator.get_file_identity(path)
 
         # Run command and return job name
-        job_name = "get_size_%s" % Platform.generate_unique_id() if job_name is None else job_name
+        job_name = "get_identity_%s" % Platform.generate_unique_id() if job_name is None else job_name
         self.proc.run(job_name, cmd, **kwargs)
 
         # Wait for cmd to finish and get output
         try:
-            # Try to return file size in gigabytes
             out, err = self.proc.wait_process(job_name)
-            # Iterate over all files if multiple files (can happen if wildcard)
-            bytes = [int(x.split()[0]) for x in out.split("\n") if x != ""]
-            # Add them up and divide by billion bytes
-            return sum(bytes)/(1024**3.0)
+            return out.strip()
 
         except BaseException as e:
-            logging.error("Unable to get file size: %s" % path)
+            logging.error("Unable to get file identity: %s" % path)
+            if str(e) != "":
+                logging.error("Received the following msg:\n%s" % e)
+            raise
+
+    def read(self, path, job_name=None, **kwargs):
+        # Return contents of a text file
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(path)
+        cmd = cmd_generator.cat(path)
+
+        # Run command and return job name
+        job_name = "read_%s" % Platform.generate_unique_id() if job_name is None else job_name
+        self.proc.run(job_name, cmd, **kwargs)
+
+        # Wait for cmd to finish and get output
+        try:
+            out, err = self.proc.wait_process(job_name)
+            return out
+
+        except BaseException as e:
+            logging.error("Unable to read file: %s" % path)
             if str(e) != "":
                 logging.error("Received the following msg:\n%s" % e)
             raise
 
+    def write(self, path, contents, job_name=None, log=True, wait=False, **kwargs):
+        # Write text contents to a file
+        # Contents are base64 encoded so they can be safely passed on the command line
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(path)
+        encoded = base64.b64encode(contents.encode("utf8")).decode("utf8")
+        cmd = "echo %s | base64 -d | %s" % (encoded, cmd_generator.write_stdin(path))
+
+        job_name = "write_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Optionally add logging
+        cmd = "%s !LOG3!" % cmd if log else cmd
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        if wait:
+            self.proc.wait_process(job_name)
+        return job_name
+
     def rm(self, path, job_name=None, log=True, wait=False, **kwargs):
         # Delete file from file system
         # Log the transfer unless otherwise specified
@@ -106,6 +189,23 @@ class StorageHelper(object):
             self.proc.wait_process(job_name)
         return job_name
 
+    def __start_get_file_size(self, path, job_name=None, **kwargs):
+        # Start command printing the size of a file and return its job name
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(path)
+        cmd = cmd_generator.get_file_size(path)
+
+        # Run command and return job name
+        job_name = "get_size_%s" % Platform.generate_unique_id() if job_name is None else job_name
+        self.proc.run(job_name, cmd, **kwargs)
+        return job_name
+
+    @staticmethod
+    def __parse_file_size(out):
+        # Iterate over all files if multiple files (can happen if wildcard)
+        bytes = [int(x.split()[0]) for x in out.split("\n") if x != ""]
+        # Add them up and divide by billion bytes
+        return sum(bytes)/(1024**3.0)
+
     @staticmethod
     def __get_storage_cmd_generator(src_path, dest_path=None):
         # Determine the class of file handler to use base on input file protocol types
@@ -162,6 +262,11 @@ class LocalStorageCmdGenerator(StorageCmdGenerator):
         # Move a file from one directory to another
         return "sudo mv %s %s" % (src_path, dest_dir)
 
+    @staticmethod
+    def link(src_path, dest_dir):
+        # Recursively hard link a file or directory into another directory
+        return "sudo cp -al %s %s" % (src_path, dest_dir)
+
     @staticmethod
     def mkdir(dir_path):
         # Makes a directory if it doesn't already exists
@@ -176,6 +281,20 @@ class LocalStorageCmdGenerator(StorageCmdGenerator):
     def ls(path):
         return "sudo ls %s" % path
 
+    @staticmethod
+    def get_file_identity(path):
+        # Return cmd for listing size and modification time of every file under a path
+        return "sudo find %s -type f -printf '%%p %%s %%T@\\n' | sort" % path
+
+    @staticmethod
+    def cat(path):
+        return "sudo cat %s" % path
+
+    @staticmethod
+    def write_stdin(path):
+        # Return cmd for writing stdin to a file
+        return "sudo tee %s > /dev/null" % path
+
     @staticmethod
     def rm(path):
         # Dear god do not give sudo privileges to this command
@@ -206,6 +325,20 @@ class GoogleStorageCmdGenerator(StorageCmdGenerator):
     def ls(path):
         return "gsutil ls %s" % path
 
+    @staticmethod
+    def get_file_identity(path):
+        # Return cmd for listing generation and checksum of every object under a path
+        return "gsutil ls -L -r %s | grep -E '^gs://|Generation:|Hash \\(crc32c\\):'" % path
+
+    @staticmethod
+    def cat(path):
+        return "gsutil cat %s" % path
+
+    @staticmethod
+    def write_stdin(path):
+        # Return cmd for writing stdin to an object
+        return "gsutil cp - %s" % path
+
     @staticmethod
     def rm(path):
         return "gsutil rm -r %s" % path
@@ -1,5 +1,6 @@
-from .Process import Process
+from .Process import Process, AsyncProcess
 from .Processor import Processor
+from .ProcessorPool import ProcessorPool
 from .Platform import Platform
 from .StorageHelper import StorageHelper
 from .DockerHelper import DockerHelper
@@ -155,7 +155,7 @@ class GraphValidator(Validator):
             # Define the list of resources from where the input can come
             input_sources = {
                 "parent_input":     parent_output_types,
-                "sample_input":     self.samples.get_data(),
+                "sample_input":     self.samples.get_data_types(),
                 "docker_input":     {} if docker_image is None else docker_image.get_resources(),
                 "resource_input":   self.resources.get_resources(),
                 "config_input" :    config_input
@@ -10,11 +10,15 @@ class InputValidator(Validator):
     def __init__(self, resource_kit, sample_data, storage_helper, docker_helper, num_threads=25):
         super(InputValidator, self).__init__()
         # Check whether all input files declared in resource kit and sample data exist
+        # Sample data can be a list of sample sets that use the same resource kit
         self.resources  = resource_kit
-        self.samples    = sample_data
+        self.samples    = sample_data if isinstance(sample_data, list) else [sample_data]
         self.storage_helper = storage_helper
         self.docker_helper  = docker_helper
 
+        # Files created to validate sample paths along with the sample each one belongs to
+        self.sample_files = []
+
         # Create thread pool for parallelizing input file validation
         self.thread_pool = ThreadPool(num_threads, worker_class=InputWorker, storage_helper=self.storage_helper, docker_helper=self.docker_helper)
 
@@ -67,6 +71,10 @@ class InputValidator(Validator):
                 elif input_file.get_size() is None:
                     self.report_error("Could not determine size of %s!" % input_desc)
 
+        # Pass sizes of sample files to the samples they belong to
+        for sample, input_file in self.sample_files:
+            sample.set_file_size(input_file.get_path(), input_file.get_size())
+
         # Identify if there are errors before printing them
         has_errors = self.has_errors()
 
@@ -102,15 +110,15 @@ class InputValidator(Validator):
 
     def __get_sample_data_paths(self):
         # Return list of paths in sample data
+        # Paths are checked through files of their own, as GAPFiles of sample paths are only created once tasks need them
         paths = []
-        sample_paths = self.samples.get_paths()
-        # Check if the path exists
-        for input_type, sample_paths in sample_paths.items():
-            if isinstance(sample_paths, list):
-                for path in sample_paths:
-                    paths.append(path)
-            else:
-                paths.append(sample_paths)
+        for sample_set in self.samples:
+            for sample in sample_set.get_samples():
+                # Check if the path exists
+                for input_type, sample_paths in sample.make_gap_files().items():
+                    for path in (sample_paths if isinstance(sample_paths, list) else [sample_paths]):
+                        self.sample_files.append((sample, path))
+                        paths.append(path)
         return paths
 
 
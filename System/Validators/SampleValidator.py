@@ -9,14 +9,16 @@ class SampleValidator(Validator):
 
     def __check_paired_end(self):
 
-        sample_data = self.samples.get_data()
-
-        if "is_paired" not in sample_data:
+        if not self.samples.has_data_type("is_paired"):
             return
 
-        if "R1" not in sample_data:
+        if not self.samples.has_data_type("R1"):
             return
 
+        # Paths are checked as path strings so GAPFiles of sample paths are only created once tasks need them
+        sample_data = {data_type: self.samples.get_raw_data(data_type)
+                       for data_type in ["sample_name", "is_paired", "R1", "R2"] if self.samples.has_data_type(data_type)}
+
         # Check all samples if >1 samples
         if isinstance(sample_data["sample_name"], list):
 
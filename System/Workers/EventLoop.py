@@ -0,0 +1,90 @@
+import asyncio
+import concurrent.futures
+import functools
+import os
+import sys
+import threading
+
+from System.Workers import Thread
+
+class EventLoop(object):
+    # Asyncio event loop running in a thread of its own on which task workers run as coroutines
+    # Other threads hand work to the loop without blocking through call_soon() and submit(). Blocking calls without a
+    # coroutine version are run in a pool of executor threads, which is only grown up to MAX_BLOCKING_CALLS threads
+    # while that many blocking calls are running at once
+
+    MAX_BLOCKING_CALLS = 256
+
+    def __init__(self, name="event_loop"):
+
+        # Name of the thread running the loop
+        self.name = name
+
+        # Loop, executor running blocking calls and thread running the loop (None until the loop is started)
+        self.lock       = threading.Lock()
+        self.loop       = None
+        self.executor   = None
+        self.thread     = None
+
+    def start(self):
+        # Start running the loop unless it's already running
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.executor   = self.make_executor()
+            self.loop       = self.make_loop()
+            self.thread     = EventLoopThread("Event loop '%s' has stopped working" % self.name, self.loop)
+            self.thread.start()
+
+    def make_loop(self):
+        # Create the asyncio event loop
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(self.executor)
+
+        # Subprocesses are reaped by watching their pid file descriptors on the loop where the OS supports it
+        # Otherwise asyncio waits for each subprocess from a thread of its own (Python 3.12+ does this on its own)
+        if sys.version_info < (3, 12) and hasattr(asyncio, "PidfdChildWatcher") and EventLoop.__has_pidfd():
+            watcher = asyncio.PidfdChildWatcher()
+            asyncio.set_child_watcher(watcher)
+            watcher.attach_loop(loop)
+        return loop
+
+    def make_executor(self):
+        # Create the executor running blocking calls
+        return concurrent.futures.ThreadPoolExecutor(self.MAX_BLOCKING_CALLS)
+
+    def submit(self, coro):
+        # Run coroutine on the loop and return a concurrent.futures.Future of its result
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        # Call function with args on the loop. Never blocks so it's safe to call while holding locks
+        self.start()
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    async def run_blocking(self, function, *args, **kwargs):
+        # Run a blocking call in an executor thread and return its result once it's done
+        return await self.loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    @staticmethod
+    def __has_pidfd():
+        # Determine whether the OS supports pid file descriptors
+        if not hasattr(os, "pidfd_open"):
+            return False
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+            return True
+        except OSError:
+            return False
+
+
+class EventLoopThread(Thread):
+    # Thread running an asyncio event loop until the end of the run
+    def __init__(self, err_msg, loop):
+        super(EventLoopThread, self).__init__(err_msg)
+        self.loop = loop
+
+    def work(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
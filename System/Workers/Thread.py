@@ -2,7 +2,6 @@ import threading
 import queue
 import logging
 import sys
-import time
 import abc
 
 
@@ -48,8 +47,8 @@ class Thread(threading.Thread, metaclass=abc.ABCMeta):
 
     def finalize(self):
 
-        while not self.is_done():
-            time.sleep(2)
+        # Block until the thread has stopped running
+        self.join()
 
         # If exception queue is empty at this point, then the thread has been finalized already
         if not self.exception_queue.empty():
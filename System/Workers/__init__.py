@@ -1,2 +1,3 @@
 from .Thread import Thread
-from .ThreadPool import PoolWorker, ThreadPool
\ No newline at end of file
+from .ThreadPool import PoolWorker, ThreadPool
+from .EventLoop import EventLoop
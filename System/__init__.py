@@ -1 +1,3 @@
-from .GAPipeline import GAPipeline, GAPReport
\ No newline at end of file
+from .GAPipeline import GAPipeline, GAPReport
+from .GAPBatch import GAPBatch
+from .ChromeTrace import ChromeTrace
\ No newline at end of file
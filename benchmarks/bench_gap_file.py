@@ -0,0 +1,50 @@
+import copy
+
+from benchmark import make_argparser, run, measure, measure_memory
+
+# Creates hundreds of thousands of GAPFiles spread over a few directories as held by expanded graphs
+# Reports the memory the files hold and the time to create and flag them, check a flag and deep copy part of them
+# Usage: python3 benchmarks/bench_gap_file.py [--nr_files 200000] [--nr_dirs 50] [--nr_copies 20000]
+
+def make_files(nr_files, nr_dirs):
+    # Return files created and flagged as they are when outputs of split tasks are validated
+    # Metadata of every file is read as it is when the run state is saved
+    from System.Datastore import GAPFile
+    files = []
+    for i in range(nr_files):
+        sample_name = "sample_%d" % (i % nr_dirs)
+        path = "gs://bucket/project/run/align/%s/out_%06d.bam" % (sample_name, i)
+        gap_file = GAPFile("bam_%06d" % i, "bam", path, sample_name=sample_name)
+        gap_file.flag("validated")
+        len(gap_file.metadata)
+        files.append(gap_file)
+    return files
+
+def count_flagged(files, flag):
+    return sum(1 for gap_file in files if gap_file.is_flagged(flag))
+
+def benchmark(args):
+    files, current, _ = measure_memory(make_files, args.nr_files, args.nr_dirs)
+    files = None
+    files, create_time = measure(make_files, args.nr_files, args.nr_dirs)
+    _, flag_time = measure(count_flagged, files, "docker")
+    _, copy_time = measure(copy.deepcopy, files[:args.nr_copies])
+
+    print("%-10s %12s %12s %14s %14s" % ("files", "held (MB)", "create (s)", "is_flagged (s)", "deepcopy (s)"))
+    print("%-10d %12.1f %12.2f %14.3f %14.2f" % (args.nr_files, current, create_time, flag_time, copy_time))
+
+if __name__ == "__main__":
+    argparser = make_argparser("Benchmark memory and time used by large numbers of GAPFiles.")
+    argparser.add_argument("--nr_files",
+                           type=int,
+                           default=200000,
+                           help="Number of files to create.")
+    argparser.add_argument("--nr_dirs",
+                           type=int,
+                           default=50,
+                           help="Number of directories files are spread over.")
+    argparser.add_argument("--nr_copies",
+                           type=int,
+                           default=20000,
+                           help="Number of files deep copied at once.")
+    run(argparser, benchmark)
@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+
+from benchmark import make_argparser, run, measure, write_file
+
+# Expands pipeline graphs into tens of thousands of split tasks and reports how long splitting takes
+#   flat:   one splitter whose splits each run two tasks before being merged
+#   nested: each split of an outer splitter runs an inner splitter whose splits are merged before the outer merge
+# Usage: python3 benchmarks/bench_graph_expansion.py [--nr_split_tasks 10000 100000] [--nested 50x23] [--compare REV]
+
+FLAT_GRAPH = """
+[split]
+module = RefSplitter
+
+[align]
+module = Samtools
+submodule = Index
+input_from = split
+
+[stats]
+module = Samtools
+submodule = Flagstat
+input_from = align
+
+[merge]
+module = MergeBams
+input_from = stats
+
+[qc]
+module = Samtools
+submodule = Flagstat
+input_from = merge
+"""
+
+NESTED_GRAPH = """
+[outer]
+module = RefSplitter
+
+[align]
+module = Samtools
+submodule = Index
+input_from = outer
+
+[inner]
+module = RefSplitter
+input_from = align
+
+[call]
+module = Samtools
+submodule = Flagstat
+input_from = inner
+
+[inner_merge]
+module = MergeBams
+input_from = call
+
+[outer_merge]
+module = MergeBams
+input_from = inner_merge
+"""
+
+def make_splits(task, nr_splits, prefix):
+    # Declare splits as the splitter would once it finishes
+    # Split ids get a prefix unique to each graph as older revisions keep split task ids across graphs
+    module = task.get_module()
+    for i in range(nr_splits):
+        split_id = "%s_%06d" % (prefix, i)
+        module.make_split(split_id)
+        module.add_output(split_id, "location", "chr%d" % i, is_path=False)
+
+def expand_flat(graph, nr_splits, prefix):
+    make_splits(graph.get_tasks("split"), nr_splits, prefix)
+    graph.split_graph("split")
+
+def expand_nested(graph, nr_outer, nr_inner, prefix):
+    make_splits(graph.get_tasks("outer"), nr_outer, prefix)
+    graph.split_graph("outer")
+    inner_ids = [task_id for task_id in list(graph.get_tasks()) if task_id.startswith("inner.")]
+    for inner_id in inner_ids:
+        make_splits(graph.get_tasks(inner_id), nr_inner, prefix)
+        graph.split_graph(inner_id)
+
+def benchmark(args):
+    tmp_dir = tempfile.mkdtemp(prefix="cc_benchmark_")
+    try:
+        flat_config = write_file(tmp_dir, "flat.config", FLAT_GRAPH)
+        nested_config = write_file(tmp_dir, "nested.config", NESTED_GRAPH)
+        run_graphs(args, flat_config, nested_config)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def run_graphs(args, flat_config, nested_config):
+    from System.Graph import Graph
+
+    print("%-8s %-12s %12s %12s %14s" % ("graph", "splits", "split tasks", "seconds", "tasks/sec"))
+    for i, nr_split_tasks in enumerate(args.nr_split_tasks):
+        # Every split runs two tasks
+        nr_splits = nr_split_tasks // 2
+        graph = Graph(flat_config)
+        _, runtime = measure(expand_flat, graph, nr_splits, "f%d" % i)
+        print("%-8s %-12s %12d %12.2f %14.0f" % ("flat", nr_splits, nr_splits * 2, runtime, nr_splits * 2 / runtime))
+
+    if args.nested.lower() != "none":
+        nr_outer, nr_inner = [int(x) for x in args.nested.lower().split("x")]
+        graph = Graph(nested_config)
+        _, runtime = measure(expand_nested, graph, nr_outer, nr_inner, "n")
+
+        # Every outer split runs the aligner, the inner splitter and the inner merge, and every inner split one task
+        nr_split_tasks = nr_outer * (3 + nr_inner)
+        print("%-8s %-12s %12d %12.2f %14.0f" % ("nested", "%dx%d" % (nr_outer, nr_inner), nr_split_tasks,
+                                                 runtime, nr_split_tasks / runtime))
+
+if __name__ == "__main__":
+    argparser = make_argparser("Benchmark expansion of split pipeline graphs.")
+    argparser.add_argument("--nr_split_tasks",
+                           type=int,
+                           nargs="+",
+                           default=[10000, 25000, 50000, 100000],
+                           help="Number of split tasks each flat graph is expanded into.")
+    argparser.add_argument("--nested",
+                           default="50x23",
+                           help="Number of outer and inner splits of the nested graph, e.g. 50x23 ('none' to skip).")
+    run(argparser, benchmark)
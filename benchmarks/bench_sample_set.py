@@ -0,0 +1,76 @@
+import os
+import csv
+import json
+import shutil
+import tempfile
+
+from benchmark import make_argparser, run, measure, write_file
+
+# Loads a sample sheet with tens of thousands of samples and subsets it the way split pipelines do
+# Sheets only hold sample-level data as older revisions can't subset sheets with global data
+# Reports the time to load the sheet, to subset it in batches of samples and to get every sample's paths
+# Usage: python3 benchmarks/bench_sample_set.py [--nr_samples 20000] [--batch_size 100] [--format json|tsv]
+# TSV sample sheets are only read by revisions including user-024
+
+def make_sample(i):
+    # Return data of a sample with a single file, a pair of files and two metadata values
+    return {"name": "sample_%06d" % i,
+            "paths": {"R1": "gs://bucket/sample_%06d_R1.fastq.gz" % i,
+                      "bam": ["gs://bucket/sample_%06d.a.bam" % i, "gs://bucket/sample_%06d.b.bam" % i]},
+            "is_tumor": i % 2 == 0,
+            "library": "LIB%d" % (i % 7)}
+
+def make_json_sheet(dir_path, nr_samples):
+    sheet = {"samples": [make_sample(i) for i in range(nr_samples)]}
+    return write_file(dir_path, "samples.json", json.dumps(sheet))
+
+def make_tsv_sheet(dir_path, nr_samples):
+    path = os.path.join(dir_path, "samples.tsv")
+    with open(path, "w", newline="") as sheet_fh:
+        writer = csv.writer(sheet_fh, delimiter="\t")
+        writer.writerow(["name", "paths.R1", "paths.bam", "paths.bam", "is_tumor", "library"])
+        for i in range(nr_samples):
+            sample = make_sample(i)
+            writer.writerow([sample["name"], sample["paths"]["R1"]] + sample["paths"]["bam"] +
+                            ["true" if sample["is_tumor"] else "false", sample["library"]])
+    return path
+
+def subset_samples(sample_set, batch_size):
+    # Get data of every batch of samples as split tasks each processing a batch would
+    sample_names = sample_set.sample_names
+    for i in range(0, len(sample_names), batch_size):
+        batch = sample_names[i:i + batch_size]
+        sample_set.get_data("R1", samples=batch)
+        sample_set.get_data("library", samples=batch)
+
+def benchmark(args):
+    from System.Datastore import SampleSet
+    tmp_dir = tempfile.mkdtemp(prefix="cc_benchmark_")
+    try:
+        make_sheet = make_tsv_sheet if args.format == "tsv" else make_json_sheet
+        sample_sheet = make_sheet(tmp_dir, args.nr_samples)
+
+        sample_set, load_time = measure(SampleSet, sample_sheet)
+        _, subset_time = measure(subset_samples, sample_set, args.batch_size)
+        _, paths_time = measure(sample_set.get_paths)
+
+        print("%-10s %8s %12s %14s %14s" % ("samples", "format", "load (s)", "subset (s)", "paths (s)"))
+        print("%-10d %8s %12.2f %14.2f %14.2f" % (args.nr_samples, args.format, load_time, subset_time, paths_time))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    argparser = make_argparser("Benchmark loading and subsetting a large sample sheet.")
+    argparser.add_argument("--nr_samples",
+                           type=int,
+                           default=20000,
+                           help="Number of samples in the sample sheet.")
+    argparser.add_argument("--batch_size",
+                           type=int,
+                           default=100,
+                           help="Number of samples in each subset.")
+    argparser.add_argument("--format",
+                           choices=["json", "tsv"],
+                           default="json",
+                           help="Format of the sample sheet.")
+    run(argparser, benchmark)
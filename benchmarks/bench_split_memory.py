@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+
+from benchmark import make_argparser, run, measure, measure_memory, write_file
+
+# Splits a graph 5,000 ways and reports the memory held by the split tasks and how long splitting takes
+# Each split runs an aligner, an index and a stats task before the splits are merged
+# Usage: python3 benchmarks/bench_split_memory.py [--nr_splits 5000] [--compare REV]
+
+GRAPH = """
+[split]
+module = CellBarcodeSplitter
+
+[align]
+module = BwaAligner
+input_from = split
+
+[index]
+module = Samtools
+submodule = Index
+input_from = align
+
+[stats]
+module = Samtools
+submodule = Flagstat
+input_from = index
+
+[merge]
+module = MergeBams
+input_from = stats
+"""
+
+def split_graph(graph_config, nr_splits):
+    # Return graph split as the splitter would once it finishes
+    from System.Graph import Graph
+    graph = Graph(graph_config)
+    module = graph.get_tasks("split").get_module()
+    for i in range(nr_splits):
+        split_id = "barcode_%06d" % i
+        module.make_split(split_id)
+        module.add_output(split_id, "barcode", "ACGT%06d" % i, is_path=False)
+    graph.split_graph("split")
+    return graph
+
+def benchmark(args):
+    tmp_dir = tempfile.mkdtemp(prefix="cc_benchmark_")
+    try:
+        graph_config = write_file(tmp_dir, "split.config", GRAPH)
+
+        # Memory held by the graph, including the parsed config, once it has been split
+        graph, runtime = measure(split_graph, graph_config, args.nr_splits)
+        nr_tasks = len(graph.get_tasks())
+        graph = None
+        graph, current, peak = measure_memory(split_graph, graph_config, args.nr_splits)
+        print("%-12s %10s %10s %14s %14s %14s" % ("splits", "tasks", "seconds", "held (MB)", "peak (MB)", "KB/split"))
+        print("%-12d %10d %10.2f %14.1f %14.1f %14.1f" % (args.nr_splits, nr_tasks, runtime, current, peak,
+                                                          current * 1024 / args.nr_splits))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    argparser = make_argparser("Benchmark memory and time needed to split a graph thousands of ways.")
+    argparser.add_argument("--nr_splits",
+                           type=int,
+                           default=5000,
+                           help="Number of splits the splitter creates.")
+    run(argparser, benchmark)
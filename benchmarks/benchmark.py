@@ -0,0 +1,104 @@
+import os
+import io
+import sys
+import gc
+import time
+import shutil
+import tarfile
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+# Helpers shared by the benchmarks in this directory
+# Each benchmark runs against the CloudConductor tree it lives in, or against the tree given with --root. With
+# --compare <git revision> the same benchmark is also run against that revision of the repository so changes can be
+# checked for regressions.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def make_argparser(description):
+    # Return argument parser with the options every benchmark understands
+    argparser = argparse.ArgumentParser(description=description)
+    argparser.add_argument("--root",
+                           default=REPO_ROOT,
+                           help="CloudConductor tree to benchmark (default: tree containing the benchmark).")
+    argparser.add_argument("--compare",
+                           default=None,
+                           metavar="REV",
+                           help="Also run the benchmark against a git revision of the repository, e.g. HEAD~5.")
+    return argparser
+
+def run(argparser, benchmark):
+    # Parse arguments and run benchmark(args) against the tree to benchmark and the revision to compare against
+    args = argparser.parse_args()
+    if args.compare is not None:
+        print("=== %s ===" % args.compare)
+        sys.stdout.flush()
+        run_revision(args.compare)
+        print("=== %s ===" % ("working tree" if args.root == REPO_ROOT else args.root))
+        sys.stdout.flush()
+
+    load_tree(args.root)
+    benchmark(args)
+
+def run_revision(revision):
+    # Run the benchmark script in a subprocess against a git revision extracted to a temporary directory
+    tmp_dir = tempfile.mkdtemp(prefix="cc_benchmark_")
+    try:
+        archive = subprocess.check_output(["git", "-C", REPO_ROOT, "archive", revision])
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar_fh:
+            tar_fh.extractall(tmp_dir)
+
+        argv = []
+        skip = False
+        for arg in sys.argv[1:]:
+            if skip:
+                skip = False
+            elif arg in ["--compare", "--root"]:
+                skip = True
+            elif not arg.startswith("--compare=") and not arg.startswith("--root="):
+                argv.append(arg)
+        subprocess.check_call([sys.executable, os.path.abspath(sys.argv[0]), "--root", tmp_dir] + argv)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def load_tree(root):
+    # Import CloudConductor from a tree the same way the CloudConductor executable does
+    # Config specs are read relative to the root of the tree
+    root = os.path.abspath(root)
+    os.chdir(root)
+    sys.path.insert(0, root)
+    for module_dir in ["Modules/Tools/", "Modules/Splitters/", "Modules/Mergers/"]:
+        sys.path.insert(1, os.path.join(root, module_dir))
+
+    # System has to be imported before Modules
+    import System
+
+def measure(function, *args, **kwargs):
+    # Run function and return its result and the seconds it took
+    gc.collect()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    runtime = time.perf_counter() - start
+    return result, runtime
+
+def measure_memory(function, *args, **kwargs):
+    # Run function while tracing memory allocations. Return its result, the memory (MB) it allocated that's still in
+    # use once it returns and the peak memory (MB) allocated while it ran
+    # Tracing slows the function down so its runtime should be measured in a separate run
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function(*args, **kwargs)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current / 2.0**20, peak / 2.0**20
+
+def write_file(dir_path, name, contents):
+    # Write a file used by the benchmark and return its path
+    path = os.path.join(dir_path, name)
+    with open(path, "w") as file_fh:
+        file_fh.write(contents)
+    return path